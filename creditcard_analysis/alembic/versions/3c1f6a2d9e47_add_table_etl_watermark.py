@@ -0,0 +1,34 @@
+"""add TABLE etl_watermark
+
+Revision ID: 3c1f6a2d9e47
+Revises: a987af63aba9
+Create Date: 2026-10-18 10:12:04.318552
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '3c1f6a2d9e47'
+down_revision: Union[str, Sequence[str], None] = 'a987af63aba9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('etl_watermark',
+    sa.Column('source', sa.String(length=100), nullable=False, comment='資料來源'),
+    sa.Column('last_ym', sa.String(length=20), nullable=False, comment='最後匯入年月'),
+    sa.Column('update_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True, comment='更新時間'),
+    sa.Column('id', sa.Integer(), nullable=False, comment='ID主鍵'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('source')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('etl_watermark')
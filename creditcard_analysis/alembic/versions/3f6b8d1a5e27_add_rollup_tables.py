@@ -0,0 +1,55 @@
+"""add rollup tables pre-aggregated from clean_data
+
+Revision ID: 3f6b8d1a5e27
+Revises: e1f9a3b6c820
+Create Date: 2026-10-18 17:12:30.550871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '3f6b8d1a5e27'
+down_revision: Union[str, Sequence[str], None] = 'e1f9a3b6c820'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+KEY_COMMENTS = {
+    'ym_key'      : '年月整數鍵',
+    'industry_id' : '產業別代碼',
+    'age_level_id': '年齡層代碼',
+}
+ROLLUPS = {
+    'rollup_ym'          : ('uq_rollup_ym', ['ym_key']),
+    'rollup_industry_age': ('uq_rollup_industry_age', ['industry_id', 'age_level_id']),
+    'rollup_ym_industry' : ('uq_rollup_ym_industry', ['ym_key', 'industry_id']),
+    'rollup_ym_age'      : ('uq_rollup_ym_age', ['ym_key', 'age_level_id']),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, (uq_name, keys) in ROLLUPS.items():
+        op.create_table(table,
+        sa.Column('id', sa.Integer(), nullable=False, comment='ID主鍵'),
+        *(sa.Column(k, sa.SmallInteger(), nullable=False, comment=KEY_COMMENTS[k]) for k in keys),
+        sa.Column('trans_count', sa.BigInteger(), nullable=False, comment='交易筆數合計'),
+        sa.Column('trans_total', sa.BigInteger(), nullable=False, comment='交易金額合計'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint(*keys, name=uq_name)
+        )
+        cols = ', '.join(keys)
+        op.execute(f"""
+            INSERT INTO {table} ({cols}, trans_count, trans_total)
+            SELECT {cols}, SUM(trans_count), SUM(trans_total)
+            FROM clean_data
+            GROUP BY {cols}
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in reversed(list(ROLLUPS)):
+        op.drop_table(table)
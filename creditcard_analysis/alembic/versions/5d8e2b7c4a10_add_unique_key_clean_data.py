@@ -0,0 +1,41 @@
+"""add unique key clean_data
+
+Revision ID: 5d8e2b7c4a10
+Revises: 3c1f6a2d9e47
+Create Date: 2026-10-18 11:03:27.604219
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '5d8e2b7c4a10'
+down_revision: Union[str, Sequence[str], None] = '3c1f6a2d9e47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 先刪除重跑 ETL 累積的重複列，每組自然鍵只保留 id 最大 (最後匯入) 的一筆
+    op.execute("""
+        DELETE FROM clean_data
+        WHERE id NOT IN (
+            SELECT keep_id FROM (
+                SELECT MAX(id) AS keep_id
+                FROM clean_data
+                GROUP BY ym, nation, industry, age_level
+            ) AS k
+        )
+    """)
+    op.create_unique_constraint(
+        'uq_clean_data_ym_nation_industry_age', 'clean_data',
+        ['ym', 'nation', 'industry', 'age_level']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_clean_data_ym_nation_industry_age', 'clean_data', type_='unique')
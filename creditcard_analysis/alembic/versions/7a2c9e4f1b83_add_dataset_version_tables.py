@@ -0,0 +1,42 @@
+"""add dataset_version and dataset_changes
+
+Revision ID: 7a2c9e4f1b83
+Revises: 3f6b8d1a5e27
+Create Date: 2026-10-18 18:40:12.204117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '7a2c9e4f1b83'
+down_revision: Union[str, Sequence[str], None] = '3f6b8d1a5e27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('dataset_version',
+    sa.Column('version', sa.BigInteger(), nullable=False, comment='資料版本'),
+    sa.Column('update_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True, comment='更新時間'),
+    sa.Column('id', sa.Integer(), nullable=False, comment='ID主鍵'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('dataset_changes',
+    sa.Column('version', sa.BigInteger(), nullable=False, comment='資料版本'),
+    sa.Column('ym_key', sa.SmallInteger(), nullable=True, comment='異動年月整數鍵 (NULL 表示整表重載)'),
+    sa.Column('create_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True, comment='建立時間'),
+    sa.Column('id', sa.Integer(), nullable=False, comment='ID主鍵'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_dataset_changes_version', 'dataset_changes', ['version'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_dataset_changes_version', table_name='dataset_changes')
+    op.drop_table('dataset_changes')
+    op.drop_table('dataset_version')
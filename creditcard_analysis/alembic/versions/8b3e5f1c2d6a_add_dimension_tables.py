@@ -0,0 +1,98 @@
+"""add dimension tables, clean_data stores codes
+
+Revision ID: 8b3e5f1c2d6a
+Revises: 5d8e2b7c4a10
+Create Date: 2026-10-18 13:02:41.318520
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '8b3e5f1c2d6a'
+down_revision: Union[str, Sequence[str], None] = '5d8e2b7c4a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 欄位 -> (代碼欄位, 維度表, 欄位註解)
+DIMENSIONS = {
+    'nation'   : ('nation_id', 'dim_nation', '地區'),
+    'industry' : ('industry_id', 'dim_industry', '產業別'),
+    'age_level': ('age_level_id', 'dim_age_level', '年齡層'),
+}
+INDUSTRY_ORDER = ["食", "衣", "住", "行", "文教康樂", "百貨", "其他"]
+
+
+def _sort_order(col: str, label: str) -> int:
+    # 與 clean_data/dimensions.py 相同的排序規則
+    if col == 'age_level':
+        if label.startswith("未滿"):
+            return 0
+        m = re.search(r"\d+", label)
+        return int(m.group()) if m else 999
+    if col == 'industry' and label in INDUSTRY_ORDER:
+        return INDUSTRY_ORDER.index(label)
+    return 999
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conn = op.get_bind()
+    for col, (id_col, dim_table, comment) in DIMENSIONS.items():
+        table = op.create_table(dim_table,
+        sa.Column('id', sa.SmallInteger(), autoincrement=True, nullable=False, comment='代碼'),
+        sa.Column('label', sa.String(length=20), nullable=False, comment='標籤'),
+        sa.Column('sort_order', sa.SmallInteger(), nullable=False, comment='顯示排序'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('label')
+        )
+        labels = conn.execute(sa.text(f"SELECT DISTINCT {col} FROM clean_data ORDER BY {col}")).scalars().all()
+        if labels:
+            op.bulk_insert(table, [{'label': v, 'sort_order': _sort_order(col, v)} for v in labels])
+        op.add_column('clean_data', sa.Column(id_col, sa.SmallInteger(), nullable=True, comment=f'{comment}代碼 ({dim_table})'))
+
+    op.execute("""
+        UPDATE clean_data c
+        JOIN dim_nation    n ON n.label = c.nation
+        JOIN dim_industry  i ON i.label = c.industry
+        JOIN dim_age_level a ON a.label = c.age_level
+        SET c.nation_id = n.id, c.industry_id = i.id, c.age_level_id = a.id
+    """)
+
+    op.drop_constraint('uq_clean_data_ym_nation_industry_age', 'clean_data', type_='unique')
+    for col, (id_col, dim_table, comment) in DIMENSIONS.items():
+        op.alter_column('clean_data', id_col, existing_type=sa.SmallInteger(), nullable=False,
+                        existing_comment=f'{comment}代碼 ({dim_table})')
+        op.drop_column('clean_data', col)
+    op.create_unique_constraint(
+        'uq_clean_data_ym_nation_industry_age', 'clean_data',
+        ['ym', 'nation_id', 'industry_id', 'age_level_id']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for col, (id_col, dim_table, comment) in DIMENSIONS.items():
+        op.add_column('clean_data', sa.Column(col, sa.String(length=20), nullable=True, comment=comment))
+
+    op.execute("""
+        UPDATE clean_data c
+        JOIN dim_nation    n ON n.id = c.nation_id
+        JOIN dim_industry  i ON i.id = c.industry_id
+        JOIN dim_age_level a ON a.id = c.age_level_id
+        SET c.nation = n.label, c.industry = i.label, c.age_level = a.label
+    """)
+
+    op.drop_constraint('uq_clean_data_ym_nation_industry_age', 'clean_data', type_='unique')
+    for col, (id_col, dim_table, comment) in DIMENSIONS.items():
+        op.alter_column('clean_data', col, existing_type=sa.String(length=20), nullable=False,
+                        existing_comment=comment)
+        op.drop_column('clean_data', id_col)
+        op.drop_table(dim_table)
+    op.create_unique_constraint(
+        'uq_clean_data_ym_nation_industry_age', 'clean_data',
+        ['ym', 'nation', 'industry', 'age_level']
+    )
@@ -0,0 +1,36 @@
+"""add etl_watermark source_sha256
+
+Revision ID: a4e7c2f9d613
+Revises: f2c6a9d4b851
+Create Date: 2026-10-19 09:12:40.318562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'a4e7c2f9d613'
+down_revision: Union[str, Sequence[str], None] = 'f2c6a9d4b851'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('etl_watermark', sa.Column('source_sha256', sa.String(length=64), nullable=True, comment='最後成功匯入的來源檔 sha256'))
+    op.alter_column('etl_watermark', 'last_ym',
+               existing_type=sa.String(length=20),
+               nullable=True,
+               existing_comment='最後匯入年月')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM etl_watermark WHERE last_ym IS NULL")
+    op.alter_column('etl_watermark', 'last_ym',
+               existing_type=sa.String(length=20),
+               nullable=False,
+               existing_comment='最後匯入年月')
+    op.drop_column('etl_watermark', 'source_sha256')
@@ -0,0 +1,37 @@
+"""backfill chart_results retry_after
+
+Revision ID: b7d3f1a8e592
+Revises: a4e7c2f9d613
+Create Date: 2026-10-19 15:26:07.104839
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'b7d3f1a8e592'
+down_revision: Union[str, Sequence[str], None] = 'a4e7c2f9d613'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 之前次數用完的 FAILED 留 NULL、永遠不會重試：改成現在就可以重新接手
+    op.execute("UPDATE chart_results SET retry_after = NOW() WHERE status = 'FAILED' AND retry_after IS NULL")
+    op.alter_column('chart_results', 'retry_after',
+               existing_type=sa.DateTime(),
+               existing_nullable=True,
+               comment='失敗後可重試時間 (次數用完時為退避上限)',
+               existing_comment='失敗後可重試時間 (NULL 表示不再重試)')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column('chart_results', 'retry_after',
+               existing_type=sa.DateTime(),
+               existing_nullable=True,
+               comment='失敗後可重試時間 (NULL 表示不再重試)',
+               existing_comment='失敗後可重試時間 (次數用完時為退避上限)')
@@ -0,0 +1,37 @@
+"""add clean_data.ym_key integer month key
+
+Revision ID: c4a7d2e9f315
+Revises: 8b3e5f1c2d6a
+Create Date: 2026-10-18 15:20:07.412093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'c4a7d2e9f315'
+down_revision: Union[str, Sequence[str], None] = '8b3e5f1c2d6a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COMMENT = '年月整數鍵 (年 * 12 + 月 - 1)'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('clean_data', sa.Column('ym_key', sa.SmallInteger(), nullable=True, comment=COMMENT))
+    op.execute("""
+        UPDATE clean_data
+        SET ym_key = (CAST(ym AS UNSIGNED) DIV 100) * 12 + CAST(ym AS UNSIGNED) % 100 - 1
+    """)
+    op.alter_column('clean_data', 'ym_key', existing_type=sa.SmallInteger(), nullable=False,
+                    existing_comment=COMMENT)
+    op.create_index(op.f('ix_clean_data_ym_key'), 'clean_data', ['ym_key'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_clean_data_ym_key'), table_name='clean_data')
+    op.drop_column('clean_data', 'ym_key')
@@ -0,0 +1,29 @@
+"""add chart_results lease columns
+
+Revision ID: d5b1e8a3c7f2
+Revises: 7a2c9e4f1b83
+Create Date: 2026-10-18 21:15:47.530128
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'd5b1e8a3c7f2'
+down_revision: Union[str, Sequence[str], None] = '7a2c9e4f1b83'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('chart_results', sa.Column('lease_owner', sa.String(length=100), nullable=True, comment='產圖租約持有者 (host:pid)'))
+    op.add_column('chart_results', sa.Column('lease_expires_at', sa.DateTime(), nullable=True, comment='產圖租約到期時間'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('chart_results', 'lease_expires_at')
+    op.drop_column('chart_results', 'lease_owner')
@@ -0,0 +1,38 @@
+"""add covering indexes for chart / dashboard queries on clean_data
+
+Revision ID: e1f9a3b6c820
+Revises: c4a7d2e9f315
+Create Date: 2026-10-18 16:05:52.903114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'e1f9a3b6c820'
+down_revision: Union[str, Sequence[str], None] = 'c4a7d2e9f315'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    'ix_clean_data_ym_cover'      : ['ym_key', 'industry_id', 'age_level_id', 'trans_total', 'trans_count'],
+    'ix_clean_data_industry_cover': ['industry_id', 'age_level_id', 'ym_key', 'trans_total', 'trans_count'],
+    'ix_clean_data_age_cover'     : ['age_level_id', 'ym_key', 'industry_id', 'trans_total', 'trans_count'],
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ix_clean_data_ym_key 是 ix_clean_data_ym_cover 的前綴，改由覆蓋索引取代
+    op.drop_index(op.f('ix_clean_data_ym_key'), table_name='clean_data')
+    for name, cols in INDEXES.items():
+        op.create_index(name, 'clean_data', cols, unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in INDEXES:
+        op.drop_index(name, table_name='clean_data')
+    op.create_index(op.f('ix_clean_data_ym_key'), 'clean_data', ['ym_key'], unique=False)
@@ -0,0 +1,33 @@
+"""add chart_results retry columns
+
+Revision ID: f2c6a9d4b851
+Revises: d5b1e8a3c7f2
+Create Date: 2026-10-18 22:03:18.640275
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'f2c6a9d4b851'
+down_revision: Union[str, Sequence[str], None] = 'd5b1e8a3c7f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('chart_results', sa.Column('attempts', sa.Integer(), server_default='0', nullable=False, comment='產圖次數'))
+    op.add_column('chart_results', sa.Column('error_json', sa.JSON(), nullable=True, comment='產圖失敗原因'))
+    op.add_column('chart_results', sa.Column('retry_after', sa.DateTime(), nullable=True, comment='失敗後可重試時間 (NULL 表示不再重試)'))
+    op.create_index('ix_chart_results_status_lease', 'chart_results', ['status', 'lease_expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_chart_results_status_lease', table_name='chart_results')
+    op.drop_column('chart_results', 'retry_after')
+    op.drop_column('chart_results', 'error_json')
+    op.drop_column('chart_results', 'attempts')
@@ -1,10 +1,15 @@
 from pathlib import Path
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 
 from .routers import request, meta, dashboard 
+from ..olap import cube_enabled, refresh_cube, CubePoller
+from ..chart_service.jobs import shutdown as shutdown_render_jobs
+from ..chart_service import render_pool
+from ..chart_service.single_flight import LeaseReaper, reaper_seconds
 
 
 BASE_DIR = Path(__file__).resolve().parents[1]
@@ -12,7 +17,29 @@ STATIC_DIR = BASE_DIR / 'api/static'
 TEMPLATES = BASE_DIR / 'api/templates'
 CHART_STORAGE = BASE_DIR / 'chart_storage'
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # OLAP_CUBE=1：啟動時載入 cube (或掛上共享快照)，之後在背景追 ETL 的資料版本
+    poller = None
+    if cube_enabled():
+        refresh_cube()
+        poller = CubePoller().start()
+    # 產圖行程先啟動並跑完 initializer，第一張圖不用等 import matplotlib / 字型快取
+    render_pool.warm_up()
+    # 定期把租約過期的 PENDING 改成 FAILED (CHART_REAPER_SECONDS=0 關閉)
+    reaper = LeaseReaper().start() if reaper_seconds() > 0 else None
+    try:
+        yield
+    finally:
+        if poller is not None:
+            poller.stop()
+        if reaper is not None:
+            reaper.stop()
+        # 等背景產圖做完再結束，避免留下做到一半的 PENDING
+        shutdown_render_jobs()
+        render_pool.shutdown()
+
+app = FastAPI(lifespan = lifespan)
 templates = Jinja2Templates(directory = str(TEMPLATES))
 
 app.mount('/static', StaticFiles(directory = str(STATIC_DIR)), name = 'static')
@@ -1,104 +1,120 @@
-from datetime import datetime 
-from dateutil.relativedelta import relativedelta
-from fastapi import APIRouter, Depends
-from sqlalchemy import func, cast, desc
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func, cast, desc, select
 from sqlalchemy.orm import Session
-from ...models import CleanedData
-from ...utils import get_db, DashboardResponse, TrendPoint, TopIndustry, TopnPerMonth
+from ...models import CleanedData, DimIndustry, DimAgeLevel
+from ...olap import get_cube
+from ...utils import get_db, DashboardResponse, TrendPoint, TopIndustry, TopnPerMonth, ym_to_key, key_to_ym, year_start_key, YM_PATTERN
 
 router = APIRouter(prefix = "/api/dashboard", tags = ['dashboard'])
 
 UNIT_PER_AMOUNT = 1000000000
 
-def ym_to_dt(ym: str) -> datetime:
-    return datetime.strptime(str(ym), '%Y%m').replace(day = 1)
+def dim_code(model, label: str):
+    return select(model.id).where(model.label == label).scalar_subquery()
 
 @router.get("/overview", response_model = DashboardResponse)
 def overview(
     db: Session = Depends(get_db), 
-    start_month: str | None = None,
-    end_month  : str | None = None,
+    start_month: str | None = Query(None, pattern = YM_PATTERN),
+    end_month  : str | None = Query(None, pattern = YM_PATTERN),
     industry   : str | None = None,
     age_level  : str | None = None
     ):
 
-    latest_ym, earliest_ym = db.query(
-        func.max(CleanedData.ym), 
-        func.min(CleanedData.ym)
+    # 啟用記憶體 cube 時不查 DB (結果與下面的 SQL 相同)
+    cube = get_cube()
+    if cube is not None:
+        frames = cube.overview(start_month, end_month, industry, age_level)
+        return DashboardResponse(
+            trend          = [TrendPoint(ym = r.ym, amount = r.amount) for r in frames["trend"].itertuples()],
+            topn           = [TopIndustry(industry = r.industry, amount = r.amount) for r in frames["topn"].itertuples()],
+            topn_per_month = [TopnPerMonth(ym = r.ym, industry = r.industry, amount = r.amount) for r in frames["topn_per_month"].itertuples()]
+        )
+
+    # 月份都換成 ym_key (年 * 12 + 月 - 1)，範圍與預設區間都是整數運算
+    latest_key, earliest_key = db.query(
+        func.max(CleanedData.ym_key), 
+        func.min(CleanedData.ym_key)
         ).one()
-    
-    latest_ym = ym_to_dt(latest_ym)
-    earliest_ym = ym_to_dt(earliest_ym)
 
     if start_month is None and end_month is None:
-        end_month   = latest_ym
-        start_month = latest_ym.replace(month = 1)
+        end_key   = latest_key
+        start_key = year_start_key(latest_key)
 
     elif start_month is not None and end_month is None:
-        end_month   = latest_ym
-        start_month = ym_to_dt(start_month)
+        end_key   = latest_key
+        start_key = ym_to_key(start_month)
     
     elif end_month is not None and start_month is None:
-        end_month   = ym_to_dt(end_month)
-        start_month = earliest_ym
+        end_key   = ym_to_key(end_month)
+        start_key = earliest_key
     
     else:
-        start_month = ym_to_dt(start_month)
-        end_month   = ym_to_dt(end_month)
-    
-    start_month = start_month.strftime("%Y%m")
-    end_month   = end_month.strftime("%Y%m")
+        start_key = ym_to_key(start_month)
+        end_key   = ym_to_key(end_month)
 
     base = db.query(CleanedData).filter(
-        CleanedData.ym >= start_month,
-        CleanedData.ym <= end_month
+        CleanedData.ym_key >= start_key,
+        CleanedData.ym_key <= end_key
     )
 
+    # 篩選值是標籤，先換成代碼 (純量子查詢) 再比對
     if age_level is not None:
-        base = base.filter(CleanedData.age_level == age_level)
+        base = base.filter(CleanedData.age_level_id == dim_code(DimAgeLevel, age_level))
     
     trend_q = base 
     if industry is not None:
-        trend_q = trend_q.filter(CleanedData.industry == industry)
+        trend_q = trend_q.filter(CleanedData.industry_id == dim_code(DimIndustry, industry))
     
     trend_rows = (
         trend_q
         .with_entities(
-            CleanedData.ym.label("ym"),
+            CleanedData.ym_key.label("ym_key"),
             (func.sum(CleanedData.trans_total) / UNIT_PER_AMOUNT).label("amount")
         )
-        .group_by(CleanedData.ym)
-        .order_by(CleanedData.ym)
+        .group_by(CleanedData.ym_key)
+        .order_by(CleanedData.ym_key)
         .all()
     )
-    trend = [TrendPoint(ym = r.ym, amount = float(r.amount)) for r in trend_rows]
+    trend = [TrendPoint(ym = key_to_ym(r.ym_key), amount = float(r.amount)) for r in trend_rows]
     
+    # 先依代碼分組，分組結果再 join 產業別標籤
     amount = (func.sum(CleanedData.trans_total) / UNIT_PER_AMOUNT).label('amount')
-    topn_per_month_rows= (
+    per_month = (
         base
         .with_entities(
-            CleanedData.ym.label('ym'),
-            CleanedData.industry.label('industry'),
+            CleanedData.ym_key.label('ym_key'),
+            CleanedData.industry_id.label('industry_id'),
             amount
         )
-        .group_by(CleanedData.ym, CleanedData.industry)
-        .order_by(CleanedData.ym, amount.desc())
+        .group_by(CleanedData.ym_key, CleanedData.industry_id)
+        .subquery()
+    )
+    topn_per_month_rows= (
+        db.query(per_month.c.ym_key, DimIndustry.label.label('industry'), per_month.c.amount)
+        .join(DimIndustry, DimIndustry.id == per_month.c.industry_id)
+        .order_by(per_month.c.ym_key, per_month.c.amount.desc())
         .all()
     )
     topn_per_month = [
-        TopnPerMonth(ym = r.ym, industry = r.industry, amount = float(r.amount)) 
+        TopnPerMonth(ym = key_to_ym(r.ym_key), industry = r.industry, amount = float(r.amount)) 
         for r in topn_per_month_rows
     ]
     
     
-    top_rows = (
+    by_industry = (
         base
         .with_entities(
-            CleanedData.industry.label("industry"),
+            CleanedData.industry_id.label("industry_id"),
             (func.sum(CleanedData.trans_total) / UNIT_PER_AMOUNT).label("amount")
         )
-        .group_by(CleanedData.industry)
-        .order_by(desc("amount"))
+        .group_by(CleanedData.industry_id)
+        .subquery()
+    )
+    top_rows = (
+        db.query(DimIndustry.label.label("industry"), by_industry.c.amount)
+        .join(DimIndustry, DimIndustry.id == by_industry.c.industry_id)
+        .order_by(desc(by_industry.c.amount))
         .all()
     )
     topn = [TopIndustry(industry = r.industry, amount = float(r.amount)) for r in top_rows]
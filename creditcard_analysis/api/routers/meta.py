@@ -1,8 +1,9 @@
 from fastapi import APIRouter 
 from sqlalchemy.orm import Session 
-from ...models import CleanedData
+from ...models import CleanedData, DimIndustry, DimAgeLevel
 from ...database import SessionLocal
-from ...utils import ColumnName, MetricColumn, ChartType, Option, MetaPayload, Db
+from ...utils import ColumnName, MetricColumn, ChartType, Option, MetaPayload, Db, key_to_ym
+from ...clean_data.dataset_snapshot import fresh_snapshot
 
 router = APIRouter(prefix = "/meta", tags = ["meta"])
 
@@ -16,34 +17,45 @@ def value_list():
 
 @router.get("/year_month", response_model = list[Option])
 def year_month_list(db: Db):
+    # ETL 快照與資料版本相同時直接讀快照
+    snapshot = fresh_snapshot(db)
+    if snapshot is not None:
+        return [Option(key = ym, value = ym) for ym in snapshot.year_months()]
+    # DISTINCT ym_key 只需要讀 ym_key 索引
     rows = (
-        db.query(CleanedData.ym)
+        db.query(CleanedData.ym_key)
           .distinct()
-          .order_by(CleanedData.ym)
+          .order_by(CleanedData.ym_key)
           .all()
     )
-    return [Option(key = ym[0], value = ym[0]) for ym in rows]
+    yms = [key_to_ym(key[0]) for key in rows]
+    return [Option(key = ym, value = ym) for ym in yms]
 
 @router.get("/chart_type", response_model = list[Option])
 def chart_type_list():
     return [Option(key = t.name, value = t.value) for t in ChartType]
 
+# 維度表只會有 ETL 匯入過的標籤，依標準順序排列，不用掃 clean_data
 @router.get("/industry", response_model = list[Option])
 def industry_list(db: Db):
+    snapshot = fresh_snapshot(db)
+    if snapshot is not None:
+        return [Option(key = ind, value = ind) for ind in snapshot.labels("industry")]
     rows = (
-        db.query(CleanedData.industry)
-            .distinct()
-            .order_by(CleanedData.industry)
+        db.query(DimIndustry.label)
+            .order_by(DimIndustry.sort_order, DimIndustry.id)
             .all()
     )
     return [Option(key = ind[0], value = ind[0]) for ind in rows]
 
 @router.get("/age_level", response_model = list[Option])
 def age_level_list(db: Db):
+    snapshot = fresh_snapshot(db)
+    if snapshot is not None:
+        return [Option(key = age, value = age) for age in snapshot.labels("age_level")]
     rows = (
-        db.query(CleanedData.age_level)
-          .distinct()
-          .order_by(CleanedData.age_level)
+        db.query(DimAgeLevel.label)
+          .order_by(DimAgeLevel.sort_order, DimAgeLevel.id)
           .all()
     )
     return [Option(key = age[0], value = age[0]) for age in rows]
\ No newline at end of file
@@ -1,14 +1,73 @@
-from fastapi import APIRouter, HTTPException
-from ...utils import Db, ChartIn, ChartOut, ColumnName, ChartType
-from ...chart_service import record_to_sql, ChartParamsError
+import os
+import json
+import time
+import asyncio
+from datetime import datetime
+from typing import Literal
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from starlette.concurrency import run_in_threadpool
+from ...database import SessionLocal
+from ...models import ChartResult, ResultStatus
+from ...utils import Db, ChartIn, ChartOut, ColumnName, ChartType, get_object_by_column
+from ...chart_service import record_to_sql, prepare_chart, to_response, ChartParamsError
+from ...chart_service.jobs import submit_render
+from ...chart_service.single_flight import claim
 
 
 router = APIRouter(prefix = "/api/request", tags = ['request'])
 
+DONE = (ResultStatus.READY.value, ResultStatus.FAILED.value)
+SSE_POLL_SECONDS      = float(os.getenv("CHART_SSE_POLL_SECONDS", "0.5"))
+SSE_TIMEOUT_SECONDS   = float(os.getenv("CHART_SSE_TIMEOUT_SECONDS", "300"))
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def default_mode() -> str:
+    return os.getenv("CHART_RENDER_MODE", "sync")
+
+def not_found(key: str) -> HTTPException:
+    return HTTPException(
+        status_code = 404,
+        detail = {
+            "msg": f"找不到圖表請求：{key}",
+            "code": "CHART_NOT_FOUND",
+            "field": "key"
+        }
+    )
+
+def with_status(out: dict, response: Response) -> dict:
+    # PENDING 回 202；FAILED 回 200 並帶 Retry-After
+    if out["status"] == ResultStatus.PENDING.value:
+        response.status_code = 202
+    elif out["status"] == ResultStatus.FAILED.value:
+        response.status_code = 200
+        if out["retry_after"] is not None:
+            wait = (out["retry_after"] - datetime.now()).total_seconds()
+            response.headers["Retry-After"] = str(max(int(wait) + 1, 0))
+    return out
+
 @router.post("/", response_model = ChartOut, status_code = 201)
-def request_chart(payload: ChartIn, db: Db):
+def request_chart(
+    payload : ChartIn,
+    db      : Db,
+    response: Response,
+    mode    : Literal["sync", "async"] | None = Query(None, description = "sync：等產圖完成才回應；async：新增 PENDING 後立即回 202")
+):
     try:
-        return record_to_sql(db, payload)
+        if (mode or default_mode()) != "async":
+            return with_status(record_to_sql(db, payload), response)
+
+        result, created = prepare_chart(db, payload)
+        if created:
+            # 先 commit PENDING (帶租約)，client 與背景 worker 才看得到
+            db.commit()
+            submit_render(result.id, payload, result.lease_owner)
+        elif claim(db, result):
+            # 原持有者的租約已過期 (worker 當掉) 或失敗後已到 retry_after：接手重產
+            submit_render(result.id, payload, result.lease_owner)
+        return with_status(to_response(result), response)
     except ChartParamsError as e:
         raise HTTPException(
             status_code = 422,
@@ -17,4 +76,57 @@ def request_chart(payload: ChartIn, db: Db):
                 "code": e.code,
                 "field": e.field
             }
-        )
\ No newline at end of file
+        )
+
+@router.get("/{key}", response_model = ChartOut)
+def chart_status(key: str, db: Db):
+    result = get_object_by_column(db, ChartResult, "cache_key", key)
+    if result is None:
+        raise not_found(key)
+    return to_response(result)
+
+
+def _lookup(key: str) -> dict | None:
+    with SessionLocal() as db:
+        result = get_object_by_column(db, ChartResult, "cache_key", key)
+        return None if result is None else to_response(result)
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), ensure_ascii = False)}\n\n"
+
+@router.get("/{key}/events")
+async def chart_events(key: str, request: Request):
+    # Server-Sent Events：狀態改變時送出 status 事件，READY / FAILED 後結束
+    #   以輪詢 DB 取得狀態 (背景 worker 可能在別的行程)，查詢丟到 threadpool 不卡 event loop
+    current = await run_in_threadpool(_lookup, key)
+    if current is None:
+        raise not_found(key)
+
+    async def stream():
+        nonlocal current
+        last_status = None
+        start = last_sent = time.monotonic()
+        while True:
+            if current["status"] != last_status:
+                yield _sse("status", current)
+                last_status = current["status"]
+                last_sent = time.monotonic()
+            if last_status in DONE:
+                return
+            now = time.monotonic()
+            if now - start > SSE_TIMEOUT_SECONDS:
+                yield _sse("timeout", {"key": key, "status": last_status})
+                return
+            if now - last_sent > SSE_KEEPALIVE_SECONDS:
+                yield ": keepalive\n\n"
+                last_sent = now
+            if await request.is_disconnected():
+                return
+            await asyncio.sleep(SSE_POLL_SECONDS)
+            current = await run_in_threadpool(_lookup, key) or current
+
+    return StreamingResponse(
+        stream(),
+        media_type = "text/event-stream",
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
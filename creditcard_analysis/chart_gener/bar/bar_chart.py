@@ -8,10 +8,9 @@ from pathlib import Path
 import matplotlib.pyplot as plt 
 import matplotlib.ticker as mticker
 # from ..utils import get_path
-from ...database import engine
 from ...utils import ChartPoint
 from .raw_sql import build_sql_raw
-from ..utils import _validate_identifier, _safe_filename, _divisor_and_unit, add_share_and_growth, label_zh
+from ..utils import _validate_identifier, _safe_filename, _divisor_and_unit, add_share_and_growth, label_zh, read_chart_frames
 
 
 
@@ -48,7 +47,12 @@ def bar_draw(
         age_level
     ) 
     
-    ym = pd.read_sql(ym_sql, engine)
+    # 年月範圍與圖表資料 (啟用記憶體 cube 時不查 DB)
+    ym, df = read_chart_frames(
+        "bar", sql, ym_sql, params,
+        x_axis = x_axis, value = value, topn = topn,
+        start_month = start_month, end_month = end_month, industry = industry, age_level = age_level
+    )
     earliest_ym = ym.loc[0, 'earliest_ym']
     latest_ym = ym.loc[0, 'latest_ym']
 
@@ -61,8 +65,7 @@ def bar_draw(
     else:
         period = f"{earliest_ym}-{latest_ym}"
 
-    # 3) 查資料（記得帶 params)
-    df = pd.read_sql(sql, engine, params = params)
+    # 3) 檢查資料
     if df.empty:
         raise ValueError("查無資料，請調整條件")
     
@@ -117,6 +120,6 @@ def bar_draw(
     path = out_dir / filename
 
     fig.savefig(path, dpi = 300)
-    plt.close()
+    plt.close(fig)
     print("Save to:", path)
     return f"/chart_storage/bar/{filename}", points
\ No newline at end of file
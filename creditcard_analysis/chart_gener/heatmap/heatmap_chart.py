@@ -8,9 +8,8 @@ import pandas as pd
 import seaborn as sns
 from pathlib import Path 
 import matplotlib.pyplot as plt 
-from ...database import engine
 from ...utils import ChartPoint 
-from ..utils import _validate_identifier, _safe_filename, label_zh 
+from ..utils import _validate_identifier, _safe_filename, label_zh, read_chart_frames
 from ..heatmap import build_sql_for_heatmap
 
 plt.rcParams['font.sans-serif'] = ['PingFang TC', 'HeiTi TC', 'Arial Unicode MS', 'Microsoft JhengHei', 'sans-serif']
@@ -55,7 +54,12 @@ def heatmap_draw(
         age_level
     )
 
-    ym = pd.read_sql(ym_sql, engine)
+    # 年月範圍與圖表資料 (啟用記憶體 cube 時不查 DB)
+    ym, df = read_chart_frames(
+        "heatmap", sql, ym_sql, params,
+        x_axis = x_axis, y_axis = y_axis, value = value, value2 = value2,
+        start_month = start_month, end_month = end_month, industry = industry, age_level = age_level
+    )
     earliest_ym = ym.loc[0, 'earliest_ym']
     latest_ym = ym.loc[0, 'latest_ym']
 
@@ -69,7 +73,6 @@ def heatmap_draw(
         period = f"{earliest_ym}-{latest_ym}"
     
     # 3) 畫圖
-    df = pd.read_sql(sql, engine, params = params)
     if df.empty:
         raise ValueError("查無資料，請調整條件")
     
@@ -107,6 +110,6 @@ def heatmap_draw(
     path = out_dir / filename
 
     fig.savefig(path, dpi = 300)
-    plt.close() 
+    plt.close(fig)
 
     return f"/chart_storage/heatmap/{filename}", points
\ No newline at end of file
@@ -1,5 +1,5 @@
 from sqlalchemy import text 
-from ..utils import clamp, where_sql_params, check_valid_column
+from ..utils import clamp, where_sql_params, check_valid_column, grouped_source, pick_table, YM_RANGE_SQL
 
 def build_sql_for_heatmap(
         x_axis     : str,
@@ -20,30 +20,33 @@ def build_sql_for_heatmap(
         start_month, end_month, industry, age_level
     )
 
-    order_clause = "ORDER BY industry, age_level" 
+    # 分組與篩選只用到兩個以下維度時改查彙總表
+    table = pick_table([x_axis, y_axis], start_month, end_month, industry, age_level)
+    source, labels, sorts = grouped_source(
+        [x_axis, y_axis],
+        f"SUM({value}) AS sum_value, SUM({value2}) AS sum_value2",
+        where_sql,
+        table
+    )
+
+    # 依維度表的 sort_order 排序；有年齡層時年齡層優先
+    order_clause = f"ORDER BY {sorts[x_axis]}, {sorts[y_axis]}" 
     if x_axis == "age_level":
-        order_clause = f"ORDER BY age_level ASC, industry"
+        order_clause = f"ORDER BY {sorts[x_axis]} ASC, {sorts[y_axis]}"
     elif y_axis == "age_level":
-        order_clause = f"ORDER BY age_level ASC, industry"
+        order_clause = f"ORDER BY {sorts[y_axis]} ASC, {sorts[x_axis]}"
 
 
     sql = f"""
         SELECT
-            {x_axis} AS industry,
-            {y_axis} AS age_level,
-            SUM({value}) / NULLIF(SUM({value2}), 0)  AS avg_amount
-        FROM clean_data
-        {where_sql}
-        GROUP BY {x_axis}, {y_axis}
+            {labels[x_axis]} AS industry,
+            {labels[y_axis]} AS age_level,
+            g.sum_value / NULLIF(g.sum_value2, 0)  AS avg_amount
+        FROM {source}
         {order_clause}
     """
 
-    ym_sql = """
-        SELECT 
-            MIN(ym) AS earliest_ym,
-            MAX(ym) AS latest_ym
-        FROM clean_data
-    """
+    ym_sql = YM_RANGE_SQL
 
 
     return text(sql), text(ym_sql), params
\ No newline at end of file
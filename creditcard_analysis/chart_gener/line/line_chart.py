@@ -9,10 +9,9 @@ from typing import Sequence
 from pathlib import Path 
 import matplotlib.pyplot as plt 
 import matplotlib.ticker as mticker
-from ...database import engine
 from ...utils import ChartIn, ChartPoint
 from .raw_sql import build_sql_for_line
-from ..utils import _validate_identifier, _safe_filename, _divisor_and_unit, add_share_and_growth, label_zh
+from ..utils import _validate_identifier, _safe_filename, _divisor_and_unit, add_share_and_growth, label_zh, read_chart_frames
 
 plt.rcParams['font.sans-serif'] = ['PingFang TC', 'HeiTi TC', 'Arial Unicode MS', 'Micorsoft JhengHei', 'sans-serif']
 plt.rcParams['axes.unicode_minus'] = False 
@@ -52,7 +51,12 @@ def line_draw(
         age_level   = age_level
     )
 
-    ym = pd.read_sql(ym_sql, engine)
+    # 年月範圍與圖表資料 (啟用記憶體 cube 時不查 DB)
+    ym, df = read_chart_frames(
+        "line", sql, ym_sql, params,
+        x_axis = x_axis, value = value, topn = topn,
+        start_month = start_month, end_month = end_month, industry = industry, age_level = age_level
+    )
     earliest_ym = ym.loc[0, "earliest_ym"]
     latest_ym   = ym.loc[0, "latest_ym"]
 
@@ -65,8 +69,7 @@ def line_draw(
     else:
         period = f"{earliest_ym}-{latest_ym}"
     
-    # 3) 查要畫圖的資料
-    df = pd.read_sql(sql, engine, params = params)
+    # 3) 檢查要畫圖的資料
     if df.empty:
         raise ValueError("查無資料，請調整條件")
     
@@ -137,5 +140,5 @@ def line_draw(
     path = out_dir / filename 
 
     fig.savefig(path, dpi = 300, bbox_inches = 'tight')
-    plt.close()
+    plt.close(fig)
     return f"/chart_storage/line/{filename}", points
\ No newline at end of file
@@ -1,5 +1,5 @@
 from sqlalchemy import text 
-from ..utils import clamp, where_sql_params, check_valid_column, DIM_COLS, METRIC_COLS 
+from ..utils import clamp, where_sql_params, check_valid_column, grouped_source, pick_table, YM_RANGE_SQL, DIM_COLS, METRIC_COLS 
 
 def build_sql_for_line(
     x_axis     : str,
@@ -26,16 +26,18 @@ def build_sql_for_line(
     is_time_x = (x_axis == "ym")
     default_topn = 20    
     eff_topn = clamp(topn if topn is not None else default_topn, 1, 200)
-    order_clause = "ORDER BY x ASC" # if is_time_x else "ORDER BY raw_amount DESC"
+    # 分組與篩選只用到兩個以下維度時改查彙總表
+    table = pick_table([x_axis], start_month, end_month, industry, age_level)
+    source, labels, sorts = grouped_source([x_axis], f"SUM({value}) AS raw_amount", where_sql, table)
+    # 維度依維度表的標準順序 (sort_order)，年月依時間
+    order_clause = f"ORDER BY {sorts[x_axis]} ASC" # if is_time_x else "ORDER BY raw_amount DESC"
     limit_clause = "" if is_time_x else "LIMIT :limit"
 
     sql = f"""
         SELECT
-            {x_axis} AS x,
-            SUM({value}) AS raw_amount
-        FROM clean_data 
-        {where_sql}
-        GROUP BY {x_axis}
+            {labels[x_axis]} AS x,
+            g.raw_amount
+        FROM {source}
         {order_clause}
         {limit_clause}
     """
@@ -43,11 +45,6 @@ def build_sql_for_line(
     if not is_time_x:
         params['limit'] = eff_topn
 
-    ym_sql = f"""
-        SELECT 
-            MIN(ym) AS earliest_ym,
-            MAX(ym) AS latest_ym
-        FROM clean_data 
-    """
+    ym_sql = YM_RANGE_SQL
     
     return text(sql), text(ym_sql), params
\ No newline at end of file
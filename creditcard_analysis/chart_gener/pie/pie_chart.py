@@ -6,10 +6,9 @@ matplotlib.use("Agg", force = True)
 import pandas as pd 
 from pathlib import Path 
 import matplotlib.pyplot as plt 
-from ...database import engine
 from ...utils import ChartPoint
 from .raw_sql import build_sql_for_pie
-from ..utils import _validate_identifier, _safe_filename, _divisor_and_unit
+from ..utils import _validate_identifier, _safe_filename, _divisor_and_unit, read_chart_frames
 
 plt.rcParams['font.sans-serif'] = ['PingFang TC', 'HeiTi TC', 'Arial Unicode MS', 'Microsoft JhengHei', 'sans-serif']
 plt.rcParams['axes.unicode_minus'] = False
@@ -40,7 +39,12 @@ def pie_draw(
         age_level
     )
 
-    ym = pd.read_sql(ym_sql, engine)
+    # 年月範圍與圖表資料 (啟用記憶體 cube 時不查 DB)
+    ym, df = read_chart_frames(
+        "pie", sql, ym_sql, sql_params,
+        x_axis = x_axis, value = value, topn = topn,
+        start_month = start_month, end_month = end_month, industry = industry, age_level = age_level
+    )
     earliest_ym = ym.loc[0, 'earliest_ym']
     latest_ym = ym.loc[0, 'latest_ym']
 
@@ -54,7 +58,6 @@ def pie_draw(
         period = f"{earliest_ym}-{latest_ym}"
 
 
-    df = pd.read_sql(sql, engine, params = sql_params)
     if df.empty:
         raise ValueError("查無資料，請調整條件")
 
@@ -91,5 +94,5 @@ def pie_draw(
     path = out_dir / filename
 
     fig.savefig(path, dpi = 300)
-    plt.close()
+    plt.close(fig)
     return f"chart_storage/pie/{filename}", points
\ No newline at end of file
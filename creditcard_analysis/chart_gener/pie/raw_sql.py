@@ -1,5 +1,5 @@
 from sqlalchemy import text 
-from ..utils import clamp, where_sql_params, check_valid_column
+from ..utils import clamp, where_sql_params, check_valid_column, grouped_source, pick_table, YM_RANGE_SQL
 def build_sql_for_pie(
     x_axis     : str,
     value      : str,
@@ -26,6 +26,10 @@ def build_sql_for_pie(
     order_clause = "ORDER BY x ASC" if is_time_x else "ORDER BY amount DESC"
     limit_clause = "LIMIT :limit"
 
+    # 分組與篩選只用到兩個以下維度時改查彙總表
+    table = pick_table([x_axis], start_month, end_month, industry, age_level)
+    source, labels, _ = grouped_source([x_axis], f"SUM({value}) AS group_amount", where_sql, table)
+
     sql = f"""
     SELECT
         u.x,
@@ -39,19 +43,12 @@ def build_sql_for_pie(
             s.pct
         FROM (
             SELECT 
-                t.{x_axis} AS x,
-                ROUND((t.group_amount / totals.total_amount), 2) * 100 AS pct
-            FROM (
-                SELECT 
-                    {x_axis},
-                    SUM({value}) AS group_amount
-                FROM clean_data
-                {where_sql}
-                GROUP BY {x_axis}
-            ) t
+                {labels[x_axis]} AS x,
+                ROUND((g.group_amount / totals.total_amount), 2) * 100 AS pct
+            FROM {source}
             CROSS JOIN (
                 SELECT SUM({value}) AS total_amount
-                FROM clean_data
+                FROM {table}
                 {where_sql}
             ) totals
         ) s
@@ -61,14 +58,9 @@ def build_sql_for_pie(
     {limit_clause}
     """
 
-    if not is_time_x:
-        params['limit'] = eff_topn
+    # LIMIT 一律存在 (年月也只取前 topn 筆)，參數也要一律綁定
+    params['limit'] = eff_topn
 
-    ym_sql = """
-        SELECT 
-            MIN(ym) AS earliest_ym,
-            MAX(ym) AS latest_ym
-        FROM clean_data
-    """ 
+    ym_sql = YM_RANGE_SQL
 
     return text(sql), text(ym_sql), params
\ No newline at end of file
@@ -1,8 +1,36 @@
 import re, pandas as pd  
+from ..utils import ym_to_key
+from ..models import ROLLUPS
 
 DIM_COLS    = {"ym", "industry", "age_level"}
 METRIC_COLS = {"trans_count", "trans_total"}
 
+# clean_data 的維度欄位只存代碼 ({col}_id)，標籤 / 排序在維度表
+DIM_TABLES = {
+    "nation"   : "dim_nation",
+    "industry" : "dim_industry",
+    "age_level": "dim_age_level"
+}
+
+# 圖表欄位 -> clean_data / 彙總表裡的鍵欄位
+KEY_COLS = {
+    "ym"       : "ym_key",
+    "industry" : "industry_id",
+    "age_level": "age_level_id"
+}
+
+# ym_key (年 * 12 + 月 - 1) 轉回 'YYYYMM' 標籤
+def ym_label_sql(expr: str) -> str:
+    return f"CONCAT({expr} DIV 12, LPAD({expr} % 12 + 1, 2, '0'))"
+
+# 資料涵蓋的月份範圍：ym_key 有索引，MIN / MAX 只讀索引兩端
+YM_RANGE_SQL = f"""
+        SELECT
+            {ym_label_sql("MIN(ym_key)")} AS earliest_ym,
+            {ym_label_sql("MAX(ym_key)")} AS latest_ym
+        FROM clean_data
+    """
+
 LABEL_ZH = {
     "ym"         : "年月",
     "industry"   : "產業別",
@@ -68,27 +96,96 @@ def where_sql_params(
     age_level  : str | None = None
 ):
     conds: list[str] = []
-    params: dict[str, str] = {}
+    params: dict[str, str | int] = {}
+    # 月份範圍比對整數鍵 (ym_key 有索引)
     if start_month is not None:
-        conds.append("ym>= :yf")
-        params['yf'] = start_month 
+        conds.append("ym_key >= :yf")
+        params['yf'] = ym_to_key(start_month)
     
     if end_month is not None:
-        conds.append("ym <= :yt")
-        params['yt'] = end_month 
+        conds.append("ym_key <= :yt")
+        params['yt'] = ym_to_key(end_month)
     
     if industry is not None:
-        conds.append("industry = :industry")
+        conds.append("industry_id = (SELECT id FROM dim_industry WHERE label = :industry)")
         params['industry'] = industry 
     
     if age_level is not None:
-        conds.append("age_level = :age_level")
+        conds.append("age_level_id = (SELECT id FROM dim_age_level WHERE label = :age_level)")
         params['age_level'] = age_level
     
     where_sql = ("WHERE " + " AND ".join(conds)) if conds else ""
 
     return where_sql, params 
 
+def pick_table(
+    cols       : list[str],
+    start_month: str | None = None,
+    end_month  : str | None = None,
+    industry   : str | None = None,
+    age_level  : str | None = None
+) -> str:
+    # 分組欄位加上篩選欄位都在彙總表裡時查最小的那張彙總表，否則查 clean_data
+    needed = {KEY_COLS[c] for c in cols}
+    if start_month is not None or end_month is not None:
+        needed.add("ym_key")
+    if industry is not None:
+        needed.add("industry_id")
+    if age_level is not None:
+        needed.add("age_level_id")
+
+    for table, keys in ROLLUPS.items():
+        if needed <= set(keys):
+            return table
+    return "clean_data"
+
+def grouped_source(cols: list[str], aggs: str, where_sql: str, table: str = "clean_data") -> tuple[str, dict[str, str], dict[str, str]]:
+    # 先在 clean_data (或彙總表) 依代碼分組，再把分組後的少量結果 join 回維度表取標籤
+    #   回傳 (FROM 子句, 欄位 -> 標籤運算式, 欄位 -> 排序運算式)，分組結果的別名為 g
+    keys, joins = [], []
+    labels: dict[str, str] = {}
+    sorts : dict[str, str] = {}
+    for col in cols:
+        if col in DIM_TABLES:
+            keys.append((f"{col}_id", col))
+            joins.append(f"JOIN {DIM_TABLES[col]} d_{col} ON d_{col}.id = g.{col}")
+            labels[col] = f"d_{col}.label"
+            sorts[col]  = f"d_{col}.sort_order"
+        elif col == "ym":
+            # 依整數鍵分組 / 排序，標籤在分組後才組回 'YYYYMM'
+            keys.append(("ym_key", "ym_key"))
+            labels[col] = ym_label_sql("g.ym_key")
+            sorts[col]  = "g.ym_key"
+        else:
+            keys.append((col, col))
+            labels[col] = sorts[col] = f"g.{col}"
+
+    select_keys = ", ".join(f"{expr} AS {alias}" for expr, alias in keys)
+    group_keys  = ", ".join(expr for expr, _ in keys)
+    source = f"""(
+            SELECT {select_keys}, {aggs}
+            FROM {table}
+            {where_sql}
+            GROUP BY {group_keys}
+        ) g
+        {' '.join(joins)}"""
+    return source, labels, sorts
+
+def read_chart_frames(shape: str, sql, ym_sql, params: dict, **query) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # 回傳 (年月範圍, 圖表資料)；啟用記憶體 cube 時由 cube 計算 (結果與 SQL 相同)，否則查 DB
+    from ..olap import get_cube
+    cube = get_cube()
+    if cube is not None:
+        return cube.ym_range(), cube.query(shape, **query)
+
+    # 年月範圍：ETL 快照與資料版本相同時不查 MIN / MAX
+    from ..database import engine
+    from ..clean_data.dataset_snapshot import fresh_snapshot
+    with engine.connect() as conn:
+        snapshot = fresh_snapshot(conn)
+        ym = snapshot.ym_range() if snapshot is not None else pd.read_sql(ym_sql, conn)
+        return ym, pd.read_sql(sql, conn, params = params)
+
 def add_share_and_growth(df: pd.DataFrame, group_col: str, time_col: str | None = None):
     df = df.copy()
     
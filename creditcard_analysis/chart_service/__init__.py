@@ -1 +1 @@
-from .to_sql import record_to_sql, ChartParamsError
\ No newline at end of file
+from .to_sql import record_to_sql, prepare_chart, render_chart, draw_chart, complete_chart, fail_chart, to_response, ChartParamsError
@@ -0,0 +1,61 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from ..database import SessionLocal
+from ..models import ChartResult, ResultStatus
+from ..utils import ChartIn
+from .to_sql import render_chart, complete_chart, fail_chart
+from .single_flight import renew_lease, heartbeat
+
+# =========================
+# 非同步產圖：POST 只新增 PENDING 後回 202，SQL + 繪圖在背景 worker 執行
+#   完成 / 失敗 (含錯誤原因與 retry_after) 都寫回 ChartResult，client 以 GET /api/request/{key} 或 SSE 查詢
+#   狀態存在 DB，多個 uvicorn worker 時任何一個都查得到
+# =========================
+
+_executor: ThreadPoolExecutor | None = None
+_lock = threading.Lock()
+
+
+def render_workers() -> int:
+    return max(int(os.getenv("CHART_RENDER_WORKERS", "2")), 1)
+
+def executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers = render_workers(), thread_name_prefix = "chart-render")
+        return _executor
+
+def shutdown(wait: bool = True) -> None:
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait = wait)
+            _executor = None
+
+
+def run_render(result_id: int, payload: ChartIn, owner: str) -> str:
+    # 背景 worker：自己開 session，產圖成功寫 READY，任何錯誤寫 FAILED
+    #   排隊期間租約可能已過期被別人接手：開始前先延長租約，拿不到就不產
+    #   寫回 READY / FAILED 都以仍持有租約為條件，回傳 "LOST" 表示結果沒有寫回
+    with SessionLocal() as db:
+        result = db.get(ChartResult, result_id)
+        if result is None:
+            return "MISSING"
+        if not renew_lease(db, result_id, owner):
+            print(f"[WARN] 產圖租約已被接手或已結束，略過 (result_id = {result_id})")
+            return "LOST"
+        try:
+            with heartbeat(db.get_bind(), result_id, owner):
+                file_path, points = render_chart(payload)
+        except Exception as e:
+            db.rollback()
+            print(f"[WARN] 產圖失敗 (result_id = {result_id}，第 {result.attempts} 次)：{e}")
+            return ResultStatus.FAILED.value if fail_chart(db, result, e, owner) else "LOST"
+        # 產圖期間被回收 / 接手時不覆寫較新的狀態
+        return ResultStatus.READY.value if complete_chart(db, result, file_path, points, owner) else "LOST"
+
+def submit_render(result_id: int, payload: ChartIn, owner: str) -> Future:
+    return executor().submit(run_render, result_id, payload, owner)
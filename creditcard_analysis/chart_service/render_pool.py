@@ -0,0 +1,127 @@
+import os
+import warnings
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from ..utils import ChartIn, ChartPoint
+
+# =========================
+# 產圖行程池：matplotlib / seaborn 在獨立行程裡畫
+#   pyplot 是全域狀態，FastAPI threadpool 多執行緒同時畫圖不安全；繪圖又吃 CPU，放在行程裡才能用滿多核
+#   spawn 啟動 (不 fork 帶 DB 連線與執行緒的 API 行程)，initializer 先 import 繪圖套件、設定字型、暖好字型快取
+#   每個 worker 處理 CHART_RENDER_MAX_TASKS 張圖後換新行程，限制記憶體成長
+#   worker 沒有 API 行程的記憶體 cube：設定 OLAP_SNAPSHOT_DIR 時掛上共享快照，否則查 DB
+#   CHART_RENDER_PROCESSES 預設 CPU 核心數 - 1 (留一個核心給 API)；設為 0 不開行程池，在目前行程內畫 (以鎖串行 pyplot)
+#   子行程 import 套件不連 DB (database.py 第一次連線時才建資料庫)，只有查 SQL 產圖時才連
+# =========================
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock   = threading.Lock()
+_pyplot_lock = threading.Lock()
+_warm = False           # worker 行程內：initializer 是否已執行
+
+
+def default_processes() -> int:
+    # 單核心機器算出 0：直接在目前行程內畫
+    return max((os.cpu_count() or 1) - 1, 0)
+
+def render_processes() -> int:
+    # 每個 uvicorn worker 都會各開一組行程池；多個 worker 時請以環境變數依 worker 數調低，避免超過核心數
+    value = os.getenv("CHART_RENDER_PROCESSES")
+    if value is None or not value.strip():
+        return default_processes()
+    return max(int(value), 0)
+
+def max_tasks_per_child() -> int:
+    return max(int(os.getenv("CHART_RENDER_MAX_TASKS", "50")), 1)
+
+
+# ---------- worker 行程 ----------
+
+def init_worker() -> None:
+    global _warm
+    os.environ["MPLBACKEND"] = "Agg"
+    import matplotlib
+    matplotlib.use("Agg", force = True)
+    import matplotlib.pyplot as plt
+    from matplotlib import font_manager
+    import seaborn  # noqa: F401  (heatmap 用，先載入)
+    from .. import chart_gener  # noqa: F401  (各圖表模組 import 時設定 rcParams 字型)
+
+    # 字型查找 + 畫一張小圖：字型快取與 Agg renderer 在第一張真正的圖之前就準備好
+    font_manager.findfont(font_manager.FontProperties(family = plt.rcParams["font.sans-serif"]))
+    #   暖機圖缺字形的警告不用顯示
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        fig, ax = plt.subplots(figsize = (1, 1))
+        ax.set_title("暖機")
+        fig.canvas.draw()
+        plt.close(fig)
+    _warm = True
+
+def draw_in_worker(payload: ChartIn) -> tuple[str, list[ChartPoint] | None]:
+    # worker 行程沒有 API 行程的記憶體 cube；有設定共享快照時掛上最新版本，否則查 DB
+    from ..olap import cube_enabled, snapshot_dir, follow_snapshot
+    from .to_sql import draw_chart
+    root = snapshot_dir()
+    if cube_enabled() and root is not None:
+        try:
+            follow_snapshot(root)
+        except Exception as e:
+            print(f"[WARN] 產圖行程掛上 cube 快照失敗，改查 DB：{e}")
+    return draw_chart(payload)
+
+def worker_info() -> dict:
+    import matplotlib
+    return {
+        "pid"    : os.getpid(),
+        "warm"   : _warm,
+        "backend": matplotlib.get_backend(),
+        "fonts"  : list(matplotlib.rcParams["font.sans-serif"]),
+    }
+
+
+# ---------- API 行程 ----------
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers         = render_processes(),
+                mp_context          = mp.get_context("spawn"),
+                initializer         = init_worker,
+                max_tasks_per_child = max_tasks_per_child()
+            )
+            print(f"[INFO] 產圖行程池啟動：{render_processes()} 個 worker，每個處理 {max_tasks_per_child()} 張後更換")
+        return _pool
+
+def warm_up() -> None:
+    # 啟動時先把所有 worker 叫起來跑 initializer，不等結果
+    if render_processes() == 0:
+        return
+    pool = get_pool()
+    for _ in range(render_processes()):
+        pool.submit(worker_info)
+
+def shutdown(wait: bool = True) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait = wait, cancel_futures = not wait)
+            _pool = None
+
+def render(payload: ChartIn) -> tuple[str, list[ChartPoint] | None]:
+    if render_processes() == 0:
+        from .to_sql import draw_chart
+        with _pyplot_lock:
+            return draw_chart(payload)
+    try:
+        return get_pool().submit(draw_in_worker, payload).result()
+    except BrokenProcessPool:
+        # worker 異常結束 (例如 OOM)：丟掉壞掉的行程池，下一張圖重新建立
+        print("[WARN] 產圖行程池異常，重新建立")
+        shutdown(wait = False)
+        raise
@@ -0,0 +1,269 @@
+import os
+import time
+import uuid
+import socket
+import threading
+from concurrent.futures import Future, TimeoutError as WaitTimeout
+from datetime import datetime, timedelta
+from contextlib import contextmanager
+from sqlalchemy import select, update, and_, or_, case
+from sqlalchemy.orm import Session
+
+from ..models import ChartResult, ResultStatus
+from ..utils import get_object_by_column
+
+# =========================
+# 相同 cache_key 的併發請求只產一次圖
+#   同一個行程：cache_key -> Future，第一個請求產圖，其他執行緒等同一個 Future
+#   跨 worker：ChartResult 上的短租約 (lease_owner / lease_expires_at)，持有租約的才產圖
+#     其他 worker 輪詢 DB 等結果；租約過期 (持有者當掉) 時以條件式 UPDATE 搶下來重產
+#     開始產圖前重新延長租約 (排隊期間可能已過期)，產圖中由 heartbeat 定期延長
+#   產圖失敗寫 FAILED + 錯誤原因 + retry_after (指數退避)；連續 CHART_MAX_ATTEMPTS 次失敗後
+#     改等退避上限 CHART_RETRY_MAX_SECONDS，之後再接手時次數重新計算 (暫時性的錯誤不會讓圖永遠卡在 FAILED)
+#   LeaseReaper 定期把租約過期、沒人接手的 PENDING 改成 FAILED，GET / SSE 不會一直等下去
+# =========================
+
+WAIT_POLL_SECONDS = float(os.getenv("CHART_WAIT_POLL_SECONDS", "0.2"))
+
+_inflight: dict[str, Future] = {}
+_lock = threading.Lock()
+
+
+def lease_seconds() -> float:
+    return float(os.getenv("CHART_LEASE_SECONDS", "120"))
+
+def wait_seconds() -> float:
+    return float(os.getenv("CHART_WAIT_SECONDS", "60"))
+
+def lease_owner() -> str:
+    # host:pid:租約編號；同一個行程先後取得的租約也分得開 (排隊中的舊工作不會誤以為還持有)
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+def lease_fields() -> dict:
+    return {
+        "lease_owner"     : lease_owner(),
+        "lease_expires_at": datetime.now() + timedelta(seconds = lease_seconds())
+    }
+
+def release_fields() -> dict:
+    return {"lease_owner": None, "lease_expires_at": None}
+
+def reaper_seconds() -> float:
+    return float(os.getenv("CHART_REAPER_SECONDS", "30"))
+
+def max_attempts() -> int:
+    return max(int(os.getenv("CHART_MAX_ATTEMPTS", "3")), 1)
+
+def retry_max_seconds() -> float:
+    return float(os.getenv("CHART_RETRY_MAX_SECONDS", "600"))
+
+def retry_seconds(attempts: int) -> float:
+    # 第 n 次失敗後等 base * 2^(n-1) 秒，上限 CHART_RETRY_MAX_SECONDS；次數用完直接等上限
+    if attempts >= max_attempts():
+        return retry_max_seconds()
+    base = float(os.getenv("CHART_RETRY_SECONDS", "30"))
+    return min(base * 2 ** max(attempts - 1, 0), retry_max_seconds())
+
+def error_payload(error: BaseException | str) -> dict:
+    if isinstance(error, BaseException):
+        return {"type": type(error).__name__, "msg": str(error)[:500]}
+    return {"type": "LeaseExpired", "msg": error}
+
+def fail_fields(attempts: int, error: BaseException | str) -> dict:
+    # retry_after 一律有值：次數用完時等退避上限，之前的請求直接回 FAILED
+    return {
+        "status"     : ResultStatus.FAILED.value,
+        "error_json" : error_payload(error),
+        "retry_after": datetime.now() + timedelta(seconds = retry_seconds(attempts)),
+        **release_fields()
+    }
+
+def is_pending(result: ChartResult) -> bool:
+    return result.status in (ResultStatus.PENDING, ResultStatus.PENDING.value)
+
+def is_failed(result: ChartResult) -> bool:
+    return result.status in (ResultStatus.FAILED, ResultStatus.FAILED.value)
+
+def lease_expired(result: ChartResult) -> bool:
+    return result.lease_expires_at is None or result.lease_expires_at < datetime.now()
+
+def claimable(result: ChartResult) -> bool:
+    # PENDING 且租約過期 (還有剩餘次數；用完的由 expire_lease 標 FAILED)，或 FAILED 且已過 retry_after
+    if is_pending(result):
+        return (result.attempts or 0) < max_attempts() and lease_expired(result)
+    return is_failed(result) and result.retry_after is not None and result.retry_after <= datetime.now()
+
+
+# ---------- 同一個行程 ----------
+
+def coalesce(key: str, fn, timeout: float | None = None):
+    # 回傳 (結果, 是否由自己執行)；等別人的結果逾時回傳 (None, False)
+    with _lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+    if not leader:
+        try:
+            return future.result(timeout = timeout), False
+        except WaitTimeout:
+            return None, False
+    try:
+        out = fn()
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(out)
+        return out, True
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+
+
+# ---------- 跨 worker ----------
+
+def claim(db, result: ChartResult) -> bool:
+    # 條件式 UPDATE：租約過期的 PENDING 或可重試的 FAILED 才搶得到，同時只會有一個成功
+    #   次數用完、等過退避上限的 FAILED 重新從第 1 次算起
+    if not claimable(result):
+        return False
+    now = datetime.now()
+    limit = max_attempts()
+    res = db.execute(
+        update(ChartResult)
+        .where(
+            ChartResult.id == result.id,
+            or_(
+                and_(ChartResult.status == ResultStatus.PENDING,
+                     ChartResult.attempts < limit,
+                     or_(ChartResult.lease_expires_at.is_(None), ChartResult.lease_expires_at < now)),
+                and_(ChartResult.status == ResultStatus.FAILED, ChartResult.retry_after <= now)
+            )
+        )
+        .values(
+            status   = ResultStatus.PENDING.value,
+            attempts = case((ChartResult.attempts >= limit, 1), else_ = ChartResult.attempts + 1),
+            **lease_fields()
+        )
+        .execution_options(synchronize_session = False)
+    )
+    db.commit()
+    if res.rowcount != 1:
+        return False
+    db.refresh(result)
+    print(f"[INFO] 取得產圖租約：{result.cache_key[:12]} (第 {result.attempts} 次，{result.lease_owner})")
+    return True
+
+def renew_lease(db, result_id: int, owner: str) -> bool:
+    # 持有者延長租約；租約已被接手或圖已完成時回傳 False
+    res = db.execute(
+        update(ChartResult)
+        .where(
+            ChartResult.id == result_id,
+            ChartResult.lease_owner == owner,
+            ChartResult.status == ResultStatus.PENDING
+        )
+        .values(lease_expires_at = datetime.now() + timedelta(seconds = lease_seconds()))
+        .execution_options(synchronize_session = False)
+    )
+    db.commit()
+    return res.rowcount == 1
+
+@contextmanager
+def heartbeat(bind, result_id: int, owner: str, interval: float | None = None):
+    # 產圖期間每 1/3 租約時間延長一次；另開 session，不碰呼叫端的 session
+    interval = lease_seconds() / 3 if interval is None else interval
+    stop = threading.Event()
+
+    def beat() -> None:
+        while not stop.wait(interval):
+            try:
+                with Session(bind) as db:
+                    if not renew_lease(db, result_id, owner):
+                        print(f"[WARN] 產圖租約已失去 (result_id = {result_id})，停止延長")
+                        return
+            except Exception as e:
+                print(f"[WARN] 延長產圖租約失敗 (result_id = {result_id})：{e}")
+
+    thread = threading.Thread(target = beat, name = "chart-lease-heartbeat", daemon = True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join(timeout = 5)
+
+def wait_for(db, key: str, deadline: float) -> ChartResult | None:
+    # 輪詢到不再 PENDING (READY，或產圖失敗後保留的 FAILED + error_json / retry_after)、租約過期 (可接手) 或逾時
+    #   產圖失敗不會刪列；只有列被手動清掉時才回傳 None，呼叫端重新建立
+    while True:
+        db.rollback()       # 結束目前 transaction，才讀得到其他 worker 的 commit
+        result = get_object_by_column(db, ChartResult, "cache_key", key)
+        if result is None or not is_pending(result) or lease_expired(result):
+            return result
+        if time.monotonic() >= deadline:
+            return result
+        time.sleep(WAIT_POLL_SECONDS)
+
+
+# ---------- 租約回收 ----------
+
+def expire_lease(db, result: ChartResult) -> bool:
+    # 租約過期的 PENDING 改成 FAILED (條件式 UPDATE，已被接手或完成的不動)
+    res = db.execute(
+        update(ChartResult)
+        .where(
+            ChartResult.id == result.id,
+            ChartResult.status == ResultStatus.PENDING,
+            ChartResult.lease_expires_at < datetime.now()
+        )
+        .values(**fail_fields(result.attempts or 0, f"產圖租約過期 ({result.lease_owner})"))
+        .execution_options(synchronize_session = False)
+    )
+    db.commit()
+    if res.rowcount != 1:
+        return False
+    db.refresh(result)
+    return True
+
+def reap_expired(db, limit: int = 100) -> int:
+    # 回傳改成 FAILED 的筆數；走 (status, lease_expires_at) 索引
+    rows = db.execute(
+        select(ChartResult)
+        .where(ChartResult.status == ResultStatus.PENDING, ChartResult.lease_expires_at < datetime.now())
+        .order_by(ChartResult.lease_expires_at)
+        .limit(limit)
+    ).scalars().all()
+    reaped = sum(expire_lease(db, row) for row in rows)
+    if reaped:
+        print(f"[INFO] 回收過期的產圖租約：{reaped} 筆")
+    return reaped
+
+
+class LeaseReaper:
+    # 背景定期回收過期租約；失敗時下一輪再試
+    def __init__(self, interval: float | None = None, session_factory = None):
+        self.interval = reaper_seconds() if interval is None else interval
+        self.session_factory = session_factory
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target = self._run, name = "chart-lease-reaper", daemon = True)
+
+    def _run(self) -> None:
+        if self.session_factory is None:
+            from ..database import SessionLocal
+            self.session_factory = SessionLocal
+        while not self.stop_event.wait(self.interval):
+            try:
+                with self.session_factory() as db:
+                    reap_expired(db)
+            except Exception as e:
+                print(f"[WARN] 回收產圖租約失敗：{e}")
+
+    def start(self) -> "LeaseReaper":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        self.thread.join(timeout = 5)
@@ -1,9 +1,12 @@
-import json, hashlib 
+import json, time, hashlib 
 from fastapi.encoders import jsonable_encoder
+from sqlalchemy import update
 from sqlalchemy.exc import IntegrityError
 from ..models import ChartRequest, ChartResult, ResultStatus
 from ..utils import get_object_by_column, ChartIn, ChartType, ChartPoint
 from ..chart_gener import bar_draw, line_draw, pie_draw, heatmap_draw
+from .single_flight import (coalesce, claim, wait_for, wait_seconds, is_pending, lease_expired,
+                            expire_lease, heartbeat, lease_fields, release_fields, fail_fields)
 
 class ChartParamsError(Exception):
     def __init__(
@@ -43,7 +46,9 @@ def to_db_fields(p: ChartIn, cache_key: str):
         "cache_key"    : cache_key,
         "status"       : ResultStatus.PENDING.value,
         "file_path"    : None,
-        "create_by"    : p.create_by
+        "create_by"    : p.create_by,
+        "attempts"     : 1,
+        **lease_fields()
     }
 
 def to_db_request(p: ChartIn, result_id: int, cache_hit: bool):
@@ -55,110 +60,210 @@ def to_db_request(p: ChartIn, result_id: int, cache_hit: bool):
     }
     
     
-def record_to_sql(db, payload: ChartIn):
-    points: list[ChartPoint] | None = None
-    cache_key = _make_cache_key(payload)
-    result_fields = to_db_fields(payload, cache_key)
-    pf  = payload.params_json
-    f   = payload.filters
-    fig = payload.params_figure
-
-    x_axis = pf.x_axis.value
-    y_axis = pf.y_axis.value if pf.y_axis is not None else None
-    value  = pf.value.value  if pf.value is not None else None 
-    value2 = pf.value2.value if pf.value2 else None
-    
-    if payload.chart_type == ChartType.heatmap and y_axis is None:
+def validate_payload(payload: ChartIn) -> None:
+    pf = payload.params_json
+    if payload.chart_type == ChartType.heatmap and pf.y_axis is None:
         raise ChartParamsError(
             message = "heatmap 必須提供 y_axis",
             code    = "HEATMAP_MISSING_y_axis",
             field   = "y_axis"
             )
 
-    if payload.chart_type == ChartType.pie and y_axis is not None:
+    if payload.chart_type == ChartType.pie and pf.y_axis is not None:
         raise ChartParamsError(
             message = "pie 不需要 y_axis",
             code    = "PIE_NO_NEED_ y_axis",
             field   = "y_axis"
             )
 
+def to_response(result: ChartResult) -> dict:
+    status = ResultStatus(result.status) if not isinstance(result.status, ResultStatus) else result.status
+    failed = status == ResultStatus.FAILED
+    return {
+        "key"   : result.cache_key,
+        "url"   : result.file_path if status == ResultStatus.READY else None,
+        "points": result.points_json,
+        "status": status.value,
+        "error" : result.error_json if failed else None,
+        "retry_after": result.retry_after if failed else None
+    }
+
+# =========================
+# 產圖分三段：prepare (查快取 / 新增 PENDING) -> render (SQL + 繪圖，不碰 DB session) -> complete (寫回 READY)
+#   render 在產圖行程池執行 (pyplot 全域狀態不跨執行緒共用，也不受 GIL 限制)
+#   同步模式三段在同一個 request 內跑完；非同步模式 prepare 後就回 202，render / complete 交給背景 worker
+#   新增的 PENDING 帶產圖租約，相同 cache_key 的併發請求等持有者的結果 (見 single_flight.py)
+# =========================
+
+def prepare_chart(db, payload: ChartIn) -> tuple[ChartResult, bool]:
+    # 回傳 (ChartResult, 是否需要產圖)；快取命中時已記一筆 ChartRequest(cache_hit=True) 並 commit
+    #   新增的 PENDING 只 flush，由呼叫端決定何時 commit
+    validate_payload(payload)
+    cache_key = _make_cache_key(payload)
+
     # ===== 快取命中：直接回傳，但先記一筆 ChartRequest(cache_hit=True) =====
     exist = get_object_by_column(db, ChartResult, "cache_key", cache_key)
     if exist:
-        request_fields = to_db_request(payload, exist.id, cache_hit = True)
-        db.add(ChartRequest(**request_fields))
+        db.add(ChartRequest(**to_db_request(payload, exist.id, cache_hit = True)))
         db.commit()
-        return {
-            "key": cache_key, 
-            "url": exist.file_path if exist.status == ResultStatus.READY else None,
-            "points": exist.points_json
-        }
-    else:
-        # ===== 新增 ChartResult(PENDING) =====
-        try:   
-            pending = ChartResult(**result_fields)
-            db.add(pending)
-            db.flush()
-        except IntegrityError:
-            db.rollback()
-            exist = get_object_by_column(db, ChartResult, "cache_key", cache_key)
-            if not exist:
-                raise
-            request_fields = to_db_request(payload, exist.id, cache_hit = True)
-            db.add(ChartRequest(**request_fields))
-            db.commit()
-            return {"key": cache_key, "url": exist.file_path, "points": exist.points_json}
-
-        # ===== 繪圖 =====
-        if payload.chart_type == ChartType.bar:
-            file_path, points = bar_draw(
-                x_axis = x_axis, value = value, 
-                title       = fig.set_title,
-                topn        = f.topn,
-                start_month = f.start_month,
-                end_month   = f.end_month,
-                industry    = f.industry,
-                age_level   = f.age_level         
-            )
-        elif payload.chart_type == ChartType.line:
-            file_path, points = line_draw(
-                x_axis      = x_axis, value = value,
-                title       = fig.set_title,
-                topn        = f.topn,
-                start_month = f.start_month,
-                end_month   = f.end_month,
-                industry    = f.industry,
-                age_level   = f.age_level
-            )
-        elif payload.chart_type == ChartType.pie:
-            file_path, points = pie_draw(
-                x_axis      = x_axis, value = value,
-                title       = fig.set_title,
-                topn        = f.topn,
-                start_month = f.start_month,
-                end_month   = f.end_month,
-                industry    = f.industry,
-                age_level   = f.age_level
-            )
-        elif payload.chart_type == ChartType.heatmap:
-            file_path, points = heatmap_draw(
-                x_axis, y_axis, value, value2,
-                fig.set_title,
-                f.start_month,
-                f.end_month,
-                f.industry,
-                f.age_level 
-            )
+        return exist, False
 
-        pending.file_path = file_path
-        pending.status = ResultStatus.READY.value
-        pending.points_json = jsonable_encoder(points) if points is not None else None
-        request_fields = to_db_request(payload, pending.id, cache_hit = False)
-        db.add(ChartRequest(**request_fields))
+    # ===== 新增 ChartResult(PENDING) =====
+    try:
+        pending = ChartResult(**to_db_fields(payload, cache_key))
+        db.add(pending)
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        exist = get_object_by_column(db, ChartResult, "cache_key", cache_key)
+        if not exist:
+            raise
+        db.add(ChartRequest(**to_db_request(payload, exist.id, cache_hit = True)))
         db.commit()
+        return exist, False
 
-        return {
-            "key": cache_key, 
-            "url": file_path, 
-            "points": pending.points_json
-        }
\ No newline at end of file
+    db.add(ChartRequest(**to_db_request(payload, pending.id, cache_hit = False)))
+    return pending, True
+
+def render_chart(payload: ChartIn) -> tuple[str, list[ChartPoint] | None]:
+    # 交給產圖行程池 (見 render_pool.py)；關閉行程池時在目前行程內畫
+    from .render_pool import render
+    return render(payload)
+
+def draw_chart(payload: ChartIn) -> tuple[str, list[ChartPoint] | None]:
+    pf  = payload.params_json
+    f   = payload.filters
+    fig = payload.params_figure
+
+    x_axis = pf.x_axis.value
+    y_axis = pf.y_axis.value if pf.y_axis is not None else None
+    value  = pf.value.value  if pf.value is not None else None
+    value2 = pf.value2.value if pf.value2 else None
+
+    if payload.chart_type == ChartType.bar:
+        return bar_draw(
+            x_axis = x_axis, value = value,
+            title       = fig.set_title,
+            topn        = f.topn,
+            start_month = f.start_month,
+            end_month   = f.end_month,
+            industry    = f.industry,
+            age_level   = f.age_level
+        )
+    elif payload.chart_type == ChartType.line:
+        return line_draw(
+            x_axis      = x_axis, value = value,
+            title       = fig.set_title,
+            topn        = f.topn,
+            start_month = f.start_month,
+            end_month   = f.end_month,
+            industry    = f.industry,
+            age_level   = f.age_level
+        )
+    elif payload.chart_type == ChartType.pie:
+        return pie_draw(
+            x_axis      = x_axis, value = value,
+            title       = fig.set_title,
+            topn        = f.topn,
+            start_month = f.start_month,
+            end_month   = f.end_month,
+            industry    = f.industry,
+            age_level   = f.age_level
+        )
+    elif payload.chart_type == ChartType.heatmap:
+        return heatmap_draw(
+            x_axis, y_axis, value, value2,
+            fig.set_title,
+            f.start_month,
+            f.end_month,
+            f.industry,
+            f.age_level
+        )
+    raise ChartParamsError(message = f"不支援的圖表類型：{payload.chart_type}", field = "chart_type")
+
+def _finish_owned(db, result: ChartResult, owner: str | None, values: dict) -> bool:
+    # 條件式 UPDATE：仍持有租約 (且還是 PENDING) 才寫入；租約已被回收或接手時不動，回傳 False
+    #   不論成功與否都重新讀取，result 反映 DB 目前的狀態
+    owner = result.lease_owner if owner is None else owner
+    res = db.execute(
+        update(ChartResult)
+        .where(
+            ChartResult.id == result.id,
+            ChartResult.lease_owner == owner,
+            ChartResult.status == ResultStatus.PENDING
+        )
+        .values(**values)
+        .execution_options(synchronize_session = False)
+    )
+    db.commit()
+    db.refresh(result)
+    if res.rowcount != 1:
+        print(f"[WARN] 產圖租約已失去，結果不寫回 (result_id = {result.id}，目前狀態 {to_response(result)['status']})")
+        return False
+    return True
+
+def complete_chart(db, result: ChartResult, file_path: str, points: list[ChartPoint] | None,
+                   owner: str | None = None) -> bool:
+    return _finish_owned(db, result, owner, {
+        "file_path"  : file_path,
+        "status"     : ResultStatus.READY.value,
+        "points_json": jsonable_encoder(points) if points is not None else None,
+        "error_json" : None,
+        "retry_after": None,
+        **release_fields()
+    })
+
+def fail_chart(db, result: ChartResult, error: BaseException | str, owner: str | None = None) -> bool:
+    # 寫 FAILED + 錯誤原因 + retry_after，之後的請求過了這個時間才重產
+    return _finish_owned(db, result, owner, fail_fields(result.attempts or 0, error))
+
+
+def _render_owned(db, payload: ChartIn, result: ChartResult) -> dict:
+    # 持有租約：先 commit PENDING，其他 worker 才看得到而改為等待；產圖中 heartbeat 延長租約
+    #   寫回結果時仍持有租約才寫，否則回傳 DB 上較新的狀態
+    db.commit()
+    owner = result.lease_owner
+    try:
+        with heartbeat(db.get_bind(), result.id, owner):
+            file_path, points = render_chart(payload)
+    except Exception as e:
+        # 產圖失敗不留下 PENDING：寫 FAILED，等待中的請求一起拿到失敗原因
+        db.rollback()
+        print(f"[WARN] 產圖失敗 (result_id = {result.id}，第 {result.attempts} 次)：{e}")
+        fail_chart(db, result, e, owner)
+        return to_response(result)
+    complete_chart(db, result, file_path, points, owner)
+    return to_response(result)
+
+def _record(db, payload: ChartIn) -> tuple[int, dict]:
+    # 回傳 (result_id, response)；別的 worker 正在產同一張圖時等它的結果
+    #   租約過期或 FAILED 已到 retry_after 就接手重產；次數用完的過期租約直接標 FAILED
+    result, created = prepare_chart(db, payload)
+    deadline = time.monotonic() + wait_seconds()
+    while True:
+        if not created and claim(db, result):
+            created = True
+        if created:
+            return result.id, _render_owned(db, payload, result)
+        if is_pending(result) and lease_expired(result):
+            expire_lease(db, result)
+        if not is_pending(result) or time.monotonic() >= deadline:
+            return result.id, to_response(result)
+        result = wait_for(db, result.cache_key, deadline)
+        if result is None:
+            # 列已不在 (手動清除快取)：重新建立 PENDING
+            result, created = prepare_chart(db, payload)
+
+def record_to_sql(db, payload: ChartIn):
+    # 同步模式：同一行程內相同 cache_key 的併發請求共用一次產圖，等待者另記一筆 cache_hit
+    validate_payload(payload)
+    key = _make_cache_key(payload)
+    out, leader = coalesce(key, lambda: _record(db, payload), timeout = wait_seconds())
+    if out is None:
+        # 等同行程的產圖逾時：改走 DB 租約 (查快取 / 等待 / 接手)
+        return _record(db, payload)[1]
+    result_id, response = out
+    if not leader:
+        db.add(ChartRequest(**to_db_request(payload, result_id, cache_hit = True)))
+        db.commit()
+    return response
@@ -0,0 +1,102 @@
+import time
+import resource
+import argparse
+import multiprocessing as mp
+import pandas as pd
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from .clean import DATA_DIR, COLS_MAP, NUM_COLS, load_csv, iter_csv_chunks, clean_data, normalize_frame, new_imputer
+from .bench_load import synthetic_frame
+
+# =========================
+# 讀檔 + 清理的記憶體 / 時間量測 (每次在全新的子行程執行，peak RSS 才不會互相影響)
+#   python -m creditcard_analysis.clean_data.bench_clean --rows 5000000
+#   python -m creditcard_analysis.clean_data.bench_clean --rows 5000000 --median-drift --chunk-rows 100000
+# =========================
+
+
+def write_synthetic_csv(rows: int, out_dir: Path) -> Path:
+    path = out_dir / f"bench_clean_{rows}.csv"
+    if path.exists():
+        return path
+
+    df = synthetic_frame(rows)
+    # 與原始檔相同：中文欄名、金額帶千分位 (需加引號)
+    df["trans_total"] = df["trans_total"].map("{:,}".format)
+    df = df.rename(columns = {v: k for k, v in COLS_MAP.items()})
+    out_dir.mkdir(parents = True, exist_ok = True)
+    df.to_csv(path, index = False, encoding = "utf-8-sig")
+    print(f"[INFO] 產生合成資料：{path} ({path.stat().st_size / 1024 / 1024:,.0f} MB)")
+    return path
+
+
+def _peak_rss_mb() -> float:
+    # Linux 的 ru_maxrss 單位為 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure(csv_path: Path) -> dict:
+    baseline = _peak_rss_mb()
+    start = time.perf_counter()
+    df = clean_data(load_csv(csv_path))
+    seconds = time.perf_counter() - start
+    return {
+        "rows"        : len(df),
+        "seconds"     : round(seconds, 2),
+        "baseline_mb" : round(baseline),
+        "peak_rss_mb" : round(_peak_rss_mb()),
+        "frame_mb"    : round(df.memory_usage(deep = True).sum() / 1024 / 1024)
+    }
+
+
+def median_drift(csv_path: Path, chunk_rows: int) -> list[dict]:
+    # 串流估計的中位數 vs 整欄 median()；rank_error 為估計值在真實分佈中的分位數與 0.5 的差距
+    imputer = new_imputer()
+    for chunk in iter_csv_chunks(csv_path, chunk_rows):
+        imputer.partial_fit(normalize_frame(chunk))
+
+    full = normalize_frame(load_csv(csv_path))
+    results = []
+    for col in NUM_COLS:
+        values = full[col].dropna()
+        exact  = values.median()
+        approx = imputer.sketches[col].median()
+        results.append({
+            "column"    : col,
+            "exact"     : exact,
+            "approx"    : round(approx, 1),
+            "rel_error" : f"{abs(approx - exact) / abs(exact):.4%}" if exact else None,
+            "rank_error": f"{abs((values < approx).mean() - 0.5):.4%}",
+            "centroids" : imputer.sketches[col].centroids
+        })
+    return results
+
+
+def run(rows: int, out_dir: Path) -> dict:
+    csv_path = write_synthetic_csv(rows, out_dir)
+    ctx = mp.get_context("spawn")
+    with ProcessPoolExecutor(max_workers = 1, mp_context = ctx) as pool:
+        return pool.submit(_measure, csv_path).result()
+
+
+def main():
+    p = argparse.ArgumentParser(description = "Benchmark load_csv + clean_data peak memory")
+    p.add_argument("--rows", type = int, default = 5_000_000, help = "合成資料筆數")
+    p.add_argument("--out_dir", default = str(DATA_DIR), help = "合成 CSV 存放資料夾 (重複執行時沿用)")
+    p.add_argument("--median-drift", action = "store_true", help = "比較串流估計中位數與精確中位數")
+    p.add_argument("--chunk-rows", type = int, default = 100_000, help = "--median-drift 時每批筆數")
+    args = p.parse_args()
+
+    out_dir = Path(args.out_dir).expanduser().resolve()
+    if args.median_drift:
+        results = median_drift(write_synthetic_csv(args.rows, out_dir), args.chunk_rows)
+        print(pd.DataFrame(results).to_string(index = False))
+        return
+
+    result = run(args.rows, out_dir)
+    print(pd.DataFrame([result]).to_string(index = False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from ..database import engine
+from ..models import DIMENSIONS
+from .clean import write_to_mysql, LOADERS
+
+# =========================
+# 匯入方式效能比較
+#   python -m creditcard_analysis.clean_data.bench_load --rows 200000
+# =========================
+
+INDUSTRIES = ["食", "衣", "住", "行", "文教康樂", "百貨", "其他"]
+AGE_LEVELS = ["未滿20歲", "20(含)-25歲", "25(含)-30歲", "30(含)-35歲", "35(含)-40歲",
+              "40(含)-45歲", "45(含)-50歲", "50(含)-55歲", "55(含)-60歲", "60(含)-65歲", "65(含)-70歲", "70(含)以上"]
+
+
+def synthetic_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    per_month = len(INDUSTRIES) * len(AGE_LEVELS)
+    idx = np.arange(rows)
+    month = idx // per_month
+    year, mon = 1900 + month // 12, month % 12 + 1
+
+    return pd.DataFrame({
+        "ym"         : [f"{y}{m:02d}" for y, m in zip(year, mon)],
+        "nation"     : "臺灣",
+        "industry"   : np.array(INDUSTRIES)[(idx // len(AGE_LEVELS)) % len(INDUSTRIES)],
+        "age_level"  : np.array(AGE_LEVELS)[idx % len(AGE_LEVELS)],
+        "trans_count": rng.integers(1_000, 5_000_000, rows, dtype = np.int64),
+        "trans_total": rng.integers(1_000_000, 9_000_000_000, rows, dtype = np.int64)
+    })
+
+
+def encoded_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # 與正式匯入相同的欄位 (維度代碼)；直接用 category 代碼，不把合成標籤寫進正式的維度表
+    df = df.copy()
+    for col, (id_col, _) in DIMENSIONS.items():
+        df[col] = df[col].astype("category").cat.codes.astype("int16") + 1
+    return df.rename(columns = {col: id_col for col, (id_col, _) in DIMENSIONS.items()})
+
+
+def run(rows: int, table_name: str, loaders: list[str]) -> list[dict]:
+    df = encoded_frame(synthetic_frame(rows))
+    results = []
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS `{table_name}`"))
+        conn.execute(text(f"CREATE TABLE `{table_name}` LIKE `clean_data`"))
+    try:
+        for loader in loaders:
+            with engine.begin() as conn:
+                conn.execute(text(f"TRUNCATE TABLE `{table_name}`"))
+
+            start = time.perf_counter()
+            write_to_mysql(df, table_name, loader)
+            seconds = time.perf_counter() - start
+
+            with engine.connect() as conn:
+                count = conn.execute(text(f"SELECT COUNT(*) FROM `{table_name}`")).scalar_one()
+            results.append({
+                "loader"      : loader,
+                "rows"        : count,
+                "seconds"     : round(seconds, 3),
+                "rows_per_sec": round(count / seconds) if seconds > 0 else None
+            })
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS `{table_name}`"))
+
+    return results
+
+
+def main():
+    p = argparse.ArgumentParser(description = "Benchmark clean_data loaders (insert / infile / executemany)")
+    p.add_argument("--rows", type = int, default = 200_000, help = "合成資料筆數")
+    p.add_argument("--table_name", default = "clean_data_bench", help = "暫存測試資料表 (結束後刪除)")
+    p.add_argument("--loaders", nargs = "+", default = list(LOADERS), choices = LOADERS)
+    args = p.parse_args()
+
+    results = run(args.rows, args.table_name, args.loaders)
+    print(pd.DataFrame(results).to_string(index = False))
+
+
+if __name__ == "__main__":
+    main()
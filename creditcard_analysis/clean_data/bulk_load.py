@@ -0,0 +1,149 @@
+import os
+import re
+import csv
+import tempfile
+import pymysql
+import pandas as pd
+
+from .. import database
+from ..models import CLEAN_DATA_KEY
+
+
+# LOCAL INFILE 被 client / server 關閉時 MySQL 回傳的錯誤碼
+LOCAL_INFILE_DISABLED = {1148, 2068, 3948}
+
+PACKET_HEADROOM = 0.8   # max_allowed_packet 只用八成，預留 SQL 本身與跳脫字元的空間
+
+_IDENT = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class LocalInfileDisabled(RuntimeError):
+    pass
+
+
+def quote_ident(name: str) -> str:
+    if not _IDENT.match(name):
+        raise ValueError(f"invalid table / column name: {name!r}")
+    return f"`{name}`"
+
+def upsert_columns(columns) -> list[str]:
+    # 自然鍵重複時要覆蓋的欄位 (量值欄位)
+    return [c for c in columns if c not in CLEAN_DATA_KEY and c != "id"]
+
+def connect(local_infile: bool = False) -> pymysql.connections.Connection:
+    return pymysql.connect(
+        user         = database.username,
+        password     = database.password,
+        host         = database.host,
+        port         = database.port,
+        database     = database.database,
+        charset      = "utf8mb4",
+        local_infile = local_infile,
+        autocommit   = False
+    )
+
+def max_allowed_packet(conn) -> int:
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT @@max_allowed_packet")
+        return int(cursor.fetchone()[0])
+
+def write_tsv(df: pd.DataFrame, path: str) -> None:
+    df.to_csv(
+        path,
+        sep            = "\t",
+        header         = False,
+        index          = False,
+        lineterminator = "\n",
+        na_rep         = "\\N",
+        quoting        = csv.QUOTE_NONE,
+        escapechar     = "\\",
+        encoding       = "utf-8"
+    )
+
+def estimate_row_bytes(df: pd.DataFrame, sample: int = 1000) -> int:
+    head = df.head(sample)
+    if head.empty:
+        return 1
+    text = head.to_csv(sep = "\t", header = False, index = False, lineterminator = "\n")
+    # executemany 展開成 VALUES (...),(...)：每欄多兩個引號與逗號，每列多括號
+    per_row = len(text.encode("utf-8")) / len(head)
+    return int(per_row + 3 * len(df.columns) + 4)
+
+# =========================
+# LOAD DATA LOCAL INFILE
+# =========================
+
+def load_data_infile(df: pd.DataFrame, table_name: str = "clean_data") -> int:
+    cols = ", ".join(quote_ident(c) for c in df.columns)
+    fd, tsv_path = tempfile.mkstemp(prefix = f"{table_name}_", suffix = ".tsv")
+    os.close(fd)
+    try:
+        write_tsv(df, tsv_path)
+        sql = (
+            # REPLACE：自然鍵重複時以檔案內容覆蓋
+            f"LOAD DATA LOCAL INFILE %s REPLACE INTO TABLE {quote_ident(table_name)} "
+            "CHARACTER SET utf8mb4 "
+            "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' "
+            "LINES TERMINATED BY '\\n' "
+            f"({cols})"
+        )
+        with connect(local_infile = True) as conn:
+            try:
+                with conn.cursor() as cursor:
+                    loaded = cursor.execute(sql, (tsv_path,))
+                conn.commit()
+            except (pymysql.err.OperationalError, pymysql.err.InternalError) as e:
+                conn.rollback()
+                if e.args and e.args[0] in LOCAL_INFILE_DISABLED:
+                    raise LocalInfileDisabled(str(e)) from e
+                raise
+        return loaded
+    finally:
+        os.unlink(tsv_path)
+
+# =========================
+# raw cursor executemany
+# =========================
+
+def executemany_insert(df: pd.DataFrame, table_name: str = "clean_data") -> int:
+    cols = list(df.columns)
+    placeholders = ", ".join(["%s"] * len(cols))
+    updates = ", ".join(f"{quote_ident(c)} = VALUES({quote_ident(c)})" for c in upsert_columns(cols))
+    sql = (
+        f"INSERT INTO {quote_ident(table_name)} "
+        f"({', '.join(quote_ident(c) for c in cols)}) VALUES ({placeholders})"
+        + (f" ON DUPLICATE KEY UPDATE {updates}" if updates else "")
+    )
+
+    inserted = 0
+    with connect() as conn:
+        packet = int(max_allowed_packet(conn) * PACKET_HEADROOM)
+        batch_size = max(1, packet // estimate_row_bytes(df))
+        print(f"[INFO] max_allowed_packet 可用 {packet:,} bytes，executemany 每批 {batch_size:,} 筆")
+        try:
+            with conn.cursor() as cursor:
+                # pymysql 會把 executemany 合併成多列 INSERT，長度上限跟著 packet 調整
+                cursor.max_stmt_length = packet
+                for i in range(0, len(df), batch_size):
+                    batch = df.iloc[i: i + batch_size]
+                    rows = list(zip(*(batch[c].tolist() for c in cols)))
+                    inserted += cursor.executemany(sql, rows) or 0
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return inserted
+
+def bulk_load(df: pd.DataFrame, table_name: str = "clean_data") -> int:
+    if df is None or df.empty:
+        print("[INFO] df 為空，略過匯入")
+        return 0
+
+    print(f"[INFO] 準備匯入筆數：{len(df)} (LOAD DATA LOCAL INFILE)")
+    try:
+        loaded = load_data_infile(df, table_name)
+    except LocalInfileDisabled as e:
+        print(f"[WARN] LOCAL INFILE 未啟用，改用 executemany：{e}")
+        loaded = executemany_insert(df, table_name)
+    print(f"[INFO] 匯入完成，影響 {loaded} 筆 (自然鍵重複的資料已更新)")
+    return loaded
@@ -1,16 +1,34 @@
-import json 
+import time
+import queue
+import threading
+import numpy as np
 import pandas as pd 
 import requests
 import argparse
 from pathlib import Path
+from typing import Callable, Iterable, Iterator
 from dataclasses import dataclass
+from contextlib import nullcontext
 from datetime import datetime 
 from sqlalchemy import MetaData, Table
 from sqlalchemy.dialects.mysql import insert as mysql_insert 
 
 from ..database import engine
 from .create_ssl import build_ssl_context, SSLContextAdapter
+from .stats import StageTimer
+from .json_stream import iter_json_frames
+from .downloader import Downloader, DownloadResult, DownloadError
+from .bulk_load import bulk_load, executemany_insert, upsert_columns
+from .watermark import source_key, get_watermark, set_watermark, get_ingested, set_ingested, drop_loaded_months, max_ym
+from .staging import staging_name, create_staging, build_indexes, key_hashes, validate_staging, swap_in, drop_staging
+from .dimensions import encode_dimensions
+from .rollup import refresh_rollups, ROLLUP_SOURCE
+from .dataset_version import touched_months, bump_version
+from .dataset_snapshot import snapshot_root, write_snapshot
+from .row_index import RowHashIndex, row_index_path, row_hashes
+from .fingerprint import LatestRows, month_fingerprints, db_month_fingerprints, changed_months, delete_months
 from ..utils import handling_missing_value, handling_duplicate_value
+from ..utils.impute import StreamingImputer
 
 
 
@@ -34,33 +52,40 @@ COLS_MAP = {
     "信用卡交易金額[新臺幣]": "trans_total"
 }
 
+JSON_LOAD_ROWS = 100_000
+
+DIM_COLS = ['nation', 'industry', 'age_level']
+NUM_COLS = ['trans_count', 'trans_total']
+
+# 讀檔時就只取需要的欄位、直接解析千分位數字，低基數維度欄位用 category 存
+#   年月固定讀成字串，分段解析時各段推斷出的型別才會一致
+CSV_READ_OPTS = {
+    "encoding" : 'utf-8-sig',
+    "na_values": ['', ' ', 'NaN', 'Na'],
+    "usecols"  : COLS_MAP.__contains__,
+    "thousands": ',',
+    "dtype"    : {"年月": str, "地區": "category", "信用卡產業別": "category", "年齡層": "category"}
+}
+
 # =========================
 # Downlaod CSV
 # =========================
-def download_csv(csv_url: str, save_dir: Path, cafile: str | None = None) -> Path:
-    save_dir.mkdir(parents = True, exist_ok = True)
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    file_path = save_dir / f"raw_open_data_{timestamp}.csv"
-    
+def download_csv(
+        csv_url : str,
+        save_dir: Path,
+        cafile  : str | None = None,
+        parallel: int = 1,
+        sha256  : str | None = None
+    ) -> DownloadResult:
     ctx = build_ssl_context(cafile, relax_strict = True)
     session = requests.Session()
     session.mount("https://", SSLContextAdapter(ctx))
 
+    downloader = Downloader(save_dir, session = session, parallel = parallel)
     try:
-        with session.get(csv_url, timeout = (10, 60), stream = True) as resp:
-            resp.raise_for_status()
-            with open(file_path, 'wb') as f:
-                for chunk in resp.iter_content(chunk_size = 1024 * 1024):
-                    if chunk:
-                        f.write(chunk)
-                        break 
-    except requests.exceptions.RequestException as e:
-        if file_path.exists():
-            file_path.unlink(missing_ok = True)
+        return downloader.download(csv_url, expected_sha256 = sha256)
+    except DownloadError as e:
         raise RuntimeError(f"下載失敗：{e}") from e 
-    
-    print(f"[INFO] CSV 已下載至：{file_path}")
-    return file_path
 
 
 # =========================
@@ -68,103 +93,228 @@ def download_csv(csv_url: str, save_dir: Path, cafile: str | None = None) -> Pat
 # =========================
 
 def load_csv(csv_path: Path) -> pd.DataFrame:
-    df = pd.read_csv(
-        csv_path,
-        encoding = 'utf-8-sig',
-        na_values = ['', ' ', 'NaN', 'Na']
-    )
+    df = pd.read_csv(csv_path, **CSV_READ_OPTS)
 
     return df 
 
+def iter_csv_chunks(csv_path: Path, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    reader = pd.read_csv(csv_path, chunksize = chunk_rows, **CSV_READ_OPTS)
+    with reader:
+        for chunk in reader:
+            yield chunk
+
 def load_json(json_file: Path) -> pd.DataFrame:
+    # 分批解碼後合併，不會同時持有完整的 records list 與 DataFrame
+    frames = list(iter_json_frames(json_file, JSON_LOAD_ROWS))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index = True)
+
+def iter_json_chunks(json_file: Path, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    yield from iter_json_frames(json_file, chunk_rows)
+
+def whole_file(load: Callable[..., pd.DataFrame], *args) -> Iterator[pd.DataFrame]:
+    # 整檔視為一批；用 generator 讓解析在 prefetch 的讀取計時內才開始
+    yield load(*args)
+
+def prefetch(chunks: Iterable[pd.DataFrame], timer: StageTimer, depth: int = 1) -> Iterator[pd.DataFrame]:
+    # 背景執行緒先讀下一批，主執行緒清理 / 匯入目前這批；queue 上限 depth 讓記憶體維持固定
+    q: queue.Queue = queue.Queue(maxsize = depth)
+    stop = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout = 0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            it = iter(chunks)
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    chunk = next(it)
+                except StopIteration:
+                    break
+                timer.add("read", len(chunk), time.perf_counter() - start)
+                if not put(chunk):
+                    return
+        except BaseException as e:
+            put(e)
+        finally:
+            put(done)
+
+    worker = threading.Thread(target = produce, name = "etl-reader", daemon = True)
+    worker.start()
     try:
-        with open(json_file, 'r', encoding = 'utf-8-sig') as f:
-            payload = json.load(f)
-            if isinstance(payload, dict):
-                found = None 
-                for k, v in payload.items():
-                    if isinstance(v, list) and (not v or isinstance(v[0], dict)):
-                        found = v
-                        break
-                if found is not None:
-                    payload = found 
-                elif payload and all(isinstance(v, dict) for v in payload.values()):
-                    payload = list[payload.values()]
-            if not isinstance(payload, list):
-                raise ValueError("JSON 無法轉成 records_list")
-        df = pd.DataFrame(payload)            
-    except json.JSONDecodeError: 
-        df = pd.read_json(json_file, lines = True, encoding = 'utf-8-sig')
-    
-    df = df.reset_index(drop = True)
-
-    return df 
+        while True:
+            item = q.get()
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        worker.join(timeout = 5)
 
 # =========================
 # Transform
 # =========================
 
-def clean_data(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.rename(columns = COLS_MAP)
+def normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # 只看單列的處理 (欄位改名 / 挑欄位 / 數值解析)，可以分段平行執行
+    #   淺複製後直接改欄位名稱，不複製資料也不動到傳入的 df
+    df = df.copy(deep = False)
+    df.columns = [COLS_MAP.get(c, c) for c in df.columns]
     
     missing = [c for c in EXPECTED if c not in df.columns]
     if missing:
         raise ValueError(f"[INFO] 缺失欄位：{missing}，目前欄位：{df.columns.tolist()}")
     
-    df = df[EXPECTED].copy()
-
-    for col in ['trans_count', 'trans_total']:
-        df[col] = (
-            df[col]
-            .astype(str)
-            .str.replace(',', ' ', regex = False)
-            .str.strip()
+    if df.columns.tolist() != EXPECTED:
+        df = df[EXPECTED]
+
+    # CSV 讀檔時已經解析成數字；JSON 等來源仍是字串時才逐欄轉換
+    for col in NUM_COLS:
+        if pd.api.types.is_numeric_dtype(df[col]):
+            continue
+        df[col] = pd.to_numeric(
+            df[col].astype(str).str.replace(',', '', regex = False).str.strip(),
+            errors = 'coerce'
         )
-        df[col] = pd.to_numeric(df[col], errors = 'coerce')
-    
-    num_cols = ['trans_count', 'trans_total']
-    str_cols = ['ym', 'nation', 'industry', 'age_level']
-    df = handling_missing_value(df, num_cols, str_cols)
+
+    return df 
+
+def finalize_frame(df: pd.DataFrame, imputer: StreamingImputer | None = None) -> pd.DataFrame:
+    # 中位數 / 眾數補值與去重要看整份資料，必須在合併後執行；分批時改用 imputer 學到的整體填補值
+    if imputer is None:
+        df = handling_missing_value(df, NUM_COLS, ['ym'] + DIM_COLS, copy = False)
+    else:
+        df = imputer.transform(df)
     df = handling_duplicate_value(df)
 
-    df = df.astype(
-        {
-            "ym"         : str,
-            "nation"     : str,
-            "industry"   : str,
-            "age_level"  : str,
-            "trans_count": "int64",
-            "trans_total": "int64"
-        }
-    ).copy()
+    # 只轉換型別不同的欄位，已經是目標型別的欄位不會再複製
+    changes = {}
+    if not pd.api.types.is_string_dtype(df["ym"]):
+        changes["ym"] = str
+    for col in DIM_COLS:
+        if not isinstance(df[col].dtype, pd.CategoricalDtype):
+            changes[col] = "category"
+    for col in NUM_COLS:
+        if df[col].dtype != "int64":
+            changes[col] = "int64"
+    if changes:
+        df = df.astype(changes)
 
     return df 
 
+def clean_data(df: pd.DataFrame) -> pd.DataFrame:
+    return finalize_frame(normalize_frame(df))
+
+def new_imputer() -> StreamingImputer:
+    return StreamingImputer(NUM_COLS, ['ym'] + DIM_COLS)
+
+def clean_streaming(df_raw: pd.DataFrame, imputer: StreamingImputer, deferred: list[pd.DataFrame]) -> pd.DataFrame:
+    # 邊清理邊學填補值；含缺失值的列先放進 deferred，等整份資料看完再用整體的填補值處理
+    df = normalize_frame(df_raw)
+    imputer.partial_fit(df)
+    na = df.isna().any(axis = 1)
+    if na.any():
+        deferred.append(df.loc[na])
+        df = df.loc[~na]
+    return finalize_frame(df, imputer)
+
+def clean_deferred(deferred: list[pd.DataFrame], imputer: StreamingImputer) -> pd.DataFrame | None:
+    if not deferred:
+        return None
+    imputer.report()
+    return finalize_frame(pd.concat(deferred, ignore_index = True), imputer)
+
+def clean_chunks(
+        chunks : Iterable[pd.DataFrame],
+        timer  : StageTimer,
+        imputer: StreamingImputer | None = None,
+        learn  : bool = True
+    ) -> Iterator[pd.DataFrame]:
+    # imputer 為 None：每批各自 clean_data (整檔模式只有一批，結果與原本相同)
+    # learn = True：串流學習填補值，延後的列最後一批送出；learn = False：imputer 已學好 (第二輪讀檔)，直接填補
+    deferred: list[pd.DataFrame] = []
+    for df_raw in chunks:
+        if df_raw.empty:
+            continue
+        with timer.track("clean") as t:
+            if imputer is None:
+                df = clean_data(df_raw)
+            elif learn:
+                df = clean_streaming(df_raw, imputer, deferred)
+            else:
+                df = finalize_frame(normalize_frame(df_raw), imputer)
+            t["rows"] = len(df)
+        if not df.empty:
+            yield df
+
+    if imputer is not None and learn:
+        with timer.track("clean") as t:
+            df = clean_deferred(deferred, imputer)
+            t["rows"] = 0 if df is None else len(df)
+        if df is not None and not df.empty:
+            yield df
+
 
 # =========================
 # Load DB 
 # =========================
 
-def insert_into_mysql(df: pd.DataFrame, table_name = "clean_data", chunk_size = 1000) -> None:
+def insert_into_mysql(df: pd.DataFrame, table_name = "clean_data", chunk_size = 1000, conn = None) -> None:
     if df is None or df.empty:
         print("[INFO] df 為空，略過匯入")
         return 
     
-    
+    # 維度欄位轉成代碼 (已轉過的不會再處理)
+    df = encode_dimensions(df)
     meta = MetaData()
-    table = Table(table_name, meta, autoload_with = engine)
+    table = Table(table_name, meta, autoload_with = conn if conn is not None else engine)
     records = df.to_dict(orient = 'records')
     total = len(records)
+    update_cols = upsert_columns(df.columns)
 
     print(f"[INFO] 準備匯入筆數：{total}")
 
-    with engine.begin() as conn:
+    # 呼叫端傳入 conn 時沿用它的 transaction，不自行 commit
+    with (nullcontext(conn) if conn is not None else engine.begin()) as conn:
         for i in range(0, total, chunk_size):
             batch = records[i: i + chunk_size]
-            stmt = mysql_insert(table).values(batch).prefix_with("IGNORE")
+            stmt = mysql_insert(table).values(batch)
+            stmt = stmt.on_duplicate_key_update(
+                {c: stmt.inserted[c] for c in update_cols}
+            )
             conn.execute(stmt)
     
-    print("[INFO] 匯入完成 (重複資料已自動略過)")
+    print("[INFO] 匯入完成 (自然鍵重複的資料已更新)")
+
+
+LOADERS = ("insert", "infile", "executemany")
+
+def write_to_mysql(df: pd.DataFrame, table_name = "clean_data", loader = "insert") -> None:
+    if df is not None and not df.empty:
+        df = encode_dimensions(df)
+    if loader == "insert":
+        insert_into_mysql(df, table_name)
+    elif loader == "infile":
+        bulk_load(df, table_name)
+    elif loader == "executemany":
+        if df is None or df.empty:
+            print("[INFO] df 為空，略過匯入")
+            return
+        executemany_insert(df, table_name)
+    else:
+        raise ValueError(f"loader 只支援 {', '.join(LOADERS)}")
 
 
 @dataclass
@@ -175,27 +325,255 @@ class ETLOptions:
     out_dir   : Path = DATA_DIR
     table_name: str = "clean_data"
     cafile    : str | None = None
+    chunk_rows: int | None = None
+    loader    : str = "insert"
+    strategy  : str = "watermark"
+    parallel  : int = 1
+    sha256    : str | None = None
+    pipeline  : bool = False
+    writers   : int = 2
+    workers   : int = 1
+    row_index : bool = True
 
 
-def run_etl(opts: ETLOptions) -> None:
+STRATEGIES = ("full", "watermark", "diff", "swap")
+
+
+def open_source(opts: ETLOptions) -> tuple[Callable[[], Iterable[pd.DataFrame]] | None, str | None]:
+    # 回傳 (可重複呼叫的讀取函式, 來源檔 sha256)；diff 模式需要讀第二次，未指定 chunk_rows 時整檔視為一批
+    # 來源檔 sha256 與上次「成功匯入」的相同且為增量策略時讀取函式回傳 None，整個 ETL 可以略過
+    #   以匯入成功為準而不是下載結果 (304)：下載成功但寫入失敗時，下次仍會重新匯入
     if opts.source == "csv_url":
         if not opts.url:
             raise ValueError("source = csv_url時，必須提供url")
         cafile: str | None = opts.cafile
-        csv_path = download_csv(opts.url, opts.out_dir, cafile)
-        df_raw = load_csv(csv_path)
+        result = download_csv(opts.url, opts.out_dir, cafile, opts.parallel, opts.sha256)
+        if (opts.strategy in ("watermark", "diff") and result.sha256
+                and result.sha256 == get_ingested(source_key(opts.source, opts.table_name))):
+            return None, result.sha256
+        csv_path = result.path
+        if opts.workers > 1:
+            from .parallel import load_csv_parallel
+            return (lambda: whole_file(load_csv_parallel, csv_path, opts.workers)), result.sha256
+        if opts.chunk_rows:
+            return (lambda: iter_csv_chunks(csv_path, opts.chunk_rows)), result.sha256
+        return (lambda: whole_file(load_csv, csv_path)), result.sha256
     elif opts.source == "json_path":
         if not opts.path:
             raise ValueError("source = json_path時，必須提供path")
-        df_raw = load_json(opts.path)
-        print(f"[DEBUG] 原始：{len(df_raw)}")
+        if opts.chunk_rows:
+            return (lambda: iter_json_chunks(opts.path, opts.chunk_rows)), None
+        return (lambda: whole_file(load_json, opts.path)), None
     else:
         raise ValueError("source 只支援 csv_url 及 json_path")
-    
-    df = clean_data(df_raw)
-    print(f"[DEBUG] 清理後：{len(df)}")
-    insert_into_mysql(df, opts.table_name)
-    
+
+
+def open_row_index(opts: ETLOptions) -> RowHashIndex | None:
+    # 只有 full / watermark 是單純往上累加；diff 會刪除月份、swap 會換掉整張表，索引另外處理
+    if not opts.row_index or opts.strategy not in ("full", "watermark"):
+        return None
+    return RowHashIndex(row_index_path(opts.out_dir, opts.table_name))
+
+def save_row_index(index: RowHashIndex | None) -> None:
+    if index is None:
+        return
+    index.save()
+    print(f"[INFO] 雜湊索引略過重複列：{index.skipped} 筆，索引共 {len(index)} 筆")
+
+
+def _load_incremental(opts: ETLOptions, read_chunks, timer: StageTimer) -> set[str]:
+    wm_key = source_key(opts.source, opts.table_name)
+    watermark = get_watermark(wm_key) if opts.strategy == "watermark" else None
+    if watermark is not None:
+        print(f"[INFO] 水位線：{watermark}，只匯入之後的月份")
+
+    total = 0
+    loaded_yms: list[str] = []
+    months: set[str] = set()
+    imputer = new_imputer() if opts.chunk_rows else None
+    index = open_row_index(opts)
+    raw = (drop_loaded_months(df_raw, watermark) for df_raw in prefetch(read_chunks(), timer))
+    for df in clean_chunks(raw, timer, imputer):
+        if index is not None:
+            with timer.track("dedupe") as t:
+                t["rows"] = len(df)
+                df = index.filter_new(df)
+            if df.empty:
+                continue
+        with timer.track("insert") as t:
+            write_to_mysql(df, opts.table_name, opts.loader)
+            t["rows"] = len(df)
+        total += len(df)
+        loaded_yms.append(max_ym(df))
+        months |= touched_months(df)
+    print(f"[DEBUG] 清理後：{total}")
+    save_row_index(index)
+
+    loaded_yms = [ym for ym in loaded_yms if ym is not None]
+    if loaded_yms:
+        set_watermark(wm_key, max(loaded_yms))
+        print(f"[INFO] 水位線更新為：{max(loaded_yms)}")
+    else:
+        print("[INFO] 沒有新的月份需要匯入")
+    return months
+
+
+def _load_changed_months(opts: ETLOptions, read_chunks, timer: StageTimer) -> set[str]:
+    # 第一輪：算來源每月指紋 (整檔模式順便留下清理結果，不用讀第二次)
+    #   以自然鍵去重 (留最後一筆，與 upsert 相同) 後才算，跨批的重複鍵也一樣
+    latest = LatestRows()
+    cached: list[pd.DataFrame] | None = None if opts.chunk_rows else []
+    imputer = new_imputer() if opts.chunk_rows else None
+    for df in clean_chunks(prefetch(read_chunks(), timer), timer, imputer):
+        with timer.track("fingerprint") as t:
+            latest.add(df)
+            t["rows"] = len(df)
+        if cached is not None:
+            cached.append(df)
+
+    incoming = month_fingerprints(latest.frame())
+    if incoming.empty:
+        print("[INFO] 來源沒有資料")
+        return set()
+
+    with engine.connect() as conn:
+        existing = db_month_fingerprints(conn, opts.table_name)
+    changed = changed_months(incoming, existing)
+    if not changed:
+        print("[INFO] 各月份指紋皆相同，沒有需要重新匯入的月份")
+        return set()
+    print(f"[INFO] 需重新匯入月份 ({len(changed)})：{', '.join(changed)}")
+
+    # 第二輪：同一個 transaction 內刪除並重新匯入有異動的月份 (分批時沿用第一輪學到的填補值)
+    if cached is not None:
+        frames = iter(cached)
+    else:
+        frames = clean_chunks(prefetch(read_chunks(), timer), timer, imputer, learn = False)
+
+    with engine.begin() as conn:
+        deleted = delete_months(conn, opts.table_name, changed)
+        print(f"[INFO] 刪除舊資料：{deleted} 筆")
+        for df in frames:
+            part = df.loc[df["ym"].isin(changed)]
+            with timer.track("insert") as t:
+                insert_into_mysql(part, opts.table_name, conn = conn)
+                t["rows"] = len(part)
+        set_watermark(source_key(opts.source, opts.table_name), str(incoming.index.max()), conn = conn)
+
+    # 刪除過月份，索引裡的雜湊已不代表 DB 現況，下次 full / watermark 執行時重新累積
+    RowHashIndex.invalidate(row_index_path(opts.out_dir, opts.table_name))
+    return set(changed)
+
+
+def _load_swap(opts: ETLOptions, read_chunks, timer: StageTimer) -> None:
+    # 整檔載入 staging 表、建索引、驗證筆數後以 RENAME TABLE 一次切換，線上表不會被半途讀到
+    staging = staging_name(opts.table_name)
+    with engine.connect() as conn:
+        deferred = create_staging(conn, opts.table_name)
+        conn.commit()
+    print(f"[INFO] 建立 {staging}，延後建立索引：{', '.join(deferred) or '無'}")
+
+    try:
+        hashes: list[np.ndarray] = []
+        loaded_yms: list[str] = []
+        imputer = new_imputer() if opts.chunk_rows else None
+        index = RowHashIndex(row_index_path(opts.out_dir, opts.table_name), fresh = True)
+        for df in clean_chunks(prefetch(read_chunks(), timer), timer, imputer):
+            with timer.track("insert") as t:
+                write_to_mysql(df, staging, opts.loader)
+                t["rows"] = len(df)
+            hashes.append(key_hashes(df))
+            index.add(row_hashes(df))
+            loaded_yms.append(max_ym(df))
+        expected = len(np.unique(np.concatenate(hashes))) if hashes else 0
+
+        with engine.connect() as conn:
+            with timer.track("index") as t:
+                build_indexes(conn, opts.table_name, deferred)
+                t["rows"] = expected
+            staged = validate_staging(conn, opts.table_name, expected)
+            swap_in(conn, opts.table_name)
+            conn.commit()
+        print(f"[INFO] 已切換 {staging} -> {opts.table_name}，共 {staged} 筆")
+    except Exception:
+        with engine.connect() as conn:
+            drop_staging(conn, opts.table_name)
+            conn.commit()
+        raise
+
+    # 線上表已整張換成這次的資料，雜湊索引跟著重建
+    save_row_index(index)
+
+    loaded_yms = [ym for ym in loaded_yms if ym is not None]
+    if loaded_yms:
+        set_watermark(source_key(opts.source, opts.table_name), max(loaded_yms))
+    # 整張表換掉：回傳 None 讓讀取端整份重新載入
+    return None
+
+
+def publish(months: set[str] | None) -> int:
+    # 重建彙總表並推進資料版本，同一個 transaction：讀到新版本時彙總表也是新的
+    with engine.begin() as conn:
+        rows = sum(refresh_rollups(conn).values())
+        bump_version(months, conn)
+    return rows
+
+
+def save_snapshot(opts: ETLOptions) -> None:
+    # 資料已提交，快照失敗只影響讀取端 (版本對不上會改查 DB)，不讓 ETL 失敗
+    try:
+        write_snapshot(snapshot_root(opts.out_dir))
+    except Exception as e:
+        print(f"[WARN] clean_data 快照寫入失敗：{e}")
+
+
+def run_etl(opts: ETLOptions) -> None:
+    if opts.chunk_rows is not None and opts.chunk_rows <= 0:
+        raise ValueError("chunk_rows 必須為正整數")
+    if opts.strategy not in STRATEGIES:
+        raise ValueError(f"strategy 只支援 {', '.join(STRATEGIES)}")
+    if opts.workers > 1 and (opts.chunk_rows or opts.pipeline):
+        raise ValueError("workers 為整檔平行解析，不能與 chunk_rows / pipeline 同時使用")
+    if opts.workers > 1 and opts.source != "csv_url":
+        raise ValueError("workers 只支援 source = csv_url")
+
+    if opts.pipeline:
+        from .pipeline import run_pipeline
+        months, digest = run_pipeline(opts, writers = opts.writers)
+        if months is None:
+            print("[INFO] 來源檔案與上次匯入的相同，略過本次 ETL\n")
+            return
+        if opts.table_name == ROLLUP_SOURCE:
+            publish(months)
+            save_snapshot(opts)
+        if digest:
+            set_ingested(source_key(opts.source, opts.table_name), digest)
+        print("[INFO] ETL完成\n")
+        return
+
+    timer = StageTimer()
+    read_chunks, digest = open_source(opts)
+    if read_chunks is None:
+        print("[INFO] 來源檔案與上次匯入的相同，略過本次 ETL\n")
+        return
+
+    if opts.strategy == "diff":
+        months = _load_changed_months(opts, read_chunks, timer)
+    elif opts.strategy == "swap":
+        months = _load_swap(opts, read_chunks, timer)
+    else:
+        months = _load_incremental(opts, read_chunks, timer)
+
+    # 彙總表與資料版本都跟著 clean_data，匯入其他資料表時不動
+    if opts.table_name == ROLLUP_SOURCE:
+        with timer.track("rollup") as t:
+            t["rows"] = publish(months)
+        with timer.track("snapshot"):
+            save_snapshot(opts)
+    if digest:
+        set_ingested(source_key(opts.source, opts.table_name), digest)
+
+    timer.report()
     print("[INFO] ETL完成\n")
 
 
@@ -207,6 +585,19 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--out_dir", default = str(DATA_DIR), help = "下載檔案儲存資料夾(csv_url 模式用)")
     p.add_argument("--table_name", default = "clean_data", help = "匯入資料表名稱")
     p.add_argument("--cafile", default = None, help = "指定 CA bundle 檔案")
+    p.add_argument("--parallel", type = int, default = 1, help = "csv_url 模式：同時下載的 Range 區段數")
+    p.add_argument("--sha256", default = None, help = "csv_url 模式：預期的檔案 sha256，不符則中止")
+    p.add_argument("--pipeline", action = "store_true", help = "下載 / 解析清理 / 寫入 DB 三段同時進行 (full / watermark 策略)")
+    p.add_argument("--writers", type = int, default = 2, help = "pipeline 模式的 DB writer 執行緒數")
+    p.add_argument("--workers", type = int, default = 1, help = "csv_url 模式：以多個行程分段平行解析 / 清理 CSV")
+    p.add_argument("--no-row-index", dest = "row_index", action = "store_false",
+                   help = "full / watermark 策略不使用已匯入列的雜湊索引 (每列都送進 DB upsert)")
+    p.add_argument("--chunk-rows", "--chunk_rows", dest = "chunk_rows", type = int, default = None,
+                   help = "串流模式：每批讀取 / 清理 / 匯入的筆數 (未指定則整檔一次處理)")
+    p.add_argument("--loader", default = "insert", choices = LOADERS,
+                   help = "匯入方式：insert (SQLAlchemy INSERT ... ON DUPLICATE KEY UPDATE) / infile (LOAD DATA LOCAL INFILE，失敗時改用 executemany) / executemany")
+    p.add_argument("--strategy", default = "watermark", choices = STRATEGIES,
+                   help = "增量策略：watermark (只匯入水位線之後的月份) / diff (比對每月指紋，只重載有異動的月份) / full (整檔重新匯入) / swap (整檔載入 staging 表後原子切換)")
 
     return p
 
@@ -222,7 +613,16 @@ def main():
         path       = Path(args.path).expanduser().resolve() if args.path else None,
         out_dir    = Path(args.out_dir).expanduser().resolve(),
         table_name = args.table_name,
-        cafile     = args.cafile
+        cafile     = args.cafile,
+        chunk_rows = args.chunk_rows,
+        loader     = args.loader,
+        strategy   = args.strategy,
+        parallel   = args.parallel,
+        sha256     = args.sha256,
+        pipeline   = args.pipeline,
+        writers    = args.writers,
+        workers    = args.workers,
+        row_index  = args.row_index
     )
 
     run_etl(opts)
@@ -0,0 +1,144 @@
+import os
+import json
+import threading
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from functools import cached_property
+from sqlalchemy import text
+
+from ..models import DIMENSIONS, CleanedData
+from ..utils import key_to_ym
+from ..utils.versioned_dir import version_name, current_name, write_version, set_current, prune
+from .dataset_version import current_version
+
+# =========================
+# clean_data 欄式快照：ETL 完成後寫在原始檔旁 (raw_data/snapshot/v00000012/)
+#   每個欄位一個 .npy (維度為代碼)，dims.json 為代碼 -> 標籤 / 排序，meta.json 記資料版本
+#   讀取端 np.load(mmap_mode = "r")，不用再查 MySQL；版本與 dataset_version 相同才算新鮮
+# =========================
+
+COLUMNS = {
+    "ym_key"      : "int16",
+    "nation_id"   : "int16",
+    "industry_id" : "int16",
+    "age_level_id": "int16",
+    "trans_count" : "int64",
+    "trans_total" : "int64",
+}
+SNAPSHOT_SUBDIR = "snapshot"
+DEFAULT_ROOT    = Path(__file__).resolve().parent / "raw_data" / SNAPSHOT_SUBDIR
+KEEP_VERSIONS   = 2
+
+_open_lock = threading.Lock()
+_opened: "DatasetSnapshot | None" = None
+
+
+def snapshot_root(out_dir: Path | None = None) -> Path:
+    # DATASET_SNAPSHOT_DIR 優先 (ETL 與 API 不在同一台時指到共用目錄)，否則放在原始檔資料夾
+    env = os.getenv("DATASET_SNAPSHOT_DIR", "").strip()
+    if env:
+        return Path(env).expanduser().resolve()
+    return Path(out_dir) / SNAPSHOT_SUBDIR if out_dir is not None else DEFAULT_ROOT
+
+
+def write_snapshot(root: Path, engine = None) -> Path | None:
+    if engine is None:
+        from ..database import engine
+    # 版本與資料在同一個 transaction 讀，快照的版本號不會比內容新
+    with engine.connect() as conn:
+        version = current_version(conn)
+        name = version_name(version)
+        if current_name(root) == name:
+            print(f"[INFO] clean_data 快照已是版本 {version}，略過")
+            return root / name
+        df = pd.read_sql(text(f"SELECT {', '.join(COLUMNS)} FROM {CleanedData.__tablename__} ORDER BY ym_key"), conn)
+        dims = {
+            dim: pd.read_sql(text(f"SELECT id, label, sort_order FROM {model.__tablename__} ORDER BY sort_order, id"), conn)
+            for dim, (_, model) in DIMENSIONS.items()
+        }
+
+    def write(tmp: Path) -> None:
+        for col, dtype in COLUMNS.items():
+            np.save(tmp / f"{col}.npy", df[col].to_numpy(dtype = dtype))
+        (tmp / "dims.json").write_text(json.dumps(
+            {dim: d.to_dict(orient = "list") for dim, d in dims.items()}, ensure_ascii = False
+        ), encoding = "utf-8")
+        (tmp / "meta.json").write_text(json.dumps(
+            {"version": version, "rows": len(df), "columns": COLUMNS}
+        ), encoding = "utf-8")
+
+    target = write_version(root, name, write)
+    set_current(root, name)
+    prune(root, KEEP_VERSIONS)
+    print(f"[INFO] clean_data 快照已寫入：{target} ({len(df)} 筆，版本 {version})")
+    return target
+
+
+class DatasetSnapshot:
+    def __init__(self, path: Path):
+        self.path = path
+        meta = json.loads((path / "meta.json").read_text(encoding = "utf-8"))
+        self.version = int(meta["version"])
+        self.rows    = int(meta["rows"])
+        self.dims    = {dim: pd.DataFrame(d) for dim, d in json.loads((path / "dims.json").read_text(encoding = "utf-8")).items()}
+        self._columns: dict[str, np.ndarray] = {}
+
+    def column(self, name: str) -> np.ndarray:
+        if name not in self._columns:
+            self._columns[name] = np.load(self.path / f"{name}.npy", mmap_mode = "r")
+        return self._columns[name]
+
+    @cached_property
+    def ym_keys(self) -> np.ndarray:
+        return np.unique(self.column("ym_key"))
+
+    def year_months(self) -> list[str]:
+        return [key_to_ym(int(k)) for k in self.ym_keys]
+
+    def ym_range(self) -> pd.DataFrame:
+        # 與 YM_RANGE_SQL 相同格式
+        if len(self.ym_keys) == 0:
+            return pd.DataFrame({"earliest_ym": [None], "latest_ym": [None]})
+        return pd.DataFrame({
+            "earliest_ym": [key_to_ym(int(self.ym_keys[0]))],
+            "latest_ym"  : [key_to_ym(int(self.ym_keys[-1]))]
+        })
+
+    def labels(self, dim: str) -> list[str]:
+        # dims.json 已依 sort_order, id 排序
+        return self.dims[dim]["label"].tolist()
+
+    def frame(self, decode: bool = False) -> pd.DataFrame:
+        # ETL 驗證等需要整份資料時使用；decode = True 時維度換回標籤
+        df = pd.DataFrame({col: self.column(col) for col in COLUMNS})
+        if decode:
+            for dim, (col, _) in DIMENSIONS.items():
+                d = self.dims[dim]
+                df[col] = df[col].map(dict(zip(d["id"], d["label"])))
+            df = df.rename(columns = {col: dim for dim, (col, _) in DIMENSIONS.items()})
+        return df
+
+
+def open_snapshot(root: Path | None = None) -> DatasetSnapshot | None:
+    # CURRENT 沒變時沿用已開啟的快照
+    global _opened
+    root = snapshot_root() if root is None else root
+    name = current_name(root)
+    if name is None:
+        return None
+    with _open_lock:
+        if _opened is None or _opened.path != root / name:
+            _opened = DatasetSnapshot(root / name)
+        return _opened
+
+def fresh_snapshot(conn, root: Path | None = None) -> DatasetSnapshot | None:
+    # API 用：快照版本與 DB 的 dataset_version 相同才使用 (只查一列)，否則回傳 None 改查 DB
+    try:
+        snapshot = open_snapshot(root)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[WARN] clean_data 快照無法讀取，改查資料庫：{e}")
+        return None
+    if snapshot is None or snapshot.version != current_version(conn):
+        return None
+    return snapshot
@@ -0,0 +1,65 @@
+import pandas as pd
+from typing import Iterable
+from sqlalchemy import select, insert, update, func
+
+from ..database import engine
+from ..models import DatasetVersion, DatasetChange
+from ..utils import ym_to_key
+
+# =========================
+# 資料版本：ETL 寫完 clean_data 後 +1，並在 dataset_changes 記下異動月份
+#   months = None 表示整表重載 (swap)，讀取端需整份重新載入
+#   與彙總表重建放在同一個 transaction，讀到新版本時資料已全部可見
+# =========================
+
+VERSION_ID = 1      # dataset_version 只有一列
+
+
+def touched_months(df: pd.DataFrame) -> set[str]:
+    if df.empty:
+        return set()
+    return set(df["ym"].dropna().astype(str).unique())
+
+def current_version(conn) -> int:
+    table = DatasetVersion.__table__
+    version = conn.execute(select(table.c.version).where(table.c.id == VERSION_ID)).scalar_one_or_none()
+    return int(version or 0)
+
+def bump_version(months: Iterable[str] | None, conn = None) -> int:
+    if conn is None:
+        with engine.begin() as conn:
+            return bump_version(months, conn)
+
+    months = None if months is None else sorted(set(months))
+    table = DatasetVersion.__table__
+    # 鎖住版本列，兩個 ETL 同時結束時不會拿到同一個版本號
+    version = conn.execute(
+        select(table.c.version).where(table.c.id == VERSION_ID).with_for_update()
+    ).scalar_one_or_none()
+    if months is not None and not months:
+        return int(version or 0)
+
+    new_version = int(version or 0) + 1
+    if version is None:
+        conn.execute(insert(table).values(id = VERSION_ID, version = new_version))
+    else:
+        conn.execute(update(table).where(table.c.id == VERSION_ID).values(version = new_version, update_at = func.now()))
+
+    keys = [None] if months is None else [ym_to_key(ym) for ym in months]
+    conn.execute(insert(DatasetChange.__table__), [{"version": new_version, "ym_key": k} for k in keys])
+    print(f"[INFO] 資料版本更新為 {new_version}：" + ("整表重載" if months is None else f"{len(months)} 個月份"))
+    return new_version
+
+def changed_months(conn, since: int) -> tuple[int, set[int] | None]:
+    # since 之後 (不含) 的異動月份；有整表重載、或紀錄已被清掉對不上版本時回傳 None
+    table = DatasetChange.__table__
+    version = current_version(conn)
+    if version <= since:
+        return version, set()
+    rows = conn.execute(
+        select(table.c.version, table.c.ym_key).where(table.c.version > since, table.c.version <= version)
+    ).all()
+    versions = {r.version for r in rows}
+    if len(versions) != version - since or any(r.ym_key is None for r in rows):
+        return version, None
+    return version, {int(r.ym_key) for r in rows}
@@ -0,0 +1,84 @@
+import re
+import threading
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from ..database import engine
+from ..models import DIMENSIONS
+from ..utils import ym_keys
+
+# =========================
+# 維度表維護與編碼：清理後的標籤 -> SMALLINT 代碼
+#   新標籤在寫入前補進維度表 (INSERT IGNORE，多個 writer 同時新增也不會衝突)，
+#   代碼對照表快取在行程內，遇到沒看過的標籤才重新讀取
+# =========================
+
+# NCCC 開放資料的產業別順序；沒列到的新產業排在後面
+INDUSTRY_ORDER = ["食", "衣", "住", "行", "文教康樂", "百貨", "其他"]
+
+_cache: dict[str, dict[str, int]] = {}
+_lock = threading.Lock()
+
+
+def age_sort_order(label: str) -> int:
+    # 依年齡下限排序：未滿20歲 -> 0、20(含)-25歲 -> 20、80(含)歲以上 -> 80
+    if label.startswith("未滿"):
+        return 0
+    m = re.search(r"\d+", label)
+    return int(m.group()) if m else 999
+
+def sort_order_for(dim: str, label: str) -> int:
+    if dim == "age_level":
+        return age_sort_order(label)
+    if dim == "industry" and label in INDUSTRY_ORDER:
+        return INDUSTRY_ORDER.index(label)
+    return 999
+
+def _load(conn, dim: str) -> dict[str, int]:
+    model = DIMENSIONS[dim][1]
+    return {label: id_ for id_, label in conn.execute(select(model.id, model.label))}
+
+def dimension_codes(dim: str, labels) -> dict[str, int]:
+    labels = {str(v) for v in labels}
+    with _lock:
+        codes = _cache.get(dim, {})
+        if labels <= codes.keys():
+            return codes
+
+        model = DIMENSIONS[dim][1]
+        with engine.begin() as conn:
+            missing = labels - _load(conn, dim).keys()
+            if missing:
+                stmt = mysql_insert(model.__table__).prefix_with("IGNORE")
+                conn.execute(stmt, [{"label": v, "sort_order": sort_order_for(dim, v)} for v in sorted(missing)])
+                print(f"[INFO] {model.__tablename__} 新增：{', '.join(sorted(missing))}")
+            codes = _cache[dim] = _load(conn, dim)
+    return codes
+
+def encode_dimensions(df: pd.DataFrame) -> pd.DataFrame:
+    # 標籤欄位換成代碼欄位 (欄位順序不變)、ym 後面補上 ym_key；已經編碼過的 frame 原樣回傳
+    has_labels = any(col in df.columns for col in DIMENSIONS)
+    needs_key  = "ym" in df.columns and "ym_key" not in df.columns
+    if not has_labels and not needs_key:
+        return df
+    df = df.copy(deep = False)
+    if needs_key:
+        df.insert(df.columns.get_loc("ym") + 1, "ym_key", ym_keys(df["ym"]))
+    for col in DIMENSIONS:
+        if col not in df.columns:
+            continue
+        s = df[col] if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].astype("category")
+        s = s.cat.remove_unused_categories()
+        codes = dimension_codes(col, s.cat.categories)
+        # 每個 category 只查一次對照表，再用 codes 向量化展開
+        lookup = np.array([codes[str(v)] for v in s.cat.categories], dtype = "int16")
+        cat_codes = s.cat.codes.to_numpy()
+        # 缺值的 code 是 -1，直接索引會變成最後一個類別的代碼；維度是自然鍵的一部分，不能猜
+        missing = int((cat_codes < 0).sum())
+        if missing:
+            raise ValueError(f"{col} 有 {missing} 筆缺值，無法編碼成維度代碼 (應在清理階段補值或剔除)")
+        df[col] = lookup[cat_codes]
+    df.columns = [DIMENSIONS[c][0] if c in DIMENSIONS else c for c in df.columns]
+    return df
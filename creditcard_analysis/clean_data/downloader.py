@@ -0,0 +1,285 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import requests
+from pathlib import Path
+from dataclasses import dataclass
+from urllib.parse import urlparse, unquote
+from concurrent.futures import ThreadPoolExecutor
+
+
+MANIFEST_NAME = "manifest.json"
+BLOCK_SIZE    = 1024 * 1024
+STREAM_CHUNK  = 64 * 1024      # 網路串流每次寫入量，斷線時最多只損失這麼多
+NOT_MODIFIED  = object()
+
+
+@dataclass
+class DownloadResult:
+    path   : Path
+    changed: bool
+    size   : int
+    sha256 : str
+
+
+class DownloadError(RuntimeError):
+    pass
+
+class ChecksumMismatch(DownloadError):
+    pass
+
+
+# =========================
+# Manifest：記錄每個 URL 的 ETag / Last-Modified / 大小 / sha256 及未完成的續傳狀態
+# =========================
+
+def load_manifest(save_dir: Path) -> dict:
+    path = save_dir / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding = "utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(save_dir: Path, manifest: dict) -> None:
+    path = save_dir / MANIFEST_NAME
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii = False, indent = 2), encoding = "utf-8")
+    os.replace(tmp, path)
+
+def file_name_for(url: str) -> str:
+    name = Path(unquote(urlparse(url).path)).name
+    return name or "download.bin"
+
+def sha256_of(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _validators(headers) -> dict:
+    return {
+        "etag"         : headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified")
+    }
+
+def _total_size(resp: requests.Response, offset: int) -> int | None:
+    content_range = resp.headers.get("Content-Range")
+    if content_range and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        if total.isdigit():
+            return int(total)
+    length = resp.headers.get("Content-Length")
+    return int(length) + offset if length and length.isdigit() else None
+
+
+class Downloader:
+    def __init__(
+        self,
+        save_dir   : Path,
+        session    : requests.Session | None = None,
+        parallel   : int = 1,
+        max_retries: int = 3,
+        backoff    : float = 1.0,
+        timeout    : tuple[float, float] = (10, 60)
+    ):
+        self.save_dir    = save_dir
+        self.session     = session or requests.Session()
+        self.parallel    = max(1, parallel)
+        self.max_retries = max(1, max_retries)
+        self.backoff     = backoff
+        self.timeout     = timeout
+        self._lock       = threading.Lock()
+
+    def _update_entry(self, url: str, **fields) -> None:
+        with self._lock:
+            manifest = load_manifest(self.save_dir)
+            entry = manifest.setdefault(url, {})
+            for k, v in fields.items():
+                if v is None:
+                    entry.pop(k, None)
+                else:
+                    entry[k] = v
+            save_manifest(self.save_dir, manifest)
+
+    def _conditional_headers(self, entry: dict, dest: Path) -> dict:
+        # 本機檔案完整存在時才送條件式請求，否則 304 也沒檔案可用
+        if not entry or not dest.exists() or dest.stat().st_size != entry.get("size"):
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def download(self, url: str, expected_sha256: str | None = None) -> DownloadResult:
+        self.save_dir.mkdir(parents = True, exist_ok = True)
+        dest = self.save_dir / file_name_for(url)
+
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                return self._attempt(url, dest, expected_sha256)
+            except ChecksumMismatch:
+                raise
+            except (requests.exceptions.RequestException, DownloadError) as e:
+                if attempt == self.max_retries:
+                    raise DownloadError(f"下載失敗 ({attempt} 次)：{e}") from e
+                wait = self.backoff * 2 ** (attempt - 1)
+                print(f"[WARN] 下載中斷：{e}，{wait:.1f}s 後第 {attempt + 1} 次嘗試 (續傳)")
+                time.sleep(wait)
+
+    def _attempt(self, url: str, dest: Path, expected_sha256: str | None) -> DownloadResult:
+        entry = load_manifest(self.save_dir).get(url, {})
+        part  = dest.with_name(dest.name + ".part")
+        cond  = self._conditional_headers(entry, dest)
+
+        result = self._fetch(url, dest, part, cond, entry)
+        if result is NOT_MODIFIED and not self._cached_intact(entry, dest):
+            # 304 但本機檔案與 manifest 的 sha256 不同 (損毀或被換掉)：不帶條件重新下載
+            print(f"[WARN] 本機檔案與 manifest 的 sha256 不符，重新下載：{dest}")
+            dest.unlink(missing_ok = True)
+            result = self._fetch(url, dest, part, {}, entry)
+        return self._finish(url, dest, part, result, expected_sha256)
+
+    def _fetch(self, url: str, dest: Path, part: Path, cond: dict, entry: dict):
+        if self.parallel > 1 and not part.exists():
+            result = self._try_parallel(url, dest, part, cond, entry)
+            if result is not None:
+                return result
+        return self._stream(url, dest, part, cond, entry)
+
+    def _cached_intact(self, entry: dict, dest: Path) -> bool:
+        # manifest 沒有 sha256 (舊版本留下的) 也視為無法驗證
+        return bool(entry.get("sha256")) and dest.exists() and sha256_of(dest) == entry["sha256"]
+
+    # =========================
+    # 單一連線：可從 .part 續傳 (Range + If-Range)
+    # =========================
+
+    def _stream(self, url: str, dest: Path, part: Path, cond: dict, entry: dict):
+        headers = {}
+        offset = part.stat().st_size if part.exists() else 0
+        partial = entry.get("partial") or {}
+        validator = partial.get("etag") or partial.get("last_modified")
+
+        if offset and validator:
+            headers["Range"]    = f"bytes={offset}-"
+            headers["If-Range"] = validator
+        else:
+            offset = 0
+            headers.update(cond)
+
+        with self.session.get(url, headers = headers, timeout = self.timeout, stream = True) as resp:
+            if resp.status_code == 304:
+                return NOT_MODIFIED
+            if resp.status_code == 416 and offset:
+                # .part 已經比遠端檔案大 (遠端被換掉)，從頭來
+                part.unlink(missing_ok = True)
+                raise DownloadError("Range 不符合，重新下載")
+            resp.raise_for_status()
+
+            if resp.status_code != 206:
+                offset = 0
+            total = _total_size(resp, offset)
+            self._update_entry(url, partial = _validators(resp.headers) | {"size": total})
+
+            with open(part, "ab" if offset else "wb") as f:
+                for chunk in resp.iter_content(chunk_size = STREAM_CHUNK):
+                    if chunk:
+                        f.write(chunk)
+            return resp.headers, total
+
+    # =========================
+    # 多連線：HEAD 取得大小後切成多段 Range 同時下載
+    # =========================
+
+    def _try_parallel(self, url: str, dest: Path, part: Path, cond: dict, entry: dict):
+        head = self.session.head(url, headers = cond, timeout = self.timeout, allow_redirects = True)
+        if head.status_code == 304:
+            return NOT_MODIFIED
+        head.raise_for_status()
+
+        size = head.headers.get("Content-Length")
+        if head.headers.get("Accept-Ranges") != "bytes" or not size or not size.isdigit():
+            return None
+        size = int(size)
+        validator = head.headers.get("ETag") or head.headers.get("Last-Modified")
+        if size == 0 or not validator:
+            return None
+
+        self._update_entry(url, partial = None)
+        step = -(-size // self.parallel)
+        ranges = [(start, min(start + step, size) - 1) for start in range(0, size, step)]
+        with open(part, "wb") as f:
+            f.truncate(size)
+
+        def fetch(rng):
+            start, end = rng
+            headers = {"Range": f"bytes={start}-{end}", "If-Range": validator}
+            with self.session.get(url, headers = headers, timeout = self.timeout, stream = True) as resp:
+                resp.raise_for_status()
+                if resp.status_code != 206:
+                    raise DownloadError("遠端檔案在下載期間變更")
+                written = 0
+                with open(part, "r+b") as f:
+                    f.seek(start)
+                    for chunk in resp.iter_content(chunk_size = STREAM_CHUNK):
+                        if chunk:
+                            f.write(chunk)
+                            written += len(chunk)
+                if written != end - start + 1:
+                    raise DownloadError(f"區段 {start}-{end} 不完整：{written} bytes")
+
+        try:
+            with ThreadPoolExecutor(max_workers = self.parallel) as pool:
+                list(pool.map(fetch, ranges))
+        except Exception:
+            # 分段結果無法保證連續，清掉後交給單一連線重試
+            part.unlink(missing_ok = True)
+            raise
+        return head.headers, size
+
+    # =========================
+    # 驗證大小 / checksum 後原子替換，更新 manifest
+    # =========================
+
+    def _finish(self, url: str, dest: Path, part: Path, result, expected_sha256: str | None) -> DownloadResult:
+        if result is NOT_MODIFIED:
+            # 沿用的檔案已在 _attempt 比對過 manifest 的 sha256，這裡再比對預期值
+            entry = load_manifest(self.save_dir).get(url, {})
+            digest = entry["sha256"]
+            if expected_sha256 and digest.lower() != expected_sha256.lower():
+                raise ChecksumMismatch(f"sha256 不符：預期 {expected_sha256}，實際 {digest} (304 沿用的檔案)")
+            print(f"[INFO] 遠端檔案未變更 (304)，沿用：{dest}")
+            return DownloadResult(dest, False, entry.get("size", dest.stat().st_size), digest)
+
+        headers, total = result
+        size = part.stat().st_size
+        if total is not None and size != total:
+            raise DownloadError(f"檔案大小不符：預期 {total}，實際 {size}")
+
+        digest = sha256_of(part)
+        if expected_sha256 and digest.lower() != expected_sha256.lower():
+            part.unlink(missing_ok = True)
+            raise ChecksumMismatch(f"sha256 不符：預期 {expected_sha256}，實際 {digest}")
+
+        # 200 但內容與上次相同 (伺服器沒給 ETag 或 ETag 變了) 也算未變更
+        previous = load_manifest(self.save_dir).get(url, {}).get("sha256")
+        os.replace(part, dest)
+        validators = _validators(headers)
+        self._update_entry(
+            url,
+            path          = dest.name,
+            size          = size,
+            sha256        = digest,
+            etag          = validators["etag"],
+            last_modified = validators["last_modified"],
+            partial       = None
+        )
+        print(f"[INFO] 已下載至：{dest} ({size:,} bytes, sha256 {digest[:12]}…)")
+        return DownloadResult(dest, digest != previous, size, digest)
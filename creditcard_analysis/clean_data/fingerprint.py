@@ -0,0 +1,100 @@
+import zlib
+import pandas as pd
+from sqlalchemy import text, bindparam
+
+from .bulk_load import quote_ident
+
+
+DIM_KEY_COLS = ["nation", "industry", "age_level"]
+NATURAL_KEY  = ["ym", *DIM_KEY_COLS]
+FP_COLS      = ["rows", "sum_count", "sum_total", "dim_hash"]
+
+# =========================
+# 每月指紋：筆數 + 交易筆數 / 金額加總 + 維度組合雜湊
+#   各項都是加總，也能直接在 MySQL 端用同一公式算出來比對
+#   clean_data 以 (ym, nation, industry, age_level) 為唯一鍵、upsert 留最後一筆：
+#     來源同一個鍵出現多次時也只算最後一筆，否則指紋永遠對不上，該月每次都被刪除重灌
+# =========================
+
+def _dim_keys(df: pd.DataFrame) -> pd.Series:
+    keys = df[DIM_KEY_COLS[0]].astype(str)
+    for col in DIM_KEY_COLS[1:]:
+        keys = keys + "|" + df[col].astype(str)
+    return keys
+
+def latest_rows(df: pd.DataFrame) -> pd.DataFrame:
+    return df.drop_duplicates(subset = NATURAL_KEY, keep = "last")
+
+class LatestRows:
+    # 逐批累積每個鍵的最後一筆：自然鍵 -> (trans_count, trans_total)，跨批重複的鍵以後面的為準
+    #   每批只處理該批的列，記憶體只跟不重複的鍵數有關，不會隨批數重算整個累積結果
+    def __init__(self):
+        self._rows: dict[tuple, tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, df: pd.DataFrame) -> None:
+        part   = latest_rows(df)
+        keys   = zip(*(part[c].astype(str).to_numpy() for c in NATURAL_KEY))
+        values = zip(part["trans_count"].to_numpy(dtype = "int64").tolist(), part["trans_total"].to_numpy(dtype = "int64").tolist())
+        self._rows.update(zip(keys, values))
+
+    def frame(self) -> pd.DataFrame:
+        if not self._rows:
+            return pd.DataFrame(columns = NATURAL_KEY + ["trans_count", "trans_total"])
+        df = pd.DataFrame(list(self._rows.keys()), columns = NATURAL_KEY)
+        df[["trans_count", "trans_total"]] = pd.DataFrame(list(self._rows.values()), dtype = "int64")
+        return df
+
+def month_fingerprints(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty:
+        return pd.DataFrame(columns = FP_COLS, dtype = "int64").rename_axis("ym")
+    df = latest_rows(df)
+
+    # 與 SQL 端 CRC32(CONCAT_WS('|', nation, industry, age_level)) 相同
+    crc = pd.Series(
+        [zlib.crc32(k.encode("utf-8")) for k in _dim_keys(df)],
+        index = df.index,
+        dtype = "int64"
+    )
+    fp = pd.DataFrame({
+        "ym"       : df["ym"].astype(str).to_numpy(),
+        "rows"     : 1,
+        "sum_count": df["trans_count"].to_numpy(dtype = "int64"),
+        "sum_total": df["trans_total"].to_numpy(dtype = "int64"),
+        "dim_hash" : crc.to_numpy()
+    })
+    return fp.groupby("ym").sum()[FP_COLS]
+
+def db_month_fingerprints(conn, table_name: str = "clean_data") -> pd.DataFrame:
+    # clean_data 只存代碼，標籤由維度表 join 回來，公式與 Python 端相同
+    sql = text(f"""
+        SELECT
+            c.ym,
+            COUNT(*)                                              AS `rows`,
+            SUM(c.trans_count)                                    AS sum_count,
+            SUM(c.trans_total)                                    AS sum_total,
+            SUM(CRC32(CONCAT_WS('|', n.label, i.label, a.label))) AS dim_hash
+        FROM {quote_ident(table_name)} c
+        JOIN dim_nation    n ON n.id = c.nation_id
+        JOIN dim_industry  i ON i.id = c.industry_id
+        JOIN dim_age_level a ON a.id = c.age_level_id
+        GROUP BY c.ym
+    """)
+    fp = pd.read_sql(sql, conn, index_col = "ym")
+    return fp[FP_COLS].astype("int64")
+
+def changed_months(incoming: pd.DataFrame, existing: pd.DataFrame) -> list[str]:
+    # 只比對來源裡出現的月份；資料庫有、來源沒有的月份不動
+    current = existing.reindex(incoming.index)
+    diff = current.isna().any(axis = 1) | (current.fillna(-1).astype("int64") != incoming).any(axis = 1)
+    return sorted(str(ym) for ym in incoming.index[diff])
+
+def delete_months(conn, table_name: str, yms: list[str]) -> int:
+    if not yms:
+        return 0
+    stmt = text(
+        f"DELETE FROM {quote_ident(table_name)} WHERE ym IN :yms"
+    ).bindparams(bindparam("yms", expanding = True))
+    return conn.execute(stmt, {"yms": list(yms)}).rowcount
@@ -0,0 +1,232 @@
+import re
+import json
+import pandas as pd
+from pathlib import Path
+from typing import Iterator
+
+# =========================
+# 串流讀取 JSON：由開頭判斷格式後逐筆解碼，一次只保留一批 records
+#   array   : [{...}, {...}]
+#   jsonl   : 每行 (或連續) 一個 {...}
+#   wrapped : {"data": [{...}, ...]}，資料陣列前可以有其他欄位 (status / meta ...)
+#   dict    : {"a": {...}, "b": {...}} (每個值都是一筆 record，需整份讀入)
+#   最外層是物件時以「最外層有幾個值」判斷：超過一個就是 JSONL，
+#     不看第一筆的內容 (JSONL record 本身也可能有物件陣列欄位)
+# =========================
+
+READ_SIZE = 1024 * 1024
+_decoder  = json.JSONDecoder()
+_STRUCT     = re.compile(r'[{}\[\]"]')
+_STRING_END = re.compile(r'["\\]')
+
+
+class JsonStream:
+    def __init__(self, f, read_size: int = READ_SIZE):
+        self._f = f
+        self._read_size = read_size
+        self._buf  = ""
+        self._pos  = 0
+        self._base = 0        # buffer 第一個字元在整份文字中的位置
+        self._keep = None     # mark() 之後要保留的位置，reset() 才回得去
+        self._eof  = False
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        data = self._f.read(self._read_size)
+        if not data:
+            self._eof = True
+            return False
+        # 已處理過的部分丟掉，buffer 大小只跟單筆 record 有關
+        cut = self._pos if self._keep is None else min(self._pos, self._keep - self._base)
+        self._buf   = self._buf[cut:] + data
+        self._pos  -= cut
+        self._base += cut
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos].isspace():
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, ch: str) -> None:
+        if self.peek() != ch:
+            raise ValueError(f"JSON 格式錯誤：預期 {ch!r}，實際 {self.peek()!r}")
+        self._pos += 1
+
+    def decode(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # 值被 buffer 切斷，讀更多再試；已到檔尾才是真的格式錯誤
+                if not self._fill():
+                    raise
+                continue
+            # 數字可能剛好在 buffer 結尾被切斷 (例如 12|3)，要確認後面還有字元
+            if end == len(self._buf) and not self._eof and isinstance(value, (int, float)) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def skip_comma(self, close: str) -> bool:
+        # 讀掉元素之間的逗號；遇到結尾括號回傳 False
+        ch = self.peek()
+        if ch == ",":
+            self._pos += 1
+            return True
+        if ch == close:
+            self._pos += 1
+            return False
+        raise ValueError(f"JSON 格式錯誤：預期 ',' 或 {close!r}，實際 {ch!r}")
+
+    def array_items(self) -> Iterator:
+        # 呼叫前已讀掉 '['
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.decode()
+            if not self.skip_comma("]"):
+                return
+
+    def skip_value(self) -> None:
+        # 略過一個物件 / 陣列：只找括號與字串邊界，不解碼、不保留內容
+        if self.peek() not in ("{", "["):
+            self.decode()
+            return
+        depth, in_str = 0, False
+        while True:
+            pattern = _STRING_END if in_str else _STRUCT
+            m = pattern.search(self._buf, self._pos)
+            # 跳脫字元在 buffer 結尾：先讀更多，下一輪再一起跳過
+            if m is None or (m.group() == "\\" and m.end() == len(self._buf)):
+                self._pos = len(self._buf) if m is None else m.start()
+                if not self._fill():
+                    raise ValueError("JSON 格式錯誤：值尚未結束就到檔尾")
+                continue
+            c = m.group()
+            self._pos = m.end()
+            if in_str:
+                if c == "\\":
+                    self._pos += 1
+                else:
+                    in_str = False
+            elif c == '"':
+                in_str = True
+            elif c in "{[":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def tell(self) -> int:
+        return self._base + self._pos
+
+    def mark(self) -> int:
+        self.peek()
+        self._keep = self._base + self._pos
+        return self._keep
+
+    def reset(self, mark: int) -> None:
+        self._pos = mark - self._base
+
+    def release(self) -> None:
+        self._keep = None
+
+
+def detect_format(stream: JsonStream) -> str:
+    ch = stream.peek()
+    if ch == "[":
+        return "array"
+    if ch == "{":
+        return "object"
+    raise ValueError(f"JSON 無法轉成 records_list：開頭為 {ch!r}")
+
+def _object_records(stream: JsonStream) -> Iterator[dict]:
+    # 最外層只有一個物件：逐一看欄位，遇到 records 陣列就從那裡開始串流 (wrapped)；
+    #   物件結束都沒有陣列時，若每個值都是物件就當作 dict 形式，否則就是只有一筆的 JSONL
+    start = stream.mark()
+    stream.expect("{")
+    dict_values = []
+    all_dicts = True
+    if stream.peek() != "}":
+        while True:
+            stream.decode()
+            stream.expect(":")
+            if stream.peek() == "[":
+                value_start = stream.tell()
+                stream.expect("[")
+                if stream.peek() in ("{", "]"):
+                    stream.release()
+                    yield from stream.array_items()
+                    return
+                stream.reset(value_start)
+            value = stream.decode()
+            if isinstance(value, dict):
+                dict_values.append(value)
+            else:
+                all_dicts = False
+            if not stream.skip_comma("}"):
+                break
+
+    if dict_values and all_dicts:
+        yield from dict_values
+        return
+
+    stream.reset(start)
+    stream.release()
+    yield stream.decode()
+
+def _jsonl_records(stream: JsonStream) -> Iterator[dict]:
+    while stream.peek() == "{":
+        yield stream.decode()
+    if stream.peek():
+        raise ValueError(f"JSONL 格式錯誤：預期 '{{'，實際 {stream.peek()!r}")
+
+def _is_jsonl(stream: JsonStream) -> bool:
+    # 略過第一個最外層值後還有下一個值 -> JSONL
+    stream.skip_value()
+    return stream.peek() != ""
+
+def iter_records(f, read_size: int = READ_SIZE) -> Iterator[dict]:
+    # 判斷 JSONL 要先掃過第一個最外層值：可 seek 的檔案掃完倒回開頭重讀，
+    #   不能 seek 時用 mark 保留 buffer (第一個值的文字會留在記憶體)
+    seekable = getattr(f, "seekable", lambda: False)()
+    origin = f.tell() if seekable else None
+    stream = JsonStream(f, read_size)
+    fmt = detect_format(stream)
+    if fmt == "array":
+        stream.expect("[")
+        for item in stream.array_items():
+            if not isinstance(item, dict):
+                raise ValueError("JSON 無法轉成 records_list：陣列元素不是物件")
+            yield item
+        return
+
+    start = None if seekable else stream.mark()
+    jsonl = _is_jsonl(stream)
+    if seekable:
+        f.seek(origin)
+        stream = JsonStream(f, read_size)
+    else:
+        stream.reset(start)
+        stream.release()
+    yield from (_jsonl_records(stream) if jsonl else _object_records(stream))
+
+def iter_json_frames(json_file: Path, chunk_rows: int, read_size: int = READ_SIZE) -> Iterator[pd.DataFrame]:
+    with open(json_file, "r", encoding = "utf-8-sig") as f:
+        batch: list[dict] = []
+        for record in iter_records(f, read_size):
+            batch.append(record)
+            if len(batch) >= chunk_rows:
+                yield pd.DataFrame(batch)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch)
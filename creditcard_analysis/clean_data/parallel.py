@@ -0,0 +1,88 @@
+import io
+import os
+import pandas as pd
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from pandas.api.types import union_categoricals
+
+from .clean import CSV_READ_OPTS, DIM_COLS, normalize_frame
+
+
+# =========================
+# 多核心解析：把 CSV 依 byte 範圍切段 (對齊換行)，各段在子行程解析 + normalize，
+#   依原始順序合併後再由主行程做整體補值 / 去重，結果與單核心 clean_data(load_csv()) 相同
+#   切點只放在引號外的換行：從資料開頭算起 '"' 個數為偶數才是一列的結尾
+#     (跳脫的 "" 成對出現不影響奇偶)，欄位內含換行的 record 不會被切到兩個 worker
+# =========================
+
+MIN_PARTITION_BYTES = 1024 * 1024
+SCAN_BYTES          = 1024 * 1024
+
+
+def partition_file(csv_path: Path, parts: int, min_bytes: int = MIN_PARTITION_BYTES) -> tuple[bytes, list[tuple[int, int]]]:
+    # 回傳 (標題列, [(start, end), ...])；每段都從一列的開頭開始、在引號外的換行後結束
+    size = os.path.getsize(csv_path)
+    with open(csv_path, "rb") as f:
+        header = f.readline()
+        data_start = f.tell()
+        body = size - data_start
+        parts = max(1, min(parts, body // max(min_bytes, 1) or 1))
+
+        # 依序掃過整份資料，累計到目前位置為止的引號個數
+        bounds = [data_start]
+        quotes = 0
+        for i in range(1, parts):
+            target = data_start + body * i // parts
+            if target <= f.tell():
+                continue
+            quotes += _count_quotes(f, target - f.tell())
+            line = f.readline()
+            quotes += line.count(b'"')
+            # 換行落在引號內：往下找到引號配對完的那一行
+            while quotes % 2 and line:
+                line = f.readline()
+                quotes += line.count(b'"')
+            pos = f.tell()
+            if bounds[-1] < pos < size:
+                bounds.append(pos)
+        bounds.append(size)
+
+    return header, [(s, e) for s, e in zip(bounds, bounds[1:]) if e > s]
+
+def _count_quotes(f, n: int) -> int:
+    count = 0
+    while n > 0:
+        chunk = f.read(min(n, SCAN_BYTES))
+        if not chunk:
+            break
+        count += chunk.count(b'"')
+        n -= len(chunk)
+    return count
+
+def parse_partition(csv_path: Path, header: bytes, start: int, end: int) -> pd.DataFrame:
+    with open(csv_path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    df = pd.read_csv(io.BytesIO(header + data), **CSV_READ_OPTS)
+    return normalize_frame(df)
+
+def load_csv_parallel(csv_path: Path, workers: int, min_bytes: int = MIN_PARTITION_BYTES) -> pd.DataFrame:
+    # 回傳 normalize 過但尚未補值 / 去重的整份資料，後續照常交給 clean_data
+    header, ranges = partition_file(csv_path, workers, min_bytes)
+    print(f"[INFO] 以 {workers} 個 worker 解析 {len(ranges)} 段：{csv_path}")
+
+    if len(ranges) == 1:
+        return parse_partition(csv_path, header, *ranges[0])
+
+    with ProcessPoolExecutor(max_workers = min(workers, len(ranges))) as pool:
+        futures = [pool.submit(parse_partition, csv_path, header, s, e) for s, e in ranges]
+        frames  = [f.result() for f in futures]
+
+    # 各段的 category 不同，先統一成排序後的聯集 (與整檔讀取相同)，concat 才不會退回 object
+    for col in DIM_COLS:
+        merged = union_categoricals([f[col] for f in frames], sort_categories = True).categories
+        for f in frames:
+            f[col] = f[col].cat.set_categories(merged)
+
+    # 依檔案順序合併，index 重新編號與整檔讀取一致
+    return pd.concat(frames, ignore_index = True)
@@ -0,0 +1,365 @@
+import io
+import os
+import time
+import queue
+import threading
+import pandas as pd
+from pathlib import Path
+from sqlalchemy.exc import OperationalError
+
+from ..database import engine
+from .stats import StageTimer
+from .downloader import Downloader, file_name_for
+from .create_ssl import build_ssl_context, SSLContextAdapter
+from .watermark import source_key, get_watermark, set_watermark, get_ingested, drop_loaded_months, max_ym
+from .dataset_version import touched_months
+from ..utils import ym_keys
+from .clean import (
+    ETLOptions, CSV_READ_OPTS, new_imputer, clean_streaming, clean_deferred,
+    open_row_index, save_row_index, insert_into_mysql, write_to_mysql, iter_json_chunks
+)
+
+# =========================
+# 下載 -> 解析 / 清理 -> 寫入 DB 三段同時進行
+#   download thread 寫 .part 檔，parse worker 邊下載邊追讀同一個檔案，
+#   清理後的批次依月份分給一或多個 writer (每個 writer 一個有上限的 queue)，各自使用連線池裡的連線
+#     同一個月份 (自然鍵含 ym) 永遠由同一個 writer 依序寫入，跨批的重複鍵與單執行緒一樣是最後一筆生效
+#   下載完成後 sha256 與上次成功匯入的相同 (watermark 策略) 就中止，不重新匯入
+# =========================
+
+DEFAULT_CHUNK_ROWS = 50_000
+DEADLOCK_ERRORS    = {1205, 1213}
+_DONE = object()
+
+
+class PipelineAborted(RuntimeError):
+    pass
+
+
+class FollowReader(io.RawIOBase):
+    # 追讀下載中的檔案：讀到結尾時若下載還沒結束就等待，而不是回傳 EOF
+    def __init__(self, part: Path, dest: Path, done: threading.Event, stop: threading.Event, poll: float = 0.05):
+        self._part = part
+        self._dest = dest
+        self._done = done
+        self._stop = stop
+        self._poll = poll
+        self._f    = None
+        self._pos  = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def _open(self, finished: bool) -> bool:
+        # 下載完成前只能讀 .part，避免讀到上一次留下的舊檔；完成後 .part 已改名為正式檔名
+        try:
+            self._f = open(self._dest if finished else self._part, "rb")
+            return True
+        except FileNotFoundError:
+            return False
+
+    @property
+    def position(self) -> int:
+        return self._pos
+
+    def readinto(self, b) -> int:
+        while True:
+            if self._stop.is_set():
+                raise PipelineAborted("pipeline 已中止")
+            finished = self._done.is_set()
+            if self._f is None and not self._open(finished):
+                if finished:
+                    raise FileNotFoundError(self._dest)
+                time.sleep(self._poll)
+                continue
+
+            n = self._f.readinto(b)
+            if n:
+                self._pos += n
+                return n
+            if finished:
+                return 0
+            if os.fstat(self._f.fileno()).st_size < self._pos:
+                raise PipelineAborted("下載檔案被重新寫入 (遠端檔案變更)，請重新執行")
+            time.sleep(self._poll)
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+        super().close()
+
+
+class Pipeline:
+    def __init__(self, opts: ETLOptions, writers: int = 2, queue_size: int = 4, report_every: float = 5.0):
+        if opts.strategy not in ("full", "watermark"):
+            raise ValueError("pipeline 只支援 full / watermark 策略")
+        self.opts          = opts
+        self.writers       = max(1, writers)
+        self.chunk_rows    = opts.chunk_rows or DEFAULT_CHUNK_ROWS
+        self.report_every  = report_every
+        self.write_qs      = [queue.Queue(maxsize = queue_size) for _ in range(self.writers)]
+        self.timer         = StageTimer()
+        self.stop          = threading.Event()
+        self.download_done = threading.Event()
+        self.digest    : str | None = None
+        self.unchanged = False
+        self.errors    : list[BaseException] = []
+        self.loaded_yms: list[str] = []
+        self.months: set[str] = set()
+        self._lock   = threading.Lock()
+        self._reader : FollowReader | None = None
+        self.index   = open_row_index(opts)
+
+    # ---------- 共用 ----------
+
+    def _fail(self, e: BaseException) -> None:
+        with self._lock:
+            self.errors.append(e)
+        self.stop.set()
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout = 0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _route(self, df: pd.DataFrame) -> bool:
+        # 依 ym 分片：同一個月份固定交給同一個 writer，批次內原本的列順序不變
+        if self.writers == 1:
+            return self._put(self.write_qs[0], df)
+        shards = ym_keys(df["ym"]) % self.writers
+        for shard in sorted(set(shards.tolist())):
+            if not self._put(self.write_qs[shard], df[shards == shard]):
+                return False
+        return True
+
+    # ---------- stage 1：下載 ----------
+
+    def _download(self) -> None:
+        opts = self.opts
+        try:
+            ctx = build_ssl_context(opts.cafile, relax_strict = True)
+            downloader = Downloader(opts.out_dir, parallel = 1)
+            downloader.session.mount("https://", SSLContextAdapter(ctx))
+            start = time.perf_counter()
+            result = downloader.download(opts.url, expected_sha256 = opts.sha256)
+            self.timer.add("download", 0, time.perf_counter() - start)
+            self.digest = result.sha256
+            # 與上次成功匯入的檔案相同：已解析 / 寫入的部分內容也相同，直接中止
+            if (opts.strategy == "watermark" and result.sha256
+                    and result.sha256 == get_ingested(source_key(opts.source, opts.table_name))):
+                self.unchanged = True
+                self.stop.set()
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self.download_done.set()
+
+    # ---------- stage 2：解析 + 清理 ----------
+
+    def _chunks(self):
+        opts = self.opts
+        if opts.source == "json_path":
+            yield from iter_json_chunks(opts.path, self.chunk_rows)
+            return
+
+        dest = opts.out_dir / file_name_for(opts.url)
+        self._reader = FollowReader(dest.with_name(dest.name + ".part"), dest, self.download_done, self.stop)
+        reader = pd.read_csv(io.BufferedReader(self._reader), chunksize = self.chunk_rows, **CSV_READ_OPTS)
+        with reader:
+            yield from reader
+
+    def _dedupe(self, df: pd.DataFrame) -> pd.DataFrame:
+        # 只有 parse 執行緒會查 / 寫索引，不需要加鎖
+        if self.index is None or df.empty:
+            return df
+        with self.timer.track("dedupe") as t:
+            t["rows"] = len(df)
+            return self.index.filter_new(df)
+
+    def _parse(self, watermark: str | None) -> None:
+        imputer = new_imputer()
+        deferred: list[pd.DataFrame] = []
+        try:
+            chunks = iter(self._chunks())
+            while not self.stop.is_set():
+                start = time.perf_counter()
+                try:
+                    df_raw = next(chunks)
+                except StopIteration:
+                    break
+                self.timer.add("parse", len(df_raw), time.perf_counter() - start)
+
+                df_raw = drop_loaded_months(df_raw, watermark)
+                if df_raw.empty:
+                    continue
+                with self.timer.track("clean") as t:
+                    df = clean_streaming(df_raw, imputer, deferred)
+                    t["rows"] = len(df)
+                df = self._dedupe(df)
+                if not df.empty and not self._route(df):
+                    return
+
+            # 含缺失值的列等整份資料解析完、填補值確定後才送出
+            if not self.stop.is_set():
+                with self.timer.track("clean") as t:
+                    df = clean_deferred(deferred, imputer)
+                    t["rows"] = 0 if df is None else len(df)
+                if df is not None:
+                    df = self._dedupe(df)
+                    if not df.empty:
+                        self._route(df)
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            for q in self.write_qs:
+                self._put(q, _DONE)
+
+    # ---------- stage 3：寫入 DB ----------
+
+    def _insert(self, df: pd.DataFrame, conn) -> None:
+        for attempt in range(3):
+            try:
+                if conn is None:
+                    write_to_mysql(df, self.opts.table_name, self.opts.loader)
+                else:
+                    insert_into_mysql(df, self.opts.table_name, conn = conn)
+                    conn.commit()
+                return
+            except OperationalError as e:
+                # 多個 writer 同時 upsert 偶爾會 deadlock，重試即可
+                if conn is not None:
+                    conn.rollback()
+                code = getattr(e.orig, "args", [None])[0]
+                if code not in DEADLOCK_ERRORS or attempt == 2:
+                    raise
+                time.sleep(0.2 * (attempt + 1))
+
+    def _drain(self, q: queue.Queue, conn) -> None:
+        # 中止時 parse 不一定送得出 _DONE，等待時也要定期檢查 stop
+        while True:
+            try:
+                item = q.get(timeout = 0.5)
+            except queue.Empty:
+                if self.stop.is_set():
+                    return
+                continue
+            if item is _DONE or self.stop.is_set():
+                return
+            with self.timer.track("insert") as t:
+                self._insert(item, conn)
+                t["rows"] = len(item)
+            with self._lock:
+                self.loaded_yms.append(max_ym(item))
+                self.months |= touched_months(item)
+
+    def _write(self, q: queue.Queue) -> None:
+        try:
+            # insert loader 走連線池；infile / executemany 每批自行建立 pymysql 連線
+            if self.opts.loader == "insert":
+                with engine.connect() as conn:
+                    self._drain(q, conn)
+            else:
+                self._drain(q, None)
+        except BaseException as e:
+            self._fail(e)
+
+    # ---------- 監控 ----------
+
+    def _report(self, elapsed: float) -> None:
+        queued = sum(q.qsize() for q in self.write_qs)
+        parts  = [f"write_q={queued}/{self.write_qs[0].maxsize * self.writers}"]
+        dl = self._download_bytes()
+        if dl is not None:
+            # 已下載但 parser 還沒讀到的量，相當於 download -> parse 之間的佇列深度
+            ahead = dl - (self._reader.position if self._reader is not None else 0)
+            parts.append(f"download={dl / 1024 / 1024:,.1f}MB (ahead {max(ahead, 0) / 1024 / 1024:,.1f}MB)")
+        for s in self.timer.snapshot():
+            busy = s.seconds / elapsed if elapsed > 0 else 0
+            rate = f"{s.rows_per_sec:,.0f}筆/s " if s.rows else ""
+            parts.append(f"{s.name}={rate}(busy {busy:.0%})")
+        print(f"[PIPE] {elapsed:6.1f}s " + " | ".join(parts))
+
+    def _download_bytes(self) -> int | None:
+        if self.opts.source != "csv_url":
+            return None
+        dest = self.opts.out_dir / file_name_for(self.opts.url)
+        for path in (dest.with_name(dest.name + ".part"), dest):
+            if path.exists():
+                return path.stat().st_size
+        return 0
+
+    def _bottleneck(self, elapsed: float) -> None:
+        # writer 有多個，busy 以平均每個 writer 計
+        def busy(s):
+            n = self.writers if s.name == "insert" else 1
+            return s.seconds / n / elapsed if elapsed > 0 else 0
+        stages = self.timer.snapshot()
+        if stages:
+            slowest = max(stages, key = busy)
+            print(f"[PIPE] 瓶頸 stage：{slowest.name} (busy {busy(slowest):.0%})")
+
+    # ---------- 執行 ----------
+
+    def run(self) -> set[str] | None:
+        # 回傳有寫入的月份；來源檔與上次匯入的相同而中止時回傳 None
+        opts = self.opts
+        wm_key = source_key(opts.source, opts.table_name)
+        watermark = get_watermark(wm_key) if opts.strategy == "watermark" else None
+        if watermark is not None:
+            print(f"[INFO] 水位線：{watermark}，只匯入之後的月份")
+
+        threads = []
+        if opts.source == "csv_url":
+            threads.append(threading.Thread(target = self._download, name = "etl-download", daemon = True))
+        else:
+            self.download_done.set()
+        threads.append(threading.Thread(target = self._parse, args = (watermark,), name = "etl-parse", daemon = True))
+        threads += [
+            threading.Thread(target = self._write, args = (q,), name = f"etl-writer-{i}", daemon = True)
+            for i, q in enumerate(self.write_qs)
+        ]
+
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        while any(t.is_alive() for t in threads):
+            for t in threads:
+                t.join(timeout = self.report_every / max(len(threads), 1))
+            if any(t.is_alive() for t in threads):
+                self._report(time.perf_counter() - start)
+        elapsed = time.perf_counter() - start
+
+        # 中止時 parse / writer 的 PipelineAborted 不算失敗；雜湊索引與水位線都不更新
+        if self.unchanged:
+            return None
+        if self.errors:
+            raise self.errors[0]
+
+        self._report(elapsed)
+        self.timer.report()
+        self._bottleneck(elapsed)
+        save_row_index(self.index)
+
+        loaded = [ym for ym in self.loaded_yms if ym is not None]
+        if loaded:
+            set_watermark(wm_key, max(loaded))
+            print(f"[INFO] 水位線更新為：{max(loaded)}")
+        else:
+            print("[INFO] 沒有新的月份需要匯入")
+        return self.months
+
+
+def run_pipeline(opts: ETLOptions, writers: int = 2) -> tuple[set[str] | None, str | None]:
+    # 回傳 (有寫入的月份, 來源檔 sha256)；與上次匯入的相同而略過時月份為 None
+    if opts.source == "csv_url" and not opts.url:
+        raise ValueError("source = csv_url時，必須提供url")
+    if opts.source == "json_path" and not opts.path:
+        raise ValueError("source = json_path時，必須提供path")
+    if opts.source not in ("csv_url", "json_path"):
+        raise ValueError("source 只支援 csv_url 及 json_path")
+    pipeline = Pipeline(opts, writers = writers)
+    return pipeline.run(), pipeline.digest
@@ -0,0 +1,32 @@
+from sqlalchemy import text
+
+from ..database import engine
+from ..models import ROLLUPS, CleanedData
+from .bulk_load import quote_ident
+
+# =========================
+# 彙總表重建：ETL 最後一步依 clean_data 重新加總
+#   彙總表很小 (月份數 x 維度數)，每次整張重建；
+#   DELETE + INSERT ... SELECT 在同一個 transaction，讀取端不會看到空表或半套資料
+# =========================
+
+ROLLUP_SOURCE = CleanedData.__tablename__
+
+
+def refresh_rollups(conn = None) -> dict[str, int]:
+    if conn is None:
+        with engine.begin() as conn:
+            return refresh_rollups(conn)
+
+    counts: dict[str, int] = {}
+    for table, keys in ROLLUPS.items():
+        cols = ", ".join(quote_ident(k) for k in keys)
+        conn.execute(text(f"DELETE FROM {quote_ident(table)}"))
+        counts[table] = conn.execute(text(f"""
+            INSERT INTO {quote_ident(table)} ({cols}, trans_count, trans_total)
+            SELECT {cols}, SUM(trans_count), SUM(trans_total)
+            FROM {quote_ident(ROLLUP_SOURCE)}
+            GROUP BY {cols}
+        """)).rowcount
+    print("[INFO] 彙總表重建完成：" + ", ".join(f"{t} {n} 筆" for t, n in counts.items()))
+    return counts
@@ -0,0 +1,88 @@
+import os
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# =========================
+# 已匯入資料列的 64-bit 雜湊索引 (排序後的 uint64 .npy，以 mmap 讀取)
+#   每批清理後先跟索引比對，已匯入過 / 本次已出現過的列不再送進 DB；
+#   本次新出現的雜湊先留在記憶體，整個 ETL 成功後才合併寫回檔案
+# =========================
+
+INDEX_DIR_NAME = "row_index"
+MAX_RUNS       = 16     # 記憶體中的已排序區段超過這個數量就合併，查詢成本維持固定
+
+
+def row_index_path(base_dir: Path, table_name: str) -> Path:
+    return base_dir / INDEX_DIR_NAME / f"{table_name}.npy"
+
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    # 整列 (所有欄位) 的雜湊，與 df.duplicated() 判斷重複的標準相同
+    return pd.util.hash_pandas_object(df, index = False).to_numpy(dtype = "uint64")
+
+def _isin_sorted(sorted_arr: np.ndarray, values: np.ndarray) -> np.ndarray:
+    if sorted_arr.size == 0:
+        return np.zeros(values.size, dtype = bool)
+    pos = np.searchsorted(sorted_arr, values)
+    pos[pos == sorted_arr.size] = 0
+    return sorted_arr[pos] == values
+
+
+class RowHashIndex:
+    def __init__(self, path: Path, fresh: bool = False):
+        self.path    = path
+        self.skipped = 0
+        self._runs: list[np.ndarray] = []
+        self._base = self._open() if not fresh else np.empty(0, dtype = "uint64")
+
+    def _open(self) -> np.ndarray:
+        if not self.path.exists():
+            return np.empty(0, dtype = "uint64")
+        return np.load(self.path, mmap_mode = "r")
+
+    def __len__(self) -> int:
+        return len(self._base) + sum(len(r) for r in self._runs)
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        found = _isin_sorted(self._base, hashes)
+        for run in self._runs:
+            found |= _isin_sorted(run, hashes)
+        return found
+
+    def add(self, hashes: np.ndarray) -> None:
+        new = np.unique(hashes.astype("uint64", copy = False))
+        new = new[~self.contains(new)]
+        if new.size == 0:
+            return
+        self._runs.append(new)
+        if len(self._runs) > MAX_RUNS:
+            self._runs = [np.unique(np.concatenate(self._runs))]
+
+    def filter_new(self, df: pd.DataFrame) -> pd.DataFrame:
+        # 去掉批次內重複 (保留第一筆) 及索引中已存在的列，新列的雜湊記入本次執行
+        if df.empty:
+            return df
+        hashes = row_hashes(df)
+        keep = np.zeros(hashes.size, dtype = bool)
+        keep[np.unique(hashes, return_index = True)[1]] = True
+        keep &= ~self.contains(hashes)
+
+        self.skipped += int(hashes.size - keep.sum())
+        self.add(hashes[keep])
+        return df if keep.all() else df.loc[keep]
+
+    def save(self) -> None:
+        if not self._runs and self.path.exists():
+            return
+        merged = np.unique(np.concatenate([np.asarray(self._base), *self._runs]))
+        self.path.parent.mkdir(parents = True, exist_ok = True)
+        tmp = self.path.with_name(self.path.name + ".tmp.npy")
+        np.save(tmp, merged)
+        self._base = np.empty(0, dtype = "uint64")     # 先放掉 mmap 再替換檔案
+        os.replace(tmp, self.path)
+        self._base = self._open()
+        self._runs = []
+
+    @staticmethod
+    def invalidate(path: Path) -> None:
+        path.unlink(missing_ok = True)
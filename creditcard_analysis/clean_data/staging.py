@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from ..models import DIMENSIONS
+from .bulk_load import quote_ident
+
+
+# 新資料筆數低於線上資料的這個比例就拒絕切換 (例如下載被截斷)
+SWAP_MIN_RATIO = 0.9
+
+
+class StagingValidationError(RuntimeError):
+    pass
+
+
+def staging_name(table_name: str) -> str:
+    return f"{table_name}_staging"
+
+def _secondary_indexes(conn, table_name: str) -> dict[str, list[str]]:
+    rows = conn.execute(text(f"SHOW INDEX FROM {quote_ident(table_name)}")).mappings().all()
+    indexes: dict[str, list[tuple[int, str]]] = {}
+    for r in rows:
+        # PRIMARY 與 UNIQUE 要在載入時就存在 (upsert 靠它)，只延後一般索引
+        if r["Key_name"] == "PRIMARY" or not r["Non_unique"]:
+            continue
+        col = quote_ident(r["Column_name"])
+        if r["Sub_part"]:
+            col = f"{col}({int(r['Sub_part'])})"
+        indexes.setdefault(r["Key_name"], []).append((int(r["Seq_in_index"]), col))
+    return {name: [c for _, c in sorted(cols)] for name, cols in indexes.items()}
+
+def create_staging(conn, table_name: str) -> dict[str, list[str]]:
+    staging = staging_name(table_name)
+    conn.execute(text(f"DROP TABLE IF EXISTS {quote_ident(staging)}"))
+    conn.execute(text(f"CREATE TABLE {quote_ident(staging)} LIKE {quote_ident(table_name)}"))
+
+    deferred = _secondary_indexes(conn, staging)
+    if deferred:
+        drops = ", ".join(f"DROP INDEX {quote_ident(name)}" for name in deferred)
+        conn.execute(text(f"ALTER TABLE {quote_ident(staging)} {drops}"))
+    return deferred
+
+def build_indexes(conn, table_name: str, indexes: dict[str, list[str]]) -> None:
+    if not indexes:
+        return
+    adds = ", ".join(f"ADD INDEX {quote_ident(name)} ({', '.join(cols)})" for name, cols in indexes.items())
+    conn.execute(text(f"ALTER TABLE {quote_ident(staging_name(table_name))} {adds}"))
+
+def key_hashes(df: pd.DataFrame) -> np.ndarray:
+    # 清理後 (尚未編碼) 的自然鍵；標籤與代碼一對一，筆數與 DB 端唯一鍵相同
+    return pd.util.hash_pandas_object(df[["ym", *DIMENSIONS]], index = False).to_numpy()
+
+def validate_staging(conn, table_name: str, expected_rows: int, min_ratio: float = SWAP_MIN_RATIO) -> int:
+    staging = staging_name(table_name)
+    staged = conn.execute(text(f"SELECT COUNT(*) FROM {quote_ident(staging)}")).scalar_one()
+    live   = conn.execute(text(f"SELECT COUNT(*) FROM {quote_ident(table_name)}")).scalar_one()
+
+    if staged == 0:
+        raise StagingValidationError(f"{staging} 沒有資料，取消切換")
+    if staged != expected_rows:
+        raise StagingValidationError(f"{staging} 筆數 {staged} 與預期 {expected_rows} 不符，取消切換")
+    if live and staged < live * min_ratio:
+        raise StagingValidationError(
+            f"{staging} 筆數 {staged} 低於線上 {table_name} ({live}) 的 {min_ratio:.0%}，疑似資料不完整，取消切換"
+        )
+    return staged
+
+def swap_in(conn, table_name: str) -> None:
+    staging = staging_name(table_name)
+    old = f"{table_name}_old"
+    conn.execute(text(f"DROP TABLE IF EXISTS {quote_ident(old)}"))
+    # 單一 RENAME TABLE 是原子操作，讀取端只會看到舊表或完整的新表
+    conn.execute(text(
+        f"RENAME TABLE {quote_ident(table_name)} TO {quote_ident(old)}, "
+        f"{quote_ident(staging)} TO {quote_ident(table_name)}"
+    ))
+    conn.execute(text(f"DROP TABLE {quote_ident(old)}"))
+
+def drop_staging(conn, table_name: str) -> None:
+    conn.execute(text(f"DROP TABLE IF EXISTS {quote_ident(staging_name(table_name))}"))
@@ -0,0 +1,49 @@
+import time
+import threading
+from dataclasses import dataclass
+from contextlib import contextmanager
+
+
+@dataclass
+class StageStats:
+    name   : str
+    rows   : int   = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+
+# 累計 ETL 各階段 (read / clean / insert ...) 的筆數與耗時
+class StageTimer:
+    def __init__(self):
+        self._stages: dict[str, StageStats] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, rows: int, seconds: float) -> None:
+        with self._lock:
+            stats = self._stages.setdefault(stage, StageStats(stage))
+            stats.rows    += rows
+            stats.seconds += seconds
+
+    @contextmanager
+    def track(self, stage: str):
+        # 用法：with timer.track("clean") as t: ...; t["rows"] = len(df)
+        box = {"rows": 0}
+        start = time.perf_counter()
+        try:
+            yield box
+        finally:
+            self.add(stage, box["rows"], time.perf_counter() - start)
+
+    def snapshot(self) -> list[StageStats]:
+        with self._lock:
+            return [StageStats(s.name, s.rows, s.seconds) for s in self._stages.values()]
+
+    def report(self) -> None:
+        for s in self.snapshot():
+            if s.rows == 0:
+                print(f"[STAT] {s.name:<8}: {'-':>10} / {s.seconds:8.2f}s")
+                continue
+            print(f"[STAT] {s.name:<8}: {s.rows:>10,} 筆 / {s.seconds:8.2f}s = {s.rows_per_sec:>12,.0f} 筆/s")
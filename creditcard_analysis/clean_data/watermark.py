@@ -0,0 +1,78 @@
+import pandas as pd
+from sqlalchemy import select, func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from ..database import engine
+from ..models import EtlWatermark
+
+
+RAW_YM_COLS = ("ym", "年月")
+
+
+def source_key(source: str, table_name: str) -> str:
+    return f"{table_name}:{source}"
+
+def get_watermark(key: str) -> str | None:
+    table = EtlWatermark.__table__
+    with engine.connect() as conn:
+        return conn.execute(
+            select(table.c.last_ym).where(table.c.source == key)
+        ).scalar_one_or_none()
+
+def set_watermark(key: str, last_ym: str, conn = None) -> None:
+    table = EtlWatermark.__table__
+    stmt = mysql_insert(table).values(source = key, last_ym = last_ym)
+    # 只往前推進，重跑舊檔不會把水位線倒退
+    #   只記過 sha256 的列 last_ym 是 NULL，GREATEST 遇到 NULL 會回 NULL，先補成新值
+    stmt = stmt.on_duplicate_key_update(
+        last_ym = func.greatest(func.coalesce(table.c.last_ym, stmt.inserted.last_ym), stmt.inserted.last_ym)
+    )
+    _execute(stmt, conn)
+
+def get_ingested(key: str) -> str | None:
+    table = EtlWatermark.__table__
+    with engine.connect() as conn:
+        return conn.execute(
+            select(table.c.source_sha256).where(table.c.source == key)
+        ).scalar_one_or_none()
+
+def set_ingested(key: str, sha256: str, conn = None) -> None:
+    # 匯入 (含彙總表 / 資料版本) 都 commit 之後才記；中途失敗下次仍會重新匯入同一個檔案
+    table = EtlWatermark.__table__
+    stmt = mysql_insert(table).values(source = key, source_sha256 = sha256)
+    stmt = stmt.on_duplicate_key_update(source_sha256 = stmt.inserted.source_sha256)
+    _execute(stmt, conn)
+
+def _execute(stmt, conn = None) -> None:
+    if conn is not None:
+        conn.execute(stmt)
+        return
+    with engine.begin() as conn:
+        conn.execute(stmt)
+
+def _ym_column(df: pd.DataFrame) -> str:
+    for col in RAW_YM_COLS:
+        if col in df.columns:
+            return col
+    raise ValueError(f"[INFO] 找不到年月欄位，目前欄位：{df.columns.tolist()}")
+
+def _ym_strings(s: pd.Series) -> pd.Series:
+    # CSV 的年月會被讀成數字 (有缺值時是 float)，先轉回 'YYYYMM' 字串再比較
+    if pd.api.types.is_numeric_dtype(s):
+        s = s.astype("Int64")
+    return s.astype("string").str.strip()
+
+def drop_loaded_months(df: pd.DataFrame, watermark: str | None) -> pd.DataFrame:
+    # 原始 (年月) 或清理後 (ym) 的 frame 都適用；年月缺失的列保留給後續補值
+    if watermark is None or df.empty:
+        return df
+    col = _ym_column(df)
+    ym = _ym_strings(df[col])
+    keep = ym.isna() | (ym > watermark)
+    return df.loc[keep.to_numpy(dtype = bool, na_value = True)]
+
+def max_ym(df: pd.DataFrame) -> str | None:
+    if df.empty:
+        return None
+    val = _ym_strings(df[_ym_column(df)]).max()
+    return None if pd.isna(val) else str(val)
@@ -1,7 +1,7 @@
 import os 
 import pymysql 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import declarative_base, sessionmaker, Session
 from sqlalchemy.engine import URL 
 
@@ -38,8 +38,6 @@ db_url = URL.create(
     query    = {"charset": "utf8mb4"}
 )
 
-create_database_if_not_exist()
-
 engine = create_engine(
     db_url,
     pool_size     = 5,
@@ -52,6 +50,16 @@ engine = create_engine(
 )
 
 
+# 第一次真正連線前才建資料庫：import 本模組不連 DB
+#   產圖行程池 / 平行解析的子行程 import 套件時不會各自連一次 MySQL
+_database_ready = False
+
+@event.listens_for(engine, "do_connect")
+def _ensure_database(dialect, conn_rec, cargs, cparams):
+    global _database_ready
+    if not _database_ready:
+        create_database_if_not_exist()
+        _database_ready = True
 
 SessionLocal = sessionmaker(bind = engine, autoflush = False, autocommit = False, expire_on_commit = False)
 
@@ -1,5 +1,5 @@
 import enum
-from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Boolean, ForeignKey, JSON, Enum, func
+from sqlalchemy import Column, Integer, SmallInteger, BigInteger, String, DateTime, Boolean, ForeignKey, JSON, Enum, UniqueConstraint, Index, func
 from sqlalchemy.orm import relationship
 from .database import Base 
 
@@ -29,6 +29,7 @@ class ChartRequest(BaseModel):
 
 class ChartResult(BaseModel):
     __tablename__ = "chart_results"
+    __table_args__ = (Index("ix_chart_results_status_lease", "status", "lease_expires_at"),)
     chart_type    = Column(String(50), nullable = False, comment = "圖形類別")
     params_json   = Column(JSON, nullable = False, comment = "參數")
     params_figure = Column(JSON, nullable = False, comment = "圖表大項")
@@ -40,6 +41,11 @@ class ChartResult(BaseModel):
                     comment  = "產製狀態"
     )
     file_path = Column(String(100), nullable = True, comment = "圖檔路徑")
+    lease_owner      = Column(String(100), nullable = True, comment = "產圖租約持有者 (host:pid)")
+    lease_expires_at = Column(DateTime, nullable = True, comment = "產圖租約到期時間")
+    attempts    = Column(Integer, nullable = False, default = 0, server_default = "0", comment = "產圖次數")
+    error_json  = Column(JSON, nullable = True, comment = "產圖失敗原因")
+    retry_after = Column(DateTime, nullable = True, comment = "失敗後可重試時間 (次數用完時為退避上限)")
     create_by = Column(Integer, nullable = True, comment = "建立者ID")
     create_at = Column(DateTime, server_default = func.now(), comment = "建立時間")
     update_at = Column(DateTime, server_default = func.now(), onupdate = func.now(), comment = "更新時間")
@@ -52,14 +58,119 @@ class ChartResult(BaseModel):
                 f"cache_key = {self.cache_key}, status = {self.status.name})>"
         )
     
+# 維度表：clean_data 只存 SMALLINT 代碼，標籤與排序在這裡
+class DimensionModel(BaseModel):
+    __abstract__ = True
+    id         = Column(SmallInteger, primary_key = True, autoincrement = True, comment = "代碼")
+    label      = Column(String(20), nullable = False, unique = True, comment = "標籤")
+    sort_order = Column(SmallInteger, nullable = False, default = 0, comment = "顯示排序")
+
+class DimNation(DimensionModel):
+    __tablename__ = "dim_nation"
+
+class DimIndustry(DimensionModel):
+    __tablename__ = "dim_industry"
+
+class DimAgeLevel(DimensionModel):
+    __tablename__ = "dim_age_level"
+
+# clean_data 欄位 -> 代碼欄位 / 維度表
+DIMENSIONS = {
+    "nation"   : ("nation_id", DimNation),
+    "industry" : ("industry_id", DimIndustry),
+    "age_level": ("age_level_id", DimAgeLevel)
+}
+
+# clean_data 的自然鍵：同一月份 / 地區 / 產業 / 年齡層只會有一筆
+CLEAN_DATA_KEY = ("ym", "nation_id", "industry_id", "age_level_id")
+
+# 圖表 / dashboard 查詢的覆蓋索引：等值篩選的維度在前、ym_key 範圍其次，
+#   其餘分組欄位與量值都在索引裡，查詢不必回表
+#   ym      : 只有月份範圍 (或無篩選)、MIN / MAX / DISTINCT ym_key
+#   industry: 產業別篩選 (可再加年齡層)
+#   age     : 只有年齡層篩選
+CLEAN_DATA_INDEXES = {
+    "ix_clean_data_ym_cover"      : ("ym_key", "industry_id", "age_level_id", "trans_total", "trans_count"),
+    "ix_clean_data_industry_cover": ("industry_id", "age_level_id", "ym_key", "trans_total", "trans_count"),
+    "ix_clean_data_age_cover"     : ("age_level_id", "ym_key", "industry_id", "trans_total", "trans_count"),
+}
+
 class CleanedData(BaseModel):
     __tablename__ = "clean_data"
-    ym          = Column(String(20), nullable = False, comment = "年月")
-    nation      = Column(String(20), nullable = False, comment = "地區")
-    industry    = Column(String(20), nullable = False, comment = "產業別")
-    age_level   = Column(String(20), nullable = False, comment = "年齡層")
-    trans_count = Column(BigInteger, nullable = False, comment = "交易筆數")
-    trans_total = Column(BigInteger, nullable = False, comment = "交易金額")
+    __table_args__ = (
+        UniqueConstraint(*CLEAN_DATA_KEY, name = "uq_clean_data_ym_nation_industry_age"),
+        *(Index(name, *cols) for name, cols in CLEAN_DATA_INDEXES.items()),
+    )
+    ym           = Column(String(20), nullable = False, comment = "年月")
+    ym_key       = Column(SmallInteger, nullable = False, comment = "年月整數鍵 (年 * 12 + 月 - 1)")
+    nation_id    = Column(SmallInteger, nullable = False, comment = "地區代碼 (dim_nation)")
+    industry_id  = Column(SmallInteger, nullable = False, comment = "產業別代碼 (dim_industry)")
+    age_level_id = Column(SmallInteger, nullable = False, comment = "年齡層代碼 (dim_age_level)")
+    trans_count  = Column(BigInteger, nullable = False, comment = "交易筆數")
+    trans_total  = Column(BigInteger, nullable = False, comment = "交易金額")
+
+# =========================
+# 彙總表 (rollup)：clean_data 依兩個以下的維度預先加總，ETL 結束時重建
+#   圖表查詢用到的維度 (分組 + 篩選) 都在某張彙總表裡時改查彙總表
+# =========================
+class RollupModel(BaseModel):
+    __abstract__ = True
+    trans_count = Column(BigInteger, nullable = False, comment = "交易筆數合計")
+    trans_total = Column(BigInteger, nullable = False, comment = "交易金額合計")
+
+class RollupYm(RollupModel):
+    __tablename__ = "rollup_ym"
+    __table_args__ = (UniqueConstraint("ym_key", name = "uq_rollup_ym"),)
+    ym_key = Column(SmallInteger, nullable = False, comment = "年月整數鍵")
+
+class RollupIndustryAge(RollupModel):
+    __tablename__ = "rollup_industry_age"
+    __table_args__ = (UniqueConstraint("industry_id", "age_level_id", name = "uq_rollup_industry_age"),)
+    industry_id  = Column(SmallInteger, nullable = False, comment = "產業別代碼")
+    age_level_id = Column(SmallInteger, nullable = False, comment = "年齡層代碼")
+
+class RollupYmIndustry(RollupModel):
+    __tablename__ = "rollup_ym_industry"
+    __table_args__ = (UniqueConstraint("ym_key", "industry_id", name = "uq_rollup_ym_industry"),)
+    ym_key      = Column(SmallInteger, nullable = False, comment = "年月整數鍵")
+    industry_id = Column(SmallInteger, nullable = False, comment = "產業別代碼")
+
+class RollupYmAge(RollupModel):
+    __tablename__ = "rollup_ym_age"
+    __table_args__ = (UniqueConstraint("ym_key", "age_level_id", name = "uq_rollup_ym_age"),)
+    ym_key       = Column(SmallInteger, nullable = False, comment = "年月整數鍵")
+    age_level_id = Column(SmallInteger, nullable = False, comment = "年齡層代碼")
+
+# 彙總表 -> 維度欄位，依筆數由少到多排列 (查詢挑第一張涵蓋所需維度的表)
+ROLLUPS = {
+    RollupYm.__tablename__         : ("ym_key",),
+    RollupIndustryAge.__tablename__: ("industry_id", "age_level_id"),
+    RollupYmIndustry.__tablename__ : ("ym_key", "industry_id"),
+    RollupYmAge.__tablename__      : ("ym_key", "age_level_id"),
+}
+
+# =========================
+# 資料版本：clean_data 每次匯入完成 +1，並記下這一版異動的月份
+#   API 端的記憶體彙總只比對版本號，有變動時只重算記錄到的月份
+# =========================
+class DatasetVersion(BaseModel):
+    __tablename__ = "dataset_version"
+    version   = Column(BigInteger, nullable = False, default = 0, comment = "資料版本")
+    update_at = Column(DateTime, server_default = func.now(), onupdate = func.now(), comment = "更新時間")
+
+class DatasetChange(BaseModel):
+    __tablename__ = "dataset_changes"
+    __table_args__ = (Index("ix_dataset_changes_version", "version"),)
+    version   = Column(BigInteger, nullable = False, comment = "資料版本")
+    ym_key    = Column(SmallInteger, nullable = True, comment = "異動年月整數鍵 (NULL 表示整表重載)")
+    create_at = Column(DateTime, server_default = func.now(), comment = "建立時間")
+
+class EtlWatermark(BaseModel):
+    __tablename__ = "etl_watermark"
+    source    = Column(String(100), nullable = False, unique = True, comment = "資料來源")
+    last_ym   = Column(String(20), nullable = True, comment = "最後匯入年月")
+    source_sha256 = Column(String(64), nullable = True, comment = "最後成功匯入的來源檔 sha256")
+    update_at = Column(DateTime, server_default = func.now(), onupdate = func.now(), comment = "更新時間")
 
 class TestTable(BaseModel):
     __tablename__ = "test_table"
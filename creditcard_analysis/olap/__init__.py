@@ -0,0 +1,115 @@
+import os
+import threading
+
+from .cube import Cube, read_facts, read_dims
+from .snapshot import snapshot_dir, current_snapshot_version, publish, attach, publisher_lock
+from ..clean_data.dataset_version import changed_months
+
+# =========================
+# 記憶體 cube 開關：OLAP_CUBE=1 時 API 啟動載入，圖表與 dashboard 改由 cube 計算
+#   背景執行緒每 OLAP_POLL_SECONDS 秒比對 dataset_version，ETL 匯入後只重算異動的月份
+#   新的 cube 建好才換上，之前的查詢一律用舊版本
+#   OLAP_SNAPSHOT_DIR：多個 worker 共用 mmap 快照，只有一個 worker 讀 DB (見 snapshot.py)
+# =========================
+
+_cube: Cube | None = None
+_refresh_lock = threading.Lock()
+
+
+def cube_enabled() -> bool:
+    return os.getenv("OLAP_CUBE", "0").strip().lower() in ("1", "true", "yes", "on")
+
+def poll_seconds() -> float:
+    return float(os.getenv("OLAP_POLL_SECONDS", "30"))
+
+def load_cube(engine = None) -> Cube:
+    # 先建好新的 cube 再整個換掉，查詢中的請求仍用舊的那份
+    global _cube
+    cube = Cube.from_db(engine)
+    _cube = cube
+    return cube
+
+def get_cube() -> Cube | None:
+    return _cube if cube_enabled() else None
+
+def _updated(cube: Cube | None, engine) -> Cube | None:
+    # 依 dataset_version 算出新的 cube；版本沒變回傳 None
+    if cube is None:
+        return Cube.from_db(engine)
+    with engine.connect() as conn:
+        version, months = changed_months(conn, cube.version)
+        if version == cube.version:
+            return None
+        if months is not None:
+            facts = read_facts(conn, months)
+            dims  = read_dims(conn)
+    if months is None:
+        return Cube.from_db(engine)
+    print(f"[INFO] cube 更新到版本 {version}：重算 {len(months)} 個月份")
+    return cube.replace_months(months, facts, dims, version)
+
+def _sync_snapshot(root, engine) -> bool:
+    # 拿到鎖的 worker 從 DB 更新並發布；所有 worker 都只掛上 CURRENT 指向的快照
+    global _cube
+    with publisher_lock(root) as leader:
+        if leader:
+            base = _cube
+            published = current_snapshot_version(root)
+            if published is not None and (base is None or published > base.version):
+                base = attach(root)
+            new = _updated(base, engine)
+            if new is not None:
+                publish(new, root)
+            elif published is None:
+                publish(base, root)
+    return follow_snapshot(root)
+
+def follow_snapshot(root) -> bool:
+    # 只掛上 CURRENT 指向的快照，不讀 DB (產圖行程也用這個)
+    global _cube
+    published = current_snapshot_version(root)
+    if published is None or (_cube is not None and _cube.version == published):
+        return False
+    _cube = attach(root)
+    print(f"[INFO] cube 掛上共享快照：版本 {published}")
+    return True
+
+def refresh_cube(engine = None) -> bool:
+    # 版本有變才更新；有整表重載或異動紀錄對不上時整份重新載入。回傳是否換了新的 cube
+    #   設定 OLAP_SNAPSHOT_DIR 時改走共享快照，worker 之間共用同一份
+    global _cube
+    if engine is None:
+        from ..database import engine
+    with _refresh_lock:
+        root = snapshot_dir()
+        if root is not None:
+            return _sync_snapshot(root, engine)
+        new = _updated(_cube, engine)
+        if new is None:
+            return False
+        _cube = new
+        return True
+
+
+class CubePoller:
+    # 背景輪詢 dataset_version；失敗時保留舊的 cube，下一輪再試
+    def __init__(self, interval: float | None = None, engine = None):
+        self.interval = poll_seconds() if interval is None else interval
+        self.engine = engine
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target = self._run, name = "olap-cube-poller", daemon = True)
+
+    def _run(self) -> None:
+        while not self.stop_event.wait(self.interval):
+            try:
+                refresh_cube(self.engine)
+            except Exception as e:
+                print(f"[WARN] cube 更新失敗，繼續使用版本 {_cube.version if _cube else '-'}：{e}")
+
+    def start(self) -> "CubePoller":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        self.thread.join(timeout = 5)
@@ -0,0 +1,331 @@
+import numpy as np
+import pandas as pd
+from typing import Iterable
+from sqlalchemy import text, bindparam
+
+from ..models import DIMENSIONS
+from ..utils import ym_to_key, key_to_ym
+from ..chart_gener.utils import clamp, check_valid_column
+
+# =========================
+# 記憶體 OLAP cube：clean_data 依 (年月, 產業別, 年齡層) 預先加總成稠密的 int64 陣列
+#   圖表 / dashboard 的查詢只剩切片 + 沿軸加總，不必回 DB
+#   結果與 raw_sql.py / dashboard.py 的 SQL 相同 (欄位、排序、MySQL DECIMAL 除法的四捨五入)
+#   地區不在任何查詢裡，載入時直接加總掉
+# =========================
+
+AXES     = ("ym", "industry", "age_level")    # cube 的軸順序
+MEASURES = ("trans_count", "trans_total")
+UNIT_PER_AMOUNT = 1_000_000_000               # 同 dashboard.UNIT_PER_AMOUNT
+DIV_SCALE = 10_000                            # MySQL 除法結果多 4 位小數 (div_precision_increment)
+
+LOAD_SQL = """
+    SELECT ym_key, industry_id, age_level_id,
+           CAST(SUM(trans_count) AS SIGNED) AS trans_count,
+           CAST(SUM(trans_total) AS SIGNED) AS trans_total
+    FROM clean_data
+    {where}
+    GROUP BY ym_key, industry_id, age_level_id
+"""
+
+
+def read_facts(conn, months: Iterable[int] | None = None) -> pd.DataFrame:
+    # months 為 ym_key；None 表示全部月份
+    if months is None:
+        return pd.read_sql(text(LOAD_SQL.format(where = "")), conn)
+    stmt = text(LOAD_SQL.format(where = "WHERE ym_key IN :months")).bindparams(bindparam("months", expanding = True))
+    return pd.read_sql(stmt, conn, params = {"months": sorted(months)})
+
+def read_dims(conn) -> dict[str, pd.DataFrame]:
+    return {
+        name: pd.read_sql(text(f"SELECT id, label, sort_order FROM {DIMENSIONS[name][1].__tablename__}"), conn)
+        for name in ("industry", "age_level")
+    }
+
+
+def div_half_up(a, b):
+    # 非負整數 a / b 四捨五入到整數 (MySQL DECIMAL 的進位方式)；可傳 numpy 陣列
+    return (2 * a + b) // (2 * b)
+
+def mysql_div(a: int, b: int) -> float | None:
+    # SQL 的 a / b (a、b 為整數 / DECIMAL)：結果取 4 位小數、四捨五入；除以 0 為 NULL
+    if b == 0:
+        return None
+    return div_half_up(int(a) * DIV_SCALE, int(b)) / DIV_SCALE
+
+
+class Dimension:
+    # 維度表：代碼 -> cube 軸上的位置、標籤、排序 (sort_order 相同時依代碼)
+    def __init__(self, ids, labels, sort_order):
+        order = np.argsort(np.asarray(ids), kind = "stable")
+        self.ids        = np.asarray(ids, dtype = "int64")[order]
+        self.labels     = np.asarray(labels, dtype = object)[order]
+        self.sort_order = np.asarray(sort_order, dtype = "int64")[order]
+        self.position   = {label: i for i, label in enumerate(self.labels)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def positions(self, ids: np.ndarray) -> np.ndarray:
+        # 不在維度表的代碼回傳 -1
+        pos = np.searchsorted(self.ids, ids)
+        pos = np.minimum(pos, max(len(self.ids) - 1, 0))
+        found = (self.ids[pos] == ids) if len(self.ids) else np.zeros(len(ids), dtype = bool)
+        return np.where(found, pos, -1)
+
+
+def _dimensions(dims: dict[str, pd.DataFrame]) -> tuple[Dimension, Dimension]:
+    return tuple(
+        Dimension(dims[name]["id"].to_numpy(), dims[name]["label"].to_numpy(), dims[name]["sort_order"].to_numpy())
+        for name in ("industry", "age_level")
+    )
+
+
+class Cube:
+    def __init__(self, ym_key, industry_id, age_level_id, measures: dict[str, np.ndarray],
+                 industry: Dimension, age_level: Dimension, version: int = 0):
+        self.version = version          # 對應 dataset_version，輪詢時判斷是否過期
+        self.dims = {"industry": industry, "age_level": age_level}
+        ym_key = np.asarray(ym_key, dtype = "int64")
+        ind = industry.positions(np.asarray(industry_id, dtype = "int64"))
+        age = age_level.positions(np.asarray(age_level_id, dtype = "int64"))
+
+        # 對不到維度表的列 SQL 在 JOIN 時也會被丟掉
+        known = (ind >= 0) & (age >= 0)
+        if not known.all():
+            print(f"[WARN] cube 略過代碼不在維度表的資料：{int((~known).sum())} 筆")
+        ym_key, ind, age = ym_key[known], ind[known], age[known]
+
+        self.ym0 = int(ym_key.min()) if len(ym_key) else 0
+        self.shape = (int(ym_key.max()) - self.ym0 + 1 if len(ym_key) else 0, len(industry), len(age_level))
+
+        # 每一格的筆數 (判斷分組是否存在) 與量值合計；int64 累加，金額不會有浮點誤差
+        cell = np.ravel_multi_index((ym_key - self.ym0, ind, age), self.shape) if len(ym_key) else np.zeros(0, dtype = "int64")
+        size = int(np.prod(self.shape))
+        self.rows = np.bincount(cell, minlength = size).reshape(self.shape)
+        self.sums: dict[str, np.ndarray] = {}
+        for m in MEASURES:
+            total = np.zeros(size, dtype = "int64")
+            np.add.at(total, cell, np.asarray(measures[m], dtype = "int64")[known])
+            self.sums[m] = total.reshape(self.shape)
+
+    @classmethod
+    def from_frames(cls, facts: pd.DataFrame, dims: dict[str, pd.DataFrame], version: int = 0) -> "Cube":
+        return cls(
+            facts["ym_key"].to_numpy(), facts["industry_id"].to_numpy(), facts["age_level_id"].to_numpy(),
+            {m: facts[m].to_numpy() for m in MEASURES},
+            *_dimensions(dims), version = version
+        )
+
+    @classmethod
+    def from_arrays(cls, rows: np.ndarray, sums: dict[str, np.ndarray], ym0: int,
+                    dims: dict[str, pd.DataFrame], version: int = 0) -> "Cube":
+        # 直接使用已加總好的稠密陣列 (例如共享快照的 mmap)，不複製、不重算
+        cube = cls.__new__(cls)
+        cube.version = version
+        cube.dims = dict(zip(("industry", "age_level"), _dimensions(dims)))
+        cube.ym0 = int(ym0)
+        cube.shape = tuple(rows.shape)
+        cube.rows = rows
+        cube.sums = {m: sums[m] for m in MEASURES}
+        return cube
+
+    @classmethod
+    def from_db(cls, engine = None) -> "Cube":
+        from ..clean_data.dataset_version import current_version
+        if engine is None:
+            from ..database import engine
+        # 版本號與資料在同一個 transaction 讀 (InnoDB 一致性快照)，版本號不會比資料新
+        with engine.connect() as conn:
+            version = current_version(conn)
+            facts = read_facts(conn)
+            dims = read_dims(conn)
+        cube = cls.from_frames(facts, dims, version)
+        print(f"[INFO] cube 載入完成：版本 {version}，{len(facts)} 筆，shape = {cube.shape}")
+        return cube
+
+    def to_frame(self) -> pd.DataFrame:
+        # 還原成 LOAD_SQL 的格式 (每個有資料的格子一列)
+        t, i, a = np.nonzero(self.rows)
+        return pd.DataFrame({
+            "ym_key"      : t + self.ym0,
+            "industry_id" : self.dims["industry"].ids[i],
+            "age_level_id": self.dims["age_level"].ids[a],
+            **{m: self.sums[m][t, i, a] for m in MEASURES}
+        })
+
+    def replace_months(self, months: Iterable[int], facts: pd.DataFrame, dims: dict[str, pd.DataFrame], version: int) -> "Cube":
+        # 換掉指定月份 (ym_key) 的資料，其餘月份沿用；回傳新的 cube，自己不變 (查詢中的請求繼續用舊的)
+        old = self.to_frame()
+        old = old.loc[~old["ym_key"].isin(list(months))]
+        frames = [f for f in (old, facts) if not f.empty]
+        merged = pd.concat(frames, ignore_index = True) if frames else facts
+        return Cube.from_frames(merged, dims, version)
+
+    # =========================
+    # 切片與分組
+    # =========================
+
+    def _slices(self, start_month, end_month, industry, age_level) -> tuple[slice, slice, slice] | None:
+        n_t, n_ind, n_age = self.shape
+        t0 = 0 if start_month is None else max(ym_to_key(start_month) - self.ym0, 0)
+        t1 = n_t if end_month is None else min(ym_to_key(end_month) - self.ym0 + 1, n_t)
+        if t0 >= t1:
+            return None
+        out = [slice(t0, t1)]
+        for name, label in (("industry", industry), ("age_level", age_level)):
+            if label is None:
+                out.append(slice(0, len(self.dims[name])))
+                continue
+            pos = self.dims[name].position.get(label)
+            if pos is None:
+                return None
+            out.append(slice(pos, pos + 1))
+        return tuple(out)
+
+    def group(self, axes: list[str], measures: list[str], start_month = None, end_month = None,
+              industry = None, age_level = None) -> tuple[list[np.ndarray], dict[str, np.ndarray]]:
+        # 回傳 (每個分組軸的位置陣列, 量值合計)，只含有資料的分組 (同 SQL GROUP BY)
+        sl = self._slices(start_month, end_month, industry, age_level)
+        if sl is None:
+            return [np.zeros(0, dtype = "int64") for _ in axes], {m: np.zeros(0, dtype = "int64") for m in measures}
+
+        drop = tuple(i for i, a in enumerate(AXES) if a not in axes)
+        kept = [a for a in AXES if a in axes]
+        perm = [kept.index(a) for a in axes]
+        rows = self.rows[sl].sum(axis = drop).transpose(perm)
+        found = np.nonzero(rows > 0)
+        positions = [p + sl[AXES.index(a)].start for p, a in zip(found, axes)]
+        sums = {m: self.sums[m][sl].sum(axis = drop).transpose(perm)[found] for m in measures}
+        return positions, sums
+
+    def labels(self, axis: str, pos: np.ndarray) -> np.ndarray:
+        if axis == "ym":
+            return np.array([key_to_ym(self.ym0 + p) for p in pos], dtype = object)
+        return self.dims[axis].labels[pos]
+
+    def sort_key(self, axis: str, pos: np.ndarray) -> np.ndarray:
+        # 同 SQL 的 ORDER BY：年月依 ym_key、維度依 sort_order
+        if axis == "ym":
+            return pos
+        return self.dims[axis].sort_order[pos]
+
+    # =========================
+    # 各圖表的查詢 (參數與 raw_sql.py 相同)
+    # =========================
+
+    def ym_range(self) -> pd.DataFrame:
+        present = np.nonzero(self.rows.sum(axis = (1, 2)) > 0)[0]
+        if len(present) == 0:
+            return pd.DataFrame({"earliest_ym": [None], "latest_ym": [None]})
+        return pd.DataFrame({
+            "earliest_ym": [key_to_ym(self.ym0 + present[0])],
+            "latest_ym"  : [key_to_ym(self.ym0 + present[-1])]
+        })
+
+    def bar(self, x_axis, value, topn = None, start_month = None, end_month = None, industry = None, age_level = None) -> pd.DataFrame:
+        check_valid_column(x_axis, value = value)
+        (pos,), sums = self.group([x_axis], [value], start_month, end_month, industry, age_level)
+        amount = sums[value]
+        if x_axis == "ym":
+            order = np.argsort(pos, kind = "stable")
+        else:
+            order = np.argsort(-amount, kind = "stable")[:clamp(topn if topn is not None else 20, 1, 200)]
+        return pd.DataFrame({"x": self.labels(x_axis, pos[order]), "raw_amount": amount[order]})
+
+    def line(self, x_axis, value, topn = None, start_month = None, end_month = None, industry = None, age_level = None) -> pd.DataFrame:
+        check_valid_column(x_axis, value = value)
+        (pos,), sums = self.group([x_axis], [value], start_month, end_month, industry, age_level)
+        # sort_order 相同時依代碼
+        order = np.lexsort((pos, self.sort_key(x_axis, pos)))
+        if x_axis != "ym":
+            order = order[:clamp(topn if topn is not None else 20, 1, 200)]
+        return pd.DataFrame({"x": self.labels(x_axis, pos[order]), "raw_amount": sums[value][order]})
+
+    def pie(self, x_axis, value, topn = None, start_month = None, end_month = None, industry = None, age_level = None) -> pd.DataFrame:
+        check_valid_column(x_axis = x_axis, value = value)
+        (pos,), sums = self.group([x_axis], [value], start_month, end_month, industry, age_level)
+        amount = sums[value]
+        total = int(amount.sum())
+
+        # ROUND(group / total, 2) * 100：除法先取 4 位小數，再四捨五入到 2 位 (百分比整數)
+        slices: dict[str, float] = {}
+        for label, v in zip(self.labels(x_axis, pos), amount):
+            if total == 0:
+                pct = np.nan
+            else:
+                pct = div_half_up(div_half_up(int(v) * DIV_SCALE, total), 100)
+            key = "其他" if pct < 10 else label
+            slices[key] = slices.get(key, 0) + pct
+        df = pd.DataFrame({"x": list(slices), "amount": list(slices.values())})
+
+        if x_axis == "ym":
+            df = df.sort_values("x", kind = "stable")
+        else:
+            df = df.sort_values("amount", ascending = False, kind = "stable")
+        return df.head(clamp(topn if topn else 20, 1, 200)).reset_index(drop = True)
+
+    def heatmap(self, x_axis, y_axis, value, value2, start_month = None, end_month = None, industry = None, age_level = None) -> pd.DataFrame:
+        if value != "trans_total" or value2 != "trans_count":
+            raise ValueError("heatmap 只允許 trans_total / trans_count")
+        check_valid_column(x_axis, y_axis, value, value2)
+        (px, py), sums = self.group([x_axis, y_axis], [value, value2], start_month, end_month, industry, age_level)
+
+        first, second = (y_axis, x_axis) if y_axis == "age_level" and x_axis != "age_level" else (x_axis, y_axis)
+        keys = {x_axis: px, y_axis: py}
+        # 先依兩軸的排序值 (同 SQL)，全部相同時再依代碼
+        order = np.lexsort((keys[second], keys[first], self.sort_key(second, keys[second]), self.sort_key(first, keys[first])))
+
+        avg = [mysql_div(a, b) for a, b in zip(sums[value][order], sums[value2][order])]
+        return pd.DataFrame({
+            "industry"  : self.labels(x_axis, px[order]),
+            "age_level" : self.labels(y_axis, py[order]),
+            "avg_amount": np.array([np.nan if v is None else v for v in avg], dtype = "float64")
+        })
+
+    def query(self, shape: str, **kwargs) -> pd.DataFrame:
+        handlers = {"bar": self.bar, "line": self.line, "pie": self.pie, "heatmap": self.heatmap}
+        if shape not in handlers:
+            raise ValueError(f"cube 不支援的圖表：{shape}")
+        return handlers[shape](**kwargs)
+
+    # =========================
+    # dashboard.overview
+    # =========================
+
+    def overview(self, start_month = None, end_month = None, industry = None, age_level = None) -> dict[str, pd.DataFrame]:
+        present = np.nonzero(self.rows.sum(axis = (1, 2)) > 0)[0]
+        earliest_key, latest_key = self.ym0 + int(present[0]), self.ym0 + int(present[-1])
+
+        if start_month is None and end_month is None:
+            end_key, start_key = latest_key, latest_key - latest_key % 12
+        elif start_month is not None and end_month is None:
+            end_key, start_key = latest_key, ym_to_key(start_month)
+        elif end_month is not None and start_month is None:
+            end_key, start_key = ym_to_key(end_month), earliest_key
+        else:
+            start_key, end_key = ym_to_key(start_month), ym_to_key(end_month)
+        start_ym, end_ym = key_to_ym(start_key), key_to_ym(end_key)
+
+        def amounts(values) -> np.ndarray:
+            return np.array([mysql_div(v, UNIT_PER_AMOUNT) for v in values], dtype = "float64")
+
+        (t,), sums = self.group(["ym"], ["trans_total"], start_ym, end_ym, industry, age_level)
+        order = np.argsort(t, kind = "stable")
+        trend = pd.DataFrame({"ym": self.labels("ym", t[order]), "amount": amounts(sums["trans_total"][order])})
+
+        (t, ind), sums = self.group(["ym", "industry"], ["trans_total"], start_ym, end_ym, None, age_level)
+        amount = amounts(sums["trans_total"])
+        order = np.lexsort((ind, -amount, t))
+        per_month = pd.DataFrame({
+            "ym"      : self.labels("ym", t[order]),
+            "industry": self.labels("industry", ind[order]),
+            "amount"  : amount[order]
+        })
+
+        (ind,), sums = self.group(["industry"], ["trans_total"], start_ym, end_ym, None, age_level)
+        amount = amounts(sums["trans_total"])
+        order = np.lexsort((ind, -amount))
+        topn = pd.DataFrame({"industry": self.labels("industry", ind[order]), "amount": amount[order]})
+
+        return {"trend": trend, "topn": topn, "topn_per_month": per_month}
@@ -0,0 +1,90 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from contextlib import contextmanager
+
+from .cube import Cube, MEASURES
+from ..utils.versioned_dir import version_name, current_name, write_version, set_current, prune
+
+try:
+    import fcntl
+except ImportError:         # Windows：沒有 flock，每個 worker 都自行發布 (結果相同，只是多讀幾次 DB)
+    fcntl = None
+
+# =========================
+# cube 共享快照：多個 uvicorn worker 共用同一份 cube，而不是各自從 MySQL 載入一份
+#   每一版：<root>/v00000012/{rows,trans_count,trans_total}.npy + meta.json，以 CURRENT 指向目前版本
+#   發布與換版見 utils/versioned_dir.py，讀取端只會看到完整的一版
+#   讀取：np.load(mmap_mode = "r")，各 worker 共用 OS page cache，不複製
+# =========================
+
+LOCK = ".lock"
+KEEP_VERSIONS = 3           # 保留最近幾版；已 mmap 的舊版即使被刪，開著的 worker 仍可讀到換版為止
+
+
+def snapshot_dir() -> Path | None:
+    root = os.getenv("OLAP_SNAPSHOT_DIR", "").strip()
+    return Path(root).expanduser().resolve() if root else None
+
+def current_snapshot_version(root: Path) -> int | None:
+    name = current_name(root)
+    if name is None:
+        return None
+    return json.loads((root / name / "meta.json").read_text(encoding = "utf-8"))["version"]
+
+
+def publish(cube: Cube, root: Path) -> Path:
+    def write(tmp: Path) -> None:
+        np.save(tmp / "rows.npy", np.ascontiguousarray(cube.rows))
+        for m in MEASURES:
+            np.save(tmp / f"{m}.npy", np.ascontiguousarray(cube.sums[m]))
+        meta = {
+            "version": cube.version,
+            "ym0"    : cube.ym0,
+            "dims"   : {
+                name: {"id": d.ids.tolist(), "label": d.labels.tolist(), "sort_order": d.sort_order.tolist()}
+                for name, d in cube.dims.items()
+            },
+        }
+        (tmp / "meta.json").write_text(json.dumps(meta, ensure_ascii = False), encoding = "utf-8")
+
+    # 另一個 worker 已發布同一版時沿用該版
+    target = write_version(root, version_name(cube.version), write)
+    set_current(root, target.name)
+    prune(root, KEEP_VERSIONS)
+    print(f"[INFO] cube 快照已發布：{target}")
+    return target
+
+def attach(root: Path) -> Cube | None:
+    # 掛上 CURRENT 指向的快照；陣列為唯讀 mmap
+    name = current_name(root)
+    if name is None:
+        return None
+    path = root / name
+    meta = json.loads((path / "meta.json").read_text(encoding = "utf-8"))
+    load = lambda f: np.asarray(np.load(path / f"{f}.npy", mmap_mode = "r"))
+    return Cube.from_arrays(
+        load("rows"), {m: load(m) for m in MEASURES}, meta["ym0"],
+        {name: pd.DataFrame(d) for name, d in meta["dims"].items()},
+        meta["version"]
+    )
+
+@contextmanager
+def publisher_lock(root: Path):
+    # 同時只讓一個 worker 負責從 DB 更新並發布；拿不到鎖的 worker 只掛上別人發布的快照
+    root.mkdir(parents = True, exist_ok = True)
+    if fcntl is None:
+        yield True
+        return
+    with open(root / LOCK, "a+") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
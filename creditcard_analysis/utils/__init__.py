@@ -1,6 +1,6 @@
 from .db_query import get_object_by_id, get_object_by_column
-from .utils import get_path, handling_duplicate_value, handling_missing_value
+from .utils import get_path, handling_duplicate_value, handling_missing_value, ym_to_key, key_to_ym, ym_keys, year_start_key
 from .schemas import (ChartIn, ChartOut, ColumnName, MetricColumn, 
-                      ChartType, Filter, ChartPoint, DashboardResponse, TrendPoint, TopIndustry, TopnPerMonth)
+                      ChartType, Filter, ChartPoint, DashboardResponse, TrendPoint, TopIndustry, TopnPerMonth, YM_PATTERN)
 from .deps import Db, get_db
 from .meta import Option, MetaPayload
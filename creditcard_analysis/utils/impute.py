@@ -0,0 +1,137 @@
+import logging
+import numpy as np
+import pandas as pd
+from collections import Counter
+from typing import Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class QuantileSketch:
+    # t-digest 風格的分位數估計：只保留 (平均值, 權重) centroid，
+    #   中段每個 centroid 約涵蓋 pi / compression 的分位範圍，兩端更細；記憶體與資料量無關
+    def __init__(self, compression: int = 1000, buffer_size: int = 50_000):
+        self.compression = compression
+        self.buffer_size = buffer_size
+        self._means   = np.empty(0)
+        self._weights = np.empty(0)
+        self._buffer  : list[np.ndarray] = []
+        self._buffered = 0
+        self.count = 0
+        self.min   = np.inf
+        self.max   = -np.inf
+
+    def update(self, values) -> None:
+        values = np.asarray(values, dtype = "float64")
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        self.count += values.size
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self._buffer.append(values)
+        self._buffered += values.size
+        if self._buffered >= self.buffer_size:
+            self._compress()
+
+    def _scale(self, q: np.ndarray) -> np.ndarray:
+        return self.compression / (2 * np.pi) * np.arcsin(2 * np.clip(q, 0, 1) - 1)
+
+    def _compress(self) -> None:
+        if not self._buffer:
+            return
+        means   = np.concatenate([self._means, *self._buffer])
+        weights = np.concatenate([self._weights, np.ones(self._buffered)])
+        self._buffer, self._buffered = [], 0
+
+        order = np.argsort(means, kind = "stable")
+        means, weights = means[order], weights[order]
+        cum = np.cumsum(weights)
+        q_mid = (cum - weights / 2) / cum[-1]
+
+        # 依 k-scale 的整數格分組：同一組的分位範圍不超過一格
+        group = np.floor(self._scale(q_mid) - self._scale(np.zeros(1))).astype("int64")
+        starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+        w = np.add.reduceat(weights, starts)
+        self._means   = np.add.reduceat(means * weights, starts) / w
+        self._weights = w
+
+    def quantile(self, q: float) -> float:
+        self._compress()
+        if self.count == 0:
+            return np.nan
+        cum = np.cumsum(self._weights)
+        centers = cum - self._weights / 2
+        xs = np.r_[0, centers, cum[-1]]
+        ys = np.r_[self.min, self._means, self.max]
+        return float(np.interp(q * cum[-1], xs, ys))
+
+    def median(self) -> float:
+        return self.quantile(0.5)
+
+    @property
+    def centroids(self) -> int:
+        self._compress()
+        return self._means.size
+
+
+class StreamingImputer:
+    # 分批學習填補值：數值欄位用 QuantileSketch 估中位數，類別欄位用 Counter 算眾數
+    #   partial_fit 可逐批呼叫，transform 用目前學到的值填補 (延後處理的列 / 第二輪讀檔)
+    def __init__(self, num_cols: Sequence[str], str_cols: Sequence[str], compression: int = 1000):
+        self.num_cols = list(num_cols)
+        self.str_cols = list(str_cols)
+        self.sketches = {c: QuantileSketch(compression) for c in self.num_cols}
+        self.counters = {c: Counter() for c in self.str_cols}
+        self.rows     = 0
+        self.missing  = Counter()
+
+    def partial_fit(self, df: pd.DataFrame) -> None:
+        self.rows += len(df)
+        for col in self.num_cols:
+            if col in df.columns:
+                s = df[col]
+                self.missing[col] += int(s.isna().sum())
+                self.sketches[col].update(s.to_numpy(dtype = "float64", na_value = np.nan))
+        for col in self.str_cols:
+            if col in df.columns:
+                counts = df[col].value_counts(dropna = True)
+                self.missing[col] += int(df[col].isna().sum())
+                self.counters[col].update({k: int(v) for k, v in counts.items() if v > 0})
+
+    def fill_values(self) -> dict:
+        values = {}
+        for col, sketch in self.sketches.items():
+            if sketch.count:
+                values[col] = sketch.median()
+        for col, counter in self.counters.items():
+            if counter:
+                # 與 Series.mode() 相同：次數相同時取排序最前面的值
+                top = max(counter.values())
+                values[col] = min(k for k, v in counter.items() if v == top)
+        return values
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        values = self.fill_values()
+        for col in self.num_cols + self.str_cols:
+            if col not in df.columns or not df[col].isna().any():
+                continue
+            if col not in values:
+                logger.info("%s 欄位無可用填補值，保留缺失值", col)
+                continue
+            fill_val = values[col]
+            if isinstance(df[col].dtype, pd.CategoricalDtype) and fill_val not in df[col].cat.categories:
+                df[col] = df[col].cat.add_categories([fill_val])
+            df[col] = df[col].fillna(fill_val)
+        return df
+
+    def report(self) -> None:
+        values = self.fill_values()
+        for col in self.num_cols + self.str_cols:
+            if self.missing[col] and self.rows:
+                logger.info(
+                    "%s 欄位缺失率：%.2f%% 用%s %s 填補",
+                    col, self.missing[col] / self.rows * 100,
+                    "估計中位數" if col in self.sketches else "眾數", values.get(col)
+                )
+        logger.info("缺失值處理完成 (串流)")
@@ -1,4 +1,5 @@
 from enum import Enum
+from datetime import datetime
 from pydantic import BaseModel, PositiveInt, Field, field_validator, model_validator
 from typing import Optional, Tuple, Union, List
 
@@ -26,9 +27,12 @@ class MetricColumn(str, Enum):
     trans_count = "trans_count"
     trans_total = "trans_total"
 
+# 年月一律 YYYYMM，月份 01-12；不合格式在進入查詢前就回 422
+YM_PATTERN = r"^\d{4}(0[1-9]|1[0-2])$"
+
 class Filter(BaseModel):
-    start_month  : Optional[str] = None
-    end_month    : Optional[str] = None
+    start_month  : Optional[str] = Field(default = None, pattern = YM_PATTERN)
+    end_month    : Optional[str] = Field(default = None, pattern = YM_PATTERN)
     topn         : Optional[PositiveInt] = None
     industry     : Optional[str] = None
     age_level    : Optional[str] = None
@@ -81,6 +85,9 @@ class ChartOut(BaseModel):
     key   : str
     url   : Optional[str] = None
     points: list[ChartPoint] | None = None
+    status: Optional[str] = None
+    error : Optional[dict] = None
+    retry_after: Optional[datetime] = None
 
 
 class TrendPoint(BaseModel):
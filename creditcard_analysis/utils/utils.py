@@ -1,4 +1,5 @@
 import logging
+import numpy as np
 import pandas as pd 
 from pathlib import Path
 from typing import Sequence
@@ -9,12 +10,43 @@ def get_path(BASE_DIR: Path, folder: str, file_name: str) -> Path:
     return BASE_DIR / folder / file_name    
 
 
+# =========================
+# 年月整數鍵：ym_key = 年 * 12 + (月 - 1)
+#   202301 -> 24276；月份加減、季 / 年分組都是整數運算 (季 = ym_key % 12 // 3)
+# =========================
+
+def ym_to_key(ym: str | int) -> int:
+    ym = int(str(ym).strip())
+    year, month = divmod(ym, 100)
+    if not 1 <= month <= 12:
+        raise ValueError(f"invalid ym: {ym!r}")
+    return year * 12 + month - 1
+
+def key_to_ym(key: int) -> str:
+    year, month = divmod(int(key), 12)
+    return f"{year}{month + 1:02d}"
+
+def ym_keys(s: pd.Series) -> np.ndarray:
+    # 向量化版本 (ETL 寫入前使用)；'YYYYMM' 字串或數字皆可
+    ym = pd.to_numeric(s, errors = "raise").to_numpy(dtype = "int64")
+    year, month = np.divmod(ym, 100)
+    if ((month < 1) | (month > 12)).any():
+        raise ValueError("ym 欄位有不合法的月份")
+    return (year * 12 + month - 1).astype("int16")
+
+def year_start_key(key: int) -> int:
+    return key - key % 12
+
+
 def handling_missing_value(
     df: pd.DataFrame, 
     num_cols: Sequence[str] | None = None, 
-    str_cols: Sequence[str] | None = None
+    str_cols: Sequence[str] | None = None,
+    copy: bool = True
 ) -> pd.DataFrame:
-    df = df.copy()
+    # copy = False 時沿用傳入的 df，只替換有缺失值的欄位
+    if copy:
+        df = df.copy()
 
     num_cols = [c for c in (num_cols or []) if c in df.columns]    
     cat_cols = [c for c in (str_cols or []) if c in df.columns]
@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Callable
+
+# =========================
+# 版本化目錄：<root>/v00000012/... + <root>/CURRENT (目前版本的目錄名稱)
+#   寫入：先寫暫存目錄 -> rename 成版本目錄 -> os.replace 換掉 CURRENT，讀取端只會看到完整的一版
+#   已開啟 (mmap) 舊版檔案的讀取端，在舊版目錄被清掉後仍可讀到自己關閉為止
+# =========================
+
+CURRENT = "CURRENT"
+
+
+def version_name(version: int) -> str:
+    return f"v{version:08d}"
+
+def current_name(root: Path) -> str | None:
+    try:
+        return (root / CURRENT).read_text(encoding = "utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+def write_version(root: Path, name: str, write: Callable[[Path], None]) -> Path:
+    # write(tmp_dir) 負責寫入檔案；同名版本已存在時 (別的行程已寫好) 不重寫
+    root.mkdir(parents = True, exist_ok = True)
+    target = root / name
+    if target.exists():
+        return target
+    tmp = Path(tempfile.mkdtemp(prefix = ".tmp-", dir = root))
+    try:
+        write(tmp)
+        os.rename(tmp, target)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors = True)
+        if not target.exists():
+            raise
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors = True)
+        raise
+    return target
+
+def set_current(root: Path, name: str) -> None:
+    pointer = root / f"{CURRENT}.{os.getpid()}.tmp"
+    pointer.write_text(name, encoding = "utf-8")
+    os.replace(pointer, root / CURRENT)
+
+def prune(root: Path, keep: int) -> None:
+    current = current_name(root)
+    versions = sorted(p for p in root.glob("v*") if p.is_dir())
+    for p in versions[:-keep]:
+        if p.name != current:
+            shutil.rmtree(p, ignore_errors = True)
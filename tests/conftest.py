@@ -2,6 +2,8 @@ import sys
 import pytest
 import logging 
 from pathlib import Path 
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.engine import URL
 
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
@@ -11,6 +13,11 @@ from creditcard_analysis.utils.schemas import (
     ColumnName, ChartType, Filter, ParamsJSON,
     ParamsFigure, ChartIn
 )
+from creditcard_analysis import database
+from creditcard_analysis.models import CleanedData, DIMENSIONS, ROLLUPS
+from creditcard_analysis.utils import ym_keys
+from helpers import synthetic_frame, encoded_frame
+from creditcard_analysis.clean_data.rollup import refresh_rollups
 
 def pytest_configure(config):
     Path("logs").mkdir(exist_ok = True)
@@ -58,3 +65,60 @@ def make_chartin():
             filters = Filter()
         )
     return _make
+
+
+# =========================
+# MySQL 測試資料庫：在獨立的 {MYSQL_DB}_pytest 建表並載入合成資料，整個 session 共用，測完刪除
+#   連不到 MySQL (連線設定同 .env) 時相關測試略過
+# =========================
+
+MYSQL_ROWS = 20_000                                # 合成資料約 238 個月 (190001 起)
+
+
+def _mysql_url(db: str | None = None) -> URL:
+    return URL.create(
+        "mysql+pymysql",
+        username = database.username,
+        password = database.password,
+        host     = database.host,
+        port     = database.port,
+        database = db,
+        query    = {"charset": "utf8mb4"}
+    )
+
+def _load_synthetic(engine) -> None:
+    raw = synthetic_frame(MYSQL_ROWS)
+    df  = encoded_frame(raw)
+    df.insert(1, "ym_key", ym_keys(df["ym"]))
+    with engine.begin() as conn:
+        for col, (id_col, model) in DIMENSIONS.items():
+            # encoded_frame 的代碼 = 排序後 category 的位置 + 1
+            labels = sorted(raw[col].unique())
+            conn.execute(insert(model.__table__), [{"id": i + 1, "label": v, "sort_order": i} for i, v in enumerate(labels)])
+        conn.execute(insert(CleanedData.__table__), df.to_dict("records"))
+        conn.execute(text("ANALYZE TABLE clean_data"))
+        refresh_rollups(conn)
+
+
+@pytest.fixture(scope = "session")
+def mysql_engine():
+    test_db = f"{database.database}_pytest"
+    try:
+        server = create_engine(_mysql_url(), connect_args = {"connect_timeout": 3})
+        with server.begin() as conn:
+            conn.execute(text(f"DROP DATABASE IF EXISTS `{test_db}`"))
+            conn.execute(text(f"CREATE DATABASE `{test_db}`"))
+    except Exception as e:
+        pytest.skip(f"MySQL 無法連線：{e}")
+
+    engine = create_engine(_mysql_url(test_db))
+    tables = [CleanedData.__table__, *(model.__table__ for _, model in DIMENSIONS.values()),
+              *(database.Base.metadata.tables[t] for t in ROLLUPS)]
+    database.Base.metadata.create_all(engine, tables = tables)
+    _load_synthetic(engine)
+    yield engine
+
+    engine.dispose()
+    with server.begin() as conn:
+        conn.execute(text(f"DROP DATABASE IF EXISTS `{test_db}`"))
+    server.dispose()
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from creditcard_analysis.models import DIMENSIONS
+
+# =========================
+# 測試用合成資料：與 bench_load 的產生方式相同，測試不依賴 benchmark 模組
+# =========================
+
+INDUSTRIES = ["食", "衣", "住", "行", "文教康樂", "百貨", "其他"]
+AGE_LEVELS = ["未滿20歲", "20(含)-25歲", "25(含)-30歲", "30(含)-35歲", "35(含)-40歲",
+              "40(含)-45歲", "45(含)-50歲", "50(含)-55歲", "55(含)-60歲", "60(含)-65歲", "65(含)-70歲", "70(含)以上"]
+
+
+def synthetic_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    # 每個月 industry x age_level 各一筆，從 190001 起依序往後
+    rng = np.random.default_rng(seed)
+    per_month = len(INDUSTRIES) * len(AGE_LEVELS)
+    idx = np.arange(rows)
+    month = idx // per_month
+    year, mon = 1900 + month // 12, month % 12 + 1
+
+    return pd.DataFrame({
+        "ym"         : [f"{y}{m:02d}" for y, m in zip(year, mon)],
+        "nation"     : "臺灣",
+        "industry"   : np.array(INDUSTRIES)[(idx // len(AGE_LEVELS)) % len(INDUSTRIES)],
+        "age_level"  : np.array(AGE_LEVELS)[idx % len(AGE_LEVELS)],
+        "trans_count": rng.integers(1_000, 5_000_000, rows, dtype = np.int64),
+        "trans_total": rng.integers(1_000_000, 9_000_000_000, rows, dtype = np.int64)
+    })
+
+
+def encoded_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # 維度標籤換成代碼 = 排序後 category 的位置 + 1
+    df = df.copy()
+    for col, (id_col, _) in DIMENSIONS.items():
+        df[col] = df[col].astype("category").cat.codes.astype("int16") + 1
+    return df.rename(columns = {col: id_col for col, (id_col, _) in DIMENSIONS.items()})
@@ -0,0 +1,252 @@
+import itertools
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy import create_engine, event, insert, text
+from sqlalchemy.orm import Session
+
+from creditcard_analysis.database import Base
+from creditcard_analysis.models import CleanedData, DIMENSIONS
+from creditcard_analysis.olap.cube import Cube, mysql_div
+from creditcard_analysis.chart_gener.bar.raw_sql import build_sql_raw
+from creditcard_analysis.chart_gener.line.raw_sql import build_sql_for_line
+from creditcard_analysis.chart_gener.pie.raw_sql import build_sql_for_pie
+from creditcard_analysis.chart_gener.heatmap.raw_sql import build_sql_for_heatmap
+from creditcard_analysis.clean_data.rollup import refresh_rollups
+from creditcard_analysis.api.routers import dashboard
+
+# =========================
+# cube 與 SQL 結果一致性
+#   SQLite：整數加總類 (bar / line / 年月範圍 / dashboard) 直接比對 SQL 結果；
+#     SQLite 的整數除法與 MySQL DECIMAL 不同，heatmap / pie 的比例另以 Decimal 依 MySQL 規則計算比對
+#   MySQL：所有圖表 / 篩選組合逐一比對 (連不到時略過)
+# =========================
+
+INDUSTRIES = {1: ("食", 0), 2: ("衣", 1), 3: ("其他", 6), 4: ("新產業", 999), 5: ("舊產業", 999)}
+AGES       = {1: ("20(含)-25歲", 20), 2: ("未滿20歲", 0), 3: ("80(含)歲以上", 80)}
+FILTERS = {
+    "start_month": [None, "202203"],
+    "end_month"  : [None, "202304"],
+    "industry"   : [None, "衣", "不存在"],
+    "age_level"  : [None, "未滿20歲"],
+}
+AXES = ["ym", "industry", "age_level"]
+SORT_ORDER = {
+    "industry" : {v: o for v, o in INDUSTRIES.values()},
+    "age_level": {v: o for v, o in AGES.values()},
+}
+
+
+def filter_combos(filters = FILTERS):
+    for values in itertools.product(*filters.values()):
+        yield dict(zip(filters, values))
+
+def sqlite_sql(sql) -> text:
+    # MySQL 的整數除法運算子換成 SQLite 的 / (兩邊都是正整數，結果相同)
+    return text(sql.text.replace(" DIV ", " / "))
+
+def normalize(df: pd.DataFrame) -> pd.DataFrame:
+    # MySQL 的 SUM / 除法回傳 Decimal，cube 回傳 int64 / float64，比較數值
+    out = df.reset_index(drop = True).copy()
+    for col in out.columns:
+        if col in ("x", "industry", "age_level", "ym", "earliest_ym", "latest_ym"):
+            out[col] = out[col].astype(object)
+        else:
+            out[col] = pd.to_numeric(out[col].map(lambda v: float(v) if isinstance(v, Decimal) else v)).astype("float64")
+    return out
+
+def assert_same(expected: pd.DataFrame, actual: pd.DataFrame, order_col: str | None = None) -> None:
+    expected, actual = normalize(expected), normalize(actual)
+    if order_col is None:
+        pdt.assert_frame_equal(expected, actual)
+        return
+    # 排序欄位同值時 SQL 的先後不固定：比對排序欄位的順序，再比對整份內容
+    pdt.assert_series_equal(expected[order_col], actual[order_col])
+    cols = list(expected.columns)
+    pdt.assert_frame_equal(expected.sort_values(cols).reset_index(drop = True), actual.sort_values(cols).reset_index(drop = True))
+
+
+@pytest.fixture(scope = "module")
+def sqlite_engine():
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def mysql_functions(dbapi_conn, _):
+        dbapi_conn.create_function("CONCAT", -1, lambda *args: "".join(str(v) for v in args))
+        dbapi_conn.create_function("LPAD", 3, lambda s, n, pad: str(s).rjust(n, pad))
+
+    Base.metadata.create_all(engine)
+    rng = np.random.default_rng(7)
+    rows = []
+    for m, nation, ind, age in itertools.product(range(18), (1, 2), INDUSTRIES, AGES):
+        if rng.random() < 0.15:
+            continue                                     # 部分組合沒有資料
+        rows.append({
+            "ym"         : f"{2022 + m // 12}{m % 12 + 1:02d}",
+            "ym_key"     : 2022 * 12 + m,
+            "nation_id"  : nation,
+            "industry_id": ind,
+            "age_level_id": age,
+            "trans_count": int(rng.integers(1, 5_000)),
+            # 金額為 10 萬的倍數：除以 10 億只到小數 4 位，SQLite 的浮點除法與 MySQL DECIMAL 相同
+            "trans_total": int(rng.integers(1, 2_000_000)) * 100_000,
+        })
+    with engine.begin() as conn:
+        conn.execute(insert(DIMENSIONS["nation"][1].__table__), [{"id": 1, "label": "臺灣", "sort_order": 999}, {"id": 2, "label": "離島", "sort_order": 999}])
+        conn.execute(insert(DIMENSIONS["industry"][1].__table__), [{"id": k, "label": v, "sort_order": o} for k, (v, o) in INDUSTRIES.items()])
+        conn.execute(insert(DIMENSIONS["age_level"][1].__table__), [{"id": k, "label": v, "sort_order": o} for k, (v, o) in AGES.items()])
+        conn.execute(insert(CleanedData.__table__), rows)
+        refresh_rollups(conn)
+    return engine
+
+@pytest.fixture(scope = "module")
+def facts(sqlite_engine):
+    # 參考答案用：帶標籤的 clean_data
+    return pd.read_sql(text("""
+        SELECT c.ym, c.ym_key, i.label AS industry, a.label AS age_level, c.trans_count, c.trans_total
+        FROM clean_data c
+        JOIN dim_industry i ON i.id = c.industry_id
+        JOIN dim_age_level a ON a.id = c.age_level_id
+    """), sqlite_engine)
+
+@pytest.fixture(scope = "module")
+def cube(sqlite_engine):
+    return Cube.from_db(sqlite_engine)
+
+
+def filtered(facts: pd.DataFrame, start_month, end_month, industry, age_level) -> pd.DataFrame:
+    keep = pd.Series(True, index = facts.index)
+    if start_month is not None:
+        keep &= facts["ym"] >= start_month
+    if end_month is not None:
+        keep &= facts["ym"] <= end_month
+    if industry is not None:
+        keep &= facts["industry"] == industry
+    if age_level is not None:
+        keep &= facts["age_level"] == age_level
+    return facts[keep]
+
+def mysql_ratio(a: int, b: int) -> Decimal:
+    return (Decimal(int(a)) / Decimal(int(b))).quantize(Decimal("0.0001"), rounding = ROUND_HALF_UP)
+
+
+def test_mysql_div_rounds_half_up_to_four_places():
+    assert mysql_div(2, 3) == 0.6667
+    assert mysql_div(1, 8) == 0.125
+    assert mysql_div(12345, 1_000_000_000) == 0.0
+    assert mysql_div(50_000, 1_000_000_000) == 0.0001          # 0.00005 -> 進位
+    assert mysql_div(5, 0) is None
+
+
+def test_ym_range_matches_sql(sqlite_engine, cube):
+    _, ym_sql, _ = build_sql_raw("ym", "trans_total")
+    assert_same(pd.read_sql(sqlite_sql(ym_sql), sqlite_engine), cube.ym_range())
+
+
+@pytest.mark.parametrize("x_axis", AXES)
+@pytest.mark.parametrize("value", ["trans_count", "trans_total"])
+def test_bar_and_line_match_sql(sqlite_engine, cube, x_axis, value):
+    for f in filter_combos():
+        for shape, builder, topn in [("bar", build_sql_raw, None), ("bar", build_sql_raw, 3), ("line", build_sql_for_line, None), ("line", build_sql_for_line, 2)]:
+            sql, _, params = builder(x_axis, value, topn, **f)
+            expected = pd.read_sql(sqlite_sql(sql), sqlite_engine, params = params)
+            actual = cube.query(shape, x_axis = x_axis, value = value, topn = topn, **f)
+            assert list(actual.columns) == ["x", "raw_amount"]
+            if shape == "bar" or x_axis == "ym":
+                assert_same(expected, actual, None if x_axis == "ym" else "raw_amount")
+            else:
+                # line 依 sort_order 排序，同排序值 (999) 的先後由 SQL 決定：比對排序值的順序與整份內容
+                ranks = SORT_ORDER[x_axis]
+                assert list(expected["x"].map(ranks)) == list(actual["x"].map(ranks))
+                assert_same(expected.sort_values("x"), actual.sort_values("x"))
+
+
+@pytest.mark.parametrize("x_axis, y_axis", list(itertools.permutations(AXES, 2)))
+def test_heatmap_matches_sql_and_mysql_rounding(sqlite_engine, cube, facts, x_axis, y_axis):
+    for f in filter_combos():
+        sql, _, params = build_sql_for_heatmap(x_axis, y_axis, "trans_total", "trans_count", **f)
+        expected = pd.read_sql(sqlite_sql(sql), sqlite_engine, params = params)
+        actual = cube.heatmap(x_axis, y_axis, "trans_total", "trans_count", **f)
+        # 分組與排序與 SQL 相同 (同 sort_order 的先後由 SQL 決定，只比排序值)
+        def ranks(df):
+            x = df["industry"].map(SORT_ORDER.get(x_axis, {})).fillna(df["industry"])
+            y = df["age_level"].map(SORT_ORDER.get(y_axis, {})).fillna(df["age_level"])
+            return list(zip(x, y))
+        cells = ["industry", "age_level"]
+        assert ranks(expected) == ranks(actual)
+        assert_same(expected[cells].sort_values(cells), actual[cells].sort_values(cells))
+
+        # 平均值依 MySQL DECIMAL 除法 (4 位小數、四捨五入)
+        sums = filtered(facts, **f).groupby([x_axis, y_axis])[["trans_total", "trans_count"]].sum()
+        for r in actual.itertuples():
+            total, count = sums.loc[(r.industry, r.age_level)]
+            assert Decimal(str(r.avg_amount)) == mysql_ratio(total, count)
+
+
+@pytest.mark.parametrize("x_axis", AXES)
+def test_pie_matches_mysql_semantics(cube, facts, x_axis):
+    for f in filter_combos():
+        sql, _, params = build_sql_for_pie(x_axis, "trans_total", 5, **f)
+        assert params["limit"] == 5
+        actual = cube.pie(x_axis, "trans_total", 5, **f)
+
+        # 依 SQL 逐步計算：ROUND(group / total, 2) * 100，< 10 歸為「其他」，再依 x 加總
+        groups = filtered(facts, **f).groupby(x_axis)["trans_total"].sum()
+        total = int(groups.sum())
+        slices: dict[str, Decimal] = {}
+        for label, v in groups.items():
+            pct = mysql_ratio(v, total).quantize(Decimal("0.01"), rounding = ROUND_HALF_UP) * 100
+            key = "其他" if pct < 10 else label
+            slices[key] = slices.get(key, Decimal(0)) + pct
+        expected = pd.DataFrame({"x": list(slices), "amount": list(slices.values())})
+        if x_axis == "ym":
+            expected = expected.sort_values("x").head(5)
+            assert_same(expected, actual)
+        else:
+            expected = expected.sort_values("amount", ascending = False, kind = "stable").head(5)
+            assert_same(expected, actual, "amount")
+
+
+def test_dashboard_overview_matches_sql(sqlite_engine, cube, monkeypatch):
+    filters = dict(FILTERS, industry = [None, "衣"])
+    with Session(sqlite_engine) as db:
+        for f in filter_combos(filters):
+            monkeypatch.setattr(dashboard, "get_cube", lambda: None)
+            expected = dashboard.overview(db = db, **f)
+            monkeypatch.setattr(dashboard, "get_cube", lambda: cube)
+            actual = dashboard.overview(db = db, **f)
+            assert actual == expected
+
+
+# =========================
+# MySQL：同一份資料分別走 SQL 與 cube
+# =========================
+
+MYSQL_FILTERS = {
+    "start_month": [None, "190501"],
+    "end_month"  : [None, "191012"],
+    "industry"   : [None, "食"],
+    "age_level"  : [None, "未滿20歲"],
+}
+
+
+def test_all_charts_match_mysql(mysql_engine):
+    cube = Cube.from_db(mysql_engine)
+    for f in filter_combos(MYSQL_FILTERS):
+        for x in AXES:
+            for shape, builder in [("bar", build_sql_raw), ("line", build_sql_for_line), ("pie", build_sql_for_pie)]:
+                sql, ym_sql, params = builder(x, "trans_total", 5, **f)
+                expected = pd.read_sql(sql, mysql_engine, params = params)
+                actual = cube.query(shape, x_axis = x, value = "trans_total", topn = 5, **f)
+                if x == "ym":
+                    assert_same(expected, actual)
+                elif shape == "line":
+                    assert_same(expected.sort_values("x"), actual.sort_values("x"))
+                else:
+                    assert_same(expected, actual, expected.columns[-1])
+            assert_same(pd.read_sql(ym_sql, mysql_engine), cube.ym_range())
+        for x, y in itertools.permutations(AXES, 2):
+            sql, _, params = build_sql_for_heatmap(x, y, "trans_total", "trans_count", **f)
+            assert_same(pd.read_sql(sql, mysql_engine, params = params), cube.heatmap(x, y, "trans_total", "trans_count", **f))
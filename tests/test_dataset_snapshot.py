@@ -0,0 +1,115 @@
+import itertools
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, event, insert, text
+from sqlalchemy.orm import Session
+
+from creditcard_analysis import database
+from creditcard_analysis.database import Base
+from creditcard_analysis.models import CleanedData, DIMENSIONS
+from creditcard_analysis.api.routers import meta
+from creditcard_analysis.chart_gener.utils import read_chart_frames
+from creditcard_analysis.chart_gener.bar.raw_sql import build_sql_raw
+from creditcard_analysis.clean_data.rollup import refresh_rollups
+from creditcard_analysis.clean_data.dataset_version import bump_version
+from creditcard_analysis.clean_data.dataset_snapshot import (snapshot_root, write_snapshot, open_snapshot,
+                                                             fresh_snapshot, COLUMNS)
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(DIMENSIONS["nation"][1].__table__), [{"id": 1, "label": "臺灣", "sort_order": 999}])
+        conn.execute(insert(DIMENSIONS["industry"][1].__table__), [{"id": 1, "label": "其他", "sort_order": 6}, {"id": 2, "label": "食", "sort_order": 0}])
+        conn.execute(insert(DIMENSIONS["age_level"][1].__table__), [{"id": 1, "label": "20(含)-25歲", "sort_order": 20}, {"id": 2, "label": "未滿20歲", "sort_order": 0}])
+        add_months(conn, [2, 3, 1])
+    monkeypatch.setenv("DATASET_SNAPSHOT_DIR", str(tmp_path / "snapshot"))
+    return engine
+
+def add_months(conn, months) -> None:
+    conn.execute(insert(CleanedData.__table__), [
+        {"ym": f"2023{m:02d}", "ym_key": 2023 * 12 + m - 1, "nation_id": 1, "industry_id": i, "age_level_id": a,
+         "trans_count": m + i + a, "trans_total": 10_000_000_000 * m + i * 10 + a}
+        for m, i, a in itertools.product(months, (1, 2), (1, 2))
+    ])
+    refresh_rollups(conn)
+    bump_version([f"2023{m:02d}" for m in months], conn)
+
+def captured_statements(engine) -> list[str]:
+    seen: list[str] = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, stmt, *args: seen.append(stmt))
+    return seen
+
+
+def test_snapshot_root_prefers_env(tmp_path, monkeypatch):
+    monkeypatch.delenv("DATASET_SNAPSHOT_DIR", raising = False)
+    assert snapshot_root(tmp_path) == tmp_path / "snapshot"
+    monkeypatch.setenv("DATASET_SNAPSHOT_DIR", str(tmp_path / "shared"))
+    assert snapshot_root(tmp_path) == (tmp_path / "shared").resolve()
+
+
+def test_write_snapshot_columns_and_dims(engine):
+    root = snapshot_root()
+    path = write_snapshot(root, engine)
+    assert path.name == "v00000001"
+
+    snapshot = open_snapshot()
+    assert snapshot.version == 1 and snapshot.rows == 12
+    for col, dtype in COLUMNS.items():
+        arr = snapshot.column(col)
+        assert isinstance(arr, np.memmap) and arr.dtype == dtype
+
+    expected = pd.read_sql(text("SELECT * FROM clean_data ORDER BY ym_key"), engine)
+    pd.testing.assert_frame_equal(snapshot.frame(), expected[list(COLUMNS)].astype(COLUMNS))
+    decoded = snapshot.frame(decode = True)
+    assert set(decoded["industry"]) == {"食", "其他"} and set(decoded["nation"]) == {"臺灣"}
+
+    assert snapshot.year_months() == ["202301", "202302", "202303"]
+    assert snapshot.ym_range().iloc[0].tolist() == ["202301", "202303"]
+    assert snapshot.labels("industry") == ["食", "其他"]
+    assert snapshot.labels("age_level") == ["未滿20歲", "20(含)-25歲"]
+
+    # 同版本不重寫
+    assert write_snapshot(root, engine) == path
+
+def test_fresh_only_when_version_matches(engine):
+    root = snapshot_root()
+    with engine.connect() as conn:
+        assert fresh_snapshot(conn) is None                  # 還沒有快照
+    write_snapshot(root, engine)
+    with engine.begin() as conn:
+        assert fresh_snapshot(conn).version == 1
+        add_months(conn, [4])
+        assert fresh_snapshot(conn) is None                  # ETL 已推進版本，快照過期
+
+    write_snapshot(root, engine)
+    with engine.begin() as conn:
+        assert fresh_snapshot(conn).year_months()[-1] == "202304"
+        add_months(conn, [5])
+    write_snapshot(root, engine)
+    assert sorted(p.name for p in root.glob("v*")) == ["v00000002", "v00000003"]
+
+
+def test_meta_lists_served_from_fresh_snapshot(engine):
+    with Session(engine) as db:
+        from_db = [meta.year_month_list(db), meta.industry_list(db), meta.age_level_list(db)]
+
+        write_snapshot(snapshot_root(), engine)
+        seen = captured_statements(engine)
+        from_snapshot = [meta.year_month_list(db), meta.industry_list(db), meta.age_level_list(db)]
+        assert from_snapshot == from_db
+        assert not [s for s in seen if "clean_data" in s or "dim_" in s]
+
+def test_chart_ym_range_from_fresh_snapshot(engine, monkeypatch):
+    monkeypatch.setattr(database, "engine", engine)
+    write_snapshot(snapshot_root(), engine)
+    sql, ym_sql, params = build_sql_raw("industry", "trans_total")
+
+    seen = captured_statements(engine)
+    ym, df = read_chart_frames("bar", sql, ym_sql, params)
+    assert ym.iloc[0].tolist() == ["202301", "202303"]
+    assert len(df) == 2
+    assert not [s for s in seen if "MIN(" in s]
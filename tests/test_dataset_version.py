@@ -0,0 +1,100 @@
+import itertools
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, insert, delete, text
+
+from creditcard_analysis import olap
+from creditcard_analysis.database import Base
+from creditcard_analysis.models import CleanedData, DIMENSIONS, DatasetChange
+from creditcard_analysis.olap.cube import Cube
+from creditcard_analysis.clean_data.dataset_version import touched_months, current_version, bump_version, changed_months
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for name in ("industry", "age_level"):
+            conn.execute(insert(DIMENSIONS[name][1].__table__), [{"id": 1, "label": "A", "sort_order": 0}, {"id": 2, "label": "B", "sort_order": 1}])
+        write_months(conn, range(1, 4), scale = 1)
+    monkeypatch.setattr(olap, "_cube", None)
+    return engine
+
+def write_months(conn, months, scale: int) -> None:
+    # 重寫指定月份 (2023 年)
+    keys = [2023 * 12 + m - 1 for m in months]
+    conn.execute(delete(CleanedData.__table__).where(CleanedData.__table__.c.ym_key.in_(keys)))
+    conn.execute(insert(CleanedData.__table__), [
+        {"ym": f"2023{m:02d}", "ym_key": 2023 * 12 + m - 1, "nation_id": 1, "industry_id": i, "age_level_id": a,
+         "trans_count": scale * (m + i + a), "trans_total": scale * (m * 100 + i * 10 + a)}
+        for m, i, a in itertools.product(months, (1, 2), (1, 2))
+    ])
+
+def assert_same_cube(a: Cube, b: Cube) -> None:
+    pd.testing.assert_frame_equal(a.to_frame(), b.to_frame())
+    assert a.version == b.version
+
+
+def test_touched_months():
+    df = pd.DataFrame({"ym": ["202301", "202302", "202301", None]})
+    assert touched_months(df) == {"202301", "202302"}
+    assert touched_months(df.iloc[0:0]) == set()
+
+
+def test_bump_version_logs_changed_months(engine):
+    with engine.begin() as conn:
+        assert current_version(conn) == 0
+        assert bump_version(["202301", "202302", "202301"], conn) == 1
+        assert bump_version([], conn) == 1                   # 沒有異動不推進版本
+        assert bump_version(["202303"], conn) == 2
+
+        assert changed_months(conn, 0) == (2, {2023 * 12, 2023 * 12 + 1, 2023 * 12 + 2})
+        assert changed_months(conn, 1) == (2, {2023 * 12 + 2})
+        assert changed_months(conn, 2) == (2, set())
+
+        # 整表重載 -> 讀取端需整份重新載入
+        assert bump_version(None, conn) == 3
+        assert changed_months(conn, 2) == (3, None)
+        assert changed_months(conn, 1) == (3, None)
+
+def test_changed_months_detects_pruned_log(engine):
+    with engine.begin() as conn:
+        bump_version(["202301"], conn)
+        bump_version(["202302"], conn)
+        conn.execute(delete(DatasetChange.__table__).where(DatasetChange.__table__.c.version == 1))
+        assert changed_months(conn, 0) == (2, None)
+        assert changed_months(conn, 1) == (2, {2023 * 12 + 1})
+
+
+def test_refresh_applies_only_changed_months(engine, monkeypatch):
+    old = olap.load_cube(engine)
+    assert olap.refresh_cube(engine) is False                 # 版本沒變
+
+    # 改寫 2 月、新增 4 月
+    with engine.begin() as conn:
+        write_months(conn, [2, 4], scale = 7)
+        bump_version(["202302", "202304"], conn)
+
+    loaded: list = []
+    original = olap.read_facts
+    monkeypatch.setattr(olap, "read_facts", lambda conn, months = None: loaded.append(months) or original(conn, months))
+    assert olap.refresh_cube(engine) is True
+    assert loaded == [{2023 * 12 + 1, 2023 * 12 + 3}]          # 只讀異動的月份
+
+    new = olap._cube
+    assert new is not old and old.version == 0 and new.version == 1
+    assert_same_cube(new, Cube.from_db(engine))
+    # 舊的 cube 不受影響 (進行中的查詢仍看到舊版本)
+    assert old.ym_range().iloc[0].tolist() == ["202301", "202303"]
+    assert new.ym_range().iloc[0].tolist() == ["202301", "202304"]
+
+def test_refresh_reloads_everything_after_swap(engine):
+    olap.load_cube(engine)
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM clean_data"))
+        write_months(conn, [5], scale = 3)
+        bump_version(None, conn)
+    assert olap.refresh_cube(engine) is True
+    assert_same_cube(olap._cube, Cube.from_db(engine))
+    assert olap._cube.ym_range().iloc[0].tolist() == ["202305", "202305"]
@@ -0,0 +1,52 @@
+import pytest
+import pandas as pd
+
+from creditcard_analysis.clean_data import dimensions
+from creditcard_analysis.clean_data.dimensions import encode_dimensions, sort_order_for
+
+
+def test_age_and_industry_sort_order():
+    ages = ["80(含)歲以上", "20(含)-25歲", "未滿20歲", "25(含)-30歲"]
+    assert sorted(ages, key = lambda v: sort_order_for("age_level", v)) == ["未滿20歲", "20(含)-25歲", "25(含)-30歲", "80(含)歲以上"]
+    assert sort_order_for("industry", "食") < sort_order_for("industry", "其他") < sort_order_for("industry", "新產業")
+
+
+def test_encode_dimensions_maps_labels_to_codes(monkeypatch):
+    codes = {
+        "nation"   : {"臺灣": 1},
+        "industry" : {"食": 3, "衣": 7},
+        "age_level": {"未滿20歲": 2},
+    }
+    monkeypatch.setattr(dimensions, "dimension_codes", lambda dim, labels: codes[dim])
+
+    df = pd.DataFrame({
+        "ym"         : ["202301", "202301", "202302"],
+        "nation"     : pd.Categorical(["臺灣"] * 3),
+        "industry"   : pd.Categorical(["衣", "食", "衣"], categories = ["住", "衣", "食"]),
+        "age_level"  : ["未滿20歲"] * 3,
+        "trans_count": [1, 2, 3],
+        "trans_total": [10, 20, 30],
+    })
+    out = encode_dimensions(df)
+
+    assert list(out.columns) == ["ym", "ym_key", "nation_id", "industry_id", "age_level_id", "trans_count", "trans_total"]
+    assert out["ym_key"].tolist() == [24276, 24276, 24277]
+    assert out["industry_id"].tolist() == [7, 3, 7]
+    assert out["industry_id"].dtype == "int16"
+    assert out["age_level_id"].tolist() == [2, 2, 2]
+    # 原 frame 不被修改，已編碼的 frame 原樣回傳
+    assert "industry" in df.columns
+    assert encode_dimensions(out) is out
+
+
+def test_encode_dimensions_rejects_missing_labels(monkeypatch):
+    # 缺值 (category code -1) 不能被編成最後一個類別的代碼
+    monkeypatch.setattr(dimensions, "dimension_codes", lambda dim, labels: {"食": 3, "衣": 7})
+    df = pd.DataFrame({
+        "ym"      : ["202301", "202301"],
+        "industry": pd.Categorical(["食", None], categories = ["食", "衣"]),
+    })
+    with pytest.raises(ValueError, match = "industry 有 1 筆缺值"):
+        encode_dimensions(df)
+    with pytest.raises(ValueError, match = "industry"):
+        encode_dimensions(df.astype({"industry": object}))
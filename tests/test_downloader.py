@@ -0,0 +1,212 @@
+import time
+import hashlib
+import threading
+import pytest
+import pandas as pd
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from creditcard_analysis.clean_data.downloader import (
+    Downloader, DownloadResult, DownloadError, ChecksumMismatch, load_manifest, save_manifest
+)
+
+PAYLOAD = bytes(range(256)) * 4096   # 1 MiB
+ETAG    = '"v1"'
+
+
+class FakeUpstream(BaseHTTPRequestHandler):
+    payload    = PAYLOAD
+    etag       = ETAG
+    drop_after = None     # 第一次完整 GET 只送這麼多 bytes 就斷線
+    requests   = []
+
+    def log_message(self, *args):
+        pass
+
+    def _range(self):
+        header = self.headers.get("Range")
+        if not header:
+            return None
+        if_range = self.headers.get("If-Range")
+        if if_range and if_range != self.etag:
+            return None
+        start, _, end = header.removeprefix("bytes=").partition("-")
+        start = int(start)
+        end = int(end) if end else len(self.payload) - 1
+        return start, min(end, len(self.payload) - 1)
+
+    def _send(self, head_only: bool):
+        type(self).requests.append((self.command, dict(self.headers)))
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.send_header("ETag", self.etag)
+            self.end_headers()
+            return
+
+        rng = self._range()
+        body = self.payload if rng is None else self.payload[rng[0]: rng[1] + 1]
+        self.send_response(200 if rng is None else 206)
+        self.send_header("ETag", self.etag)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(len(body)))
+        if rng is not None:
+            self.send_header("Content-Range", f"bytes {rng[0]}-{rng[1]}/{len(self.payload)}")
+        self.end_headers()
+        if head_only:
+            return
+
+        cls = type(self)
+        if rng is None and cls.drop_after is not None:
+            self.wfile.write(body[: cls.drop_after])
+            cls.drop_after = None
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self._send(head_only = True)
+
+    def do_GET(self):
+        self._send(head_only = False)
+
+
+@pytest.fixture
+def upstream():
+    FakeUpstream.requests = []
+    FakeUpstream.drop_after = None
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeUpstream)
+    thread = threading.Thread(target = server.serve_forever, daemon = True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/data/BANK_TWN_ALL_AG.CSV"
+    server.shutdown()
+    server.server_close()
+
+
+def test_download_then_conditional_get_is_one_round_trip(upstream, tmp_path):
+    d = Downloader(tmp_path, backoff = 0)
+    first = d.download(upstream)
+
+    assert first.changed is True
+    assert first.path.read_bytes() == PAYLOAD
+    assert first.sha256 == hashlib.sha256(PAYLOAD).hexdigest()
+    assert load_manifest(tmp_path)[upstream]["etag"] == ETAG
+
+    FakeUpstream.requests.clear()
+    second = d.download(upstream)
+
+    assert second.changed is False
+    assert len(FakeUpstream.requests) == 1
+    assert FakeUpstream.requests[0][1].get("If-None-Match") == ETAG
+
+def test_not_modified_verifies_cached_file(upstream, tmp_path):
+    # 304 沿用的檔案也要驗證：本機檔案損毀時重新下載，預期 sha256 不符時中止
+    d = Downloader(tmp_path, backoff = 0)
+    dest = d.download(upstream).path
+    dest.write_bytes(PAYLOAD[::-1])     # 大小相同、內容不同
+
+    FakeUpstream.requests.clear()
+    again = d.download(upstream)
+    assert again.path.read_bytes() == PAYLOAD and again.sha256 == hashlib.sha256(PAYLOAD).hexdigest()
+    assert [h.get("If-None-Match") for _, h in FakeUpstream.requests] == [ETAG, None]
+
+    with pytest.raises(ChecksumMismatch):
+        d.download(upstream, expected_sha256 = "0" * 64)
+    assert d.download(upstream, expected_sha256 = again.sha256).changed is False
+
+
+
+def test_same_content_with_new_etag_is_unchanged(upstream, tmp_path, monkeypatch):
+    d = Downloader(tmp_path, backoff = 0)
+    d.download(upstream)
+
+    # 200 但內容相同：以 sha256 判斷，不算變更
+    monkeypatch.setattr(FakeUpstream, "etag", '"v2"')
+    same = d.download(upstream)
+    assert same.changed is False and same.sha256 == hashlib.sha256(PAYLOAD).hexdigest()
+
+    monkeypatch.setattr(FakeUpstream, "etag", '"v3"')
+    monkeypatch.setattr(FakeUpstream, "payload", PAYLOAD[::-1])
+    assert d.download(upstream).changed is True
+
+def test_skip_only_when_digest_was_ingested(tmp_path, monkeypatch):
+    # 304 / 內容未變不代表已匯入：只有上次成功匯入的 sha256 相同才略過
+    from creditcard_analysis.clean_data import clean
+    csv_path = tmp_path / "BANK_TWN_ALL_AG.CSV"
+    monkeypatch.setattr(clean, "download_csv", lambda *args: DownloadResult(csv_path, False, 0, "abc"))
+    opts = clean.ETLOptions(source = "csv_url", url = "http://example/x.csv", out_dir = tmp_path)
+
+    monkeypatch.setattr(clean, "get_ingested", lambda key: None)
+    read_chunks, digest = clean.open_source(opts)
+    assert read_chunks is not None and digest == "abc"
+
+    monkeypatch.setattr(clean, "get_ingested", lambda key: "abc")
+    assert clean.open_source(opts) == (None, "abc")
+    opts.strategy = "full"
+    assert clean.open_source(opts)[0] is not None
+
+def test_whole_file_read_is_timed_in_prefetch(tmp_path, monkeypatch):
+    # 整檔模式也要在 prefetch 裡才解析，read 階段的耗時才算得到
+    from creditcard_analysis.clean_data import clean
+    from creditcard_analysis.clean_data.stats import StageTimer
+    calls = []
+    def slow_load(path):
+        calls.append(path)
+        time.sleep(0.05)
+        return pd.DataFrame({"a": [1, 2, 3]})
+    monkeypatch.setattr(clean, "download_csv", lambda *args: DownloadResult(tmp_path / "x.csv", True, 0, "abc"))
+    monkeypatch.setattr(clean, "get_ingested", lambda key: None)
+    monkeypatch.setattr(clean, "load_csv", slow_load)
+    opts = clean.ETLOptions(source = "csv_url", url = "http://example/x.csv", out_dir = tmp_path)
+
+    chunks = clean.open_source(opts)[0]()
+    assert calls == []
+    timer = StageTimer()
+    assert [len(df) for df in clean.prefetch(chunks, timer)] == [3]
+    read = next(s for s in timer.snapshot() if s.name == "read")
+    assert read.rows == 3 and read.seconds >= 0.05
+
+
+
+def test_resume_from_partial_file_uses_range(upstream, tmp_path):
+    part = tmp_path / "BANK_TWN_ALL_AG.CSV.part"
+    part.write_bytes(PAYLOAD[:300_000])
+    save_manifest(tmp_path, {upstream: {"partial": {"etag": ETAG, "size": len(PAYLOAD)}}})
+
+    result = Downloader(tmp_path, backoff = 0).download(upstream)
+
+    assert result.path.read_bytes() == PAYLOAD
+    assert FakeUpstream.requests[0][1].get("Range") == "bytes=300000-"
+    assert not part.exists()
+
+
+def test_dropped_connection_is_retried_with_resume(upstream, tmp_path):
+    FakeUpstream.drop_after = 200_000
+
+    result = Downloader(tmp_path, backoff = 0).download(upstream)
+
+    resumed_from = FakeUpstream.requests[-1][1].get("Range", "")
+    assert result.path.read_bytes() == PAYLOAD
+    assert resumed_from.startswith("bytes=")
+    assert 0 < int(resumed_from.removeprefix("bytes=").rstrip("-")) <= 200_000
+
+
+def test_parallel_ranges(upstream, tmp_path):
+    result = Downloader(tmp_path, parallel = 4, backoff = 0).download(upstream)
+
+    assert result.path.read_bytes() == PAYLOAD
+    ranges = [h.get("Range") for cmd, h in FakeUpstream.requests if cmd == "GET"]
+    assert len(ranges) == 4 and all(ranges)
+
+
+def test_checksum_mismatch_raises(upstream, tmp_path):
+    with pytest.raises(ChecksumMismatch) as e:
+        Downloader(tmp_path, backoff = 0).download(upstream, expected_sha256 = "0" * 64)
+
+    assert "sha256 不符" in str(e.value)
+    assert not (tmp_path / "BANK_TWN_ALL_AG.CSV").exists()
+
+
+def test_gives_up_after_max_retries(tmp_path):
+    d = Downloader(tmp_path, max_retries = 2, backoff = 0, timeout = (0.5, 0.5))
+
+    with pytest.raises(DownloadError):
+        d.download("http://127.0.0.1:9/nothing.csv")
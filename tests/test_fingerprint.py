@@ -0,0 +1,32 @@
+import zlib
+import pandas as pd
+
+from creditcard_analysis.clean_data.fingerprint import month_fingerprints, LatestRows
+
+
+def frame(rows) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns = ["ym", "nation", "industry", "age_level", "trans_count", "trans_total"])
+
+
+def test_duplicate_natural_key_keeps_last_row():
+    # 同一個鍵兩筆不同數值：與 upsert 一樣只算最後一筆
+    df = frame([
+        ("202401", "臺灣", "食", "未滿20歲", 1, 100),
+        ("202401", "臺灣", "衣", "未滿20歲", 2, 200),
+        ("202401", "臺灣", "食", "未滿20歲", 5, 500),
+    ])
+    fp = month_fingerprints(df).loc["202401"]
+    assert fp["rows"] == 2
+    assert fp["sum_count"] == 7 and fp["sum_total"] == 700
+    assert fp["dim_hash"] == zlib.crc32("臺灣|食|未滿20歲".encode()) + zlib.crc32("臺灣|衣|未滿20歲".encode())
+
+def test_duplicates_across_chunks_match_single_frame():
+    first  = frame([("202401", "臺灣", "食", "未滿20歲", 1, 100), ("202402", "臺灣", "食", "未滿20歲", 3, 300)])
+    second = frame([("202401", "臺灣", "食", "未滿20歲", 5, 500)])
+    latest = LatestRows()
+    latest.add(first)
+    latest.add(second)
+    assert len(latest) == 2
+    pd.testing.assert_frame_equal(month_fingerprints(latest.frame()), month_fingerprints(pd.concat([first, second])))
+    assert month_fingerprints(latest.frame()).loc["202401", "sum_total"] == 500
+    assert month_fingerprints(LatestRows().frame()).empty
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+from creditcard_analysis.utils.impute import QuantileSketch, StreamingImputer
+from creditcard_analysis.clean_data.stats import StageTimer
+from creditcard_analysis.clean_data.clean import clean_chunks, new_imputer
+
+
+def test_sketch_median_close_to_exact():
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(mean = 12, sigma = 1.5, size = 300_000)
+
+    sketch = QuantileSketch()
+    for chunk in np.array_split(values, 37):
+        sketch.update(chunk)
+
+    exact = np.median(values)
+    approx = sketch.median()
+    # 以排名誤差衡量：估計值在真實分佈中的分位數與 0.5 的差距
+    rank_error = abs((values < approx).mean() - 0.5)
+    assert rank_error < 0.002
+    assert abs(approx - exact) / exact < 0.01
+    assert sketch.centroids <= sketch.compression
+
+
+def test_sketch_ignores_nan_and_handles_small_input():
+    sketch = QuantileSketch()
+    sketch.update([np.nan, 5.0, np.nan, 1.0, 3.0])
+
+    assert sketch.count == 3
+    assert sketch.median() == 3.0
+    assert QuantileSketch().median() != QuantileSketch().median()   # 空的回傳 NaN
+
+
+def test_imputer_mode_matches_pandas_tie_break():
+    df = pd.DataFrame({"c": ["b", "a", None, "b", "a", "z"], "n": [1.0, None, 3.0, 4.0, 5.0, 6.0]})
+    imputer = StreamingImputer(["n"], ["c"])
+    imputer.partial_fit(df.iloc[:3])
+    imputer.partial_fit(df.iloc[3:])
+
+    values = imputer.fill_values()
+    assert values["c"] == df["c"].mode().iloc[0] == "a"
+
+    out = imputer.transform(df.copy())
+    assert out["c"].isna().sum() == 0
+    assert out.loc[1, "n"] == values["n"]
+
+
+def test_clean_chunks_defers_rows_with_missing_values():
+    raw = pd.DataFrame({
+        "年月"                 : ["202301", "202301", None, "202302", "202302", "202302"],
+        "地區"                 : ["臺灣"] * 6,
+        "信用卡產業別"          : ["食", "衣", "住", "行", "食", "衣"],
+        "年齡層"               : ["20-24"] * 6,
+        "信用卡交易筆數"        : [10, 20, 30, None, 50, 60],
+        "信用卡交易金額[新臺幣]": [100, 200, 300, 400, 500, 600]
+    })
+    chunks = [raw.iloc[:3], raw.iloc[3:]]
+
+    out = list(clean_chunks(chunks, StageTimer(), new_imputer()))
+
+    assert [len(df) for df in out] == [2, 2, 2]        # 最後一批是延後填補的列
+    last = out[-1]
+    assert last["ym"].tolist() == ["202302", "202302"]  # 眾數
+    assert last["trans_count"].tolist() == [30, 30]     # 估計中位數
+    assert all(df["trans_count"].dtype == "int64" for df in out)
@@ -0,0 +1,90 @@
+import itertools
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from creditcard_analysis.models import ROLLUPS, CLEAN_DATA_INDEXES
+from creditcard_analysis.chart_gener.utils import DIM_COLS
+from creditcard_analysis.chart_gener.bar.raw_sql import build_sql_raw
+from creditcard_analysis.chart_gener.line.raw_sql import build_sql_for_line
+from creditcard_analysis.chart_gener.pie.raw_sql import build_sql_for_pie
+from creditcard_analysis.chart_gener.heatmap.raw_sql import build_sql_for_heatmap
+from creditcard_analysis.api.routers.dashboard import overview
+from creditcard_analysis.api.routers.meta import year_month_list
+
+# =========================
+# 對每一種查詢組合跑 EXPLAIN，確認 clean_data 都走覆蓋索引 (改查彙總表的組合只確認沒有讀 clean_data)
+#   需要 MySQL：資料庫與合成資料見 conftest.mysql_engine
+# =========================
+
+FILTERS = {
+    "start_month": [None, "190501"],
+    "end_month"  : [None, "191012"],
+    "industry"   : [None, "食"],
+    "age_level"  : [None, "未滿20歲"],
+}
+
+
+@pytest.fixture(scope = "module")
+def engine(mysql_engine):
+    return mysql_engine
+
+
+def filter_combos():
+    keys = list(FILTERS)
+    for values in itertools.product(*FILTERS.values()):
+        yield dict(zip(keys, values))
+
+def chart_queries():
+    for x, f in itertools.product(sorted(DIM_COLS), filter_combos()):
+        yield f"bar-{x}", build_sql_raw(x, "trans_total", **f)
+        yield f"line-{x}", build_sql_for_line(x, "trans_total", **f)
+        yield f"pie-{x}", build_sql_for_pie(x, "trans_total", **f)
+    for (x, y), f in itertools.product(itertools.permutations(sorted(DIM_COLS), 2), filter_combos()):
+        yield f"heatmap-{x}-{y}", build_sql_for_heatmap(x, y, "trans_total", "trans_count", **f)
+
+def assert_covering(plan, name: str, statement: str) -> None:
+    rows = [r for r in plan if r["table"] == "clean_data"]
+    # MIN / MAX(ym_key) 直接讀索引兩端，計畫裡不會出現 clean_data
+    if not rows and any("optimized away" in (r["Extra"] or "") for r in plan):
+        return
+    if not rows and any(r["table"] in ROLLUPS for r in plan):
+        return
+    assert rows, f"{name}: EXPLAIN 沒有 clean_data\n{plan}"
+    for r in rows:
+        assert r["key"] in CLEAN_DATA_INDEXES, f"{name}: 沒有用到覆蓋索引\n{statement}\n{plan}"
+        assert "Using index" in (r["Extra"] or ""), f"{name}: 需要回表\n{statement}\n{plan}"
+
+
+def test_chart_queries_use_covering_indexes(engine):
+    checked = 0
+    with engine.connect() as conn:
+        for name, (sql, ym_sql, params) in chart_queries():
+            for stmt in (sql, ym_sql):
+                plan = conn.execute(text(f"EXPLAIN {stmt.text}"), params).mappings().all()
+                assert_covering(plan, name, stmt.text)
+                checked += 1
+    assert checked > 0
+
+
+def test_dashboard_and_meta_queries_use_covering_indexes(engine):
+    statements: list[tuple[str, object]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "clean_data" in statement:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        with Session(engine) as db:
+            for f in filter_combos():
+                overview(db = db, **f)
+            year_month_list(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    assert statements
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            plan = conn.exec_driver_sql(f"EXPLAIN {statement}", parameters).mappings().all()
+            assert_covering(plan, "dashboard / meta", statement)
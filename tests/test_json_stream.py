@@ -0,0 +1,70 @@
+import io
+import json
+import pytest
+from pathlib import Path
+
+from creditcard_analysis.clean_data.json_stream import iter_records, iter_json_frames
+from creditcard_analysis.clean_data.clean import load_json
+
+RECORDS = [{"年月": f"2023{m:02d}", "信用卡交易筆數": str(m * 1000), "n": m * 12345} for m in range(1, 13)]
+SAMPLE  = Path(__file__).resolve().parents[1] / "creditcard_analysis" / "clean_data" / "test_raw_data" / "json_data.json"
+
+
+def records(text, read_size = 7):
+    # read_size 很小，讓每筆 record 都跨越多次讀取
+    return list(iter_records(io.StringIO(text), read_size))
+
+
+@pytest.mark.parametrize("text", [
+    json.dumps(RECORDS, ensure_ascii = False),
+    json.dumps(RECORDS, ensure_ascii = False, indent = 2),
+    "\n".join(json.dumps(r, ensure_ascii = False) for r in RECORDS) + "\n",
+    json.dumps({"data": RECORDS}, ensure_ascii = False),
+    json.dumps({"status": "ok", "fields": ["a", "b"], "meta": {"n": 12}, "result": RECORDS}, ensure_ascii = False, indent = 1),
+    json.dumps({str(i): r for i, r in enumerate(RECORDS)}, ensure_ascii = False),
+], ids = ["array", "array-indent", "jsonl", "wrapped", "wrapped-with-meta", "dict"])
+def test_formats_yield_same_records(text):
+    assert records(text) == RECORDS
+
+
+class Unseekable(io.StringIO):
+    def seekable(self):
+        return False
+
+@pytest.mark.parametrize("wrap", [io.StringIO, Unseekable], ids = ["seekable", "unseekable"])
+def test_jsonl_is_decided_by_top_level_count(wrap):
+    # 第一筆本身有物件陣列欄位 (還含跳脫字元)：仍是 JSONL，不能當成 wrapped
+    rows = [{"id": 1, "items": [{"k": "a\\\"}"}]}, {"id": 2, "items": []}, {"id": 3}]
+    text = "\n".join(json.dumps(r) for r in rows) + "\n"
+    assert list(iter_records(wrap(text), 3)) == rows
+    # 最外層只有一個物件：有物件陣列就是 wrapped，沒有就是只有一筆
+    assert list(iter_records(wrap(json.dumps(rows[0])), 3)) == rows[0]["items"]
+    assert list(iter_records(wrap(json.dumps(rows[2])), 3)) == [rows[2]]
+
+
+def test_empty_payloads():
+    assert records("[]") == []
+    assert records('{"data": []}') == []
+    assert records("  \n[ ]\n") == []
+
+
+def test_invalid_payload_raises():
+    with pytest.raises(ValueError):
+        records('"just a string"')
+    with pytest.raises(ValueError):
+        records('[{"a": 1}, {"a": ')
+    with pytest.raises(ValueError):
+        records("[1, 2, 3]")
+    with pytest.raises(ValueError):
+        records('{"a": 1}\n[1]')
+    with pytest.raises(ValueError):
+        records('{"a": [{"b": 1}')
+
+
+def test_frames_are_fixed_size_and_match_full_load():
+    frames = list(iter_json_frames(SAMPLE, 5000, read_size = 4096))
+    full = json.loads(SAMPLE.read_text(encoding = "utf-8-sig"))
+
+    assert [len(f) for f in frames[:-1]] == [5000] * (len(frames) - 1)
+    assert sum(len(f) for f in frames) == len(full)
+    assert load_json(SAMPLE).to_dict("records") == full
@@ -0,0 +1,78 @@
+import random
+import pandas.testing as pdt
+
+from creditcard_analysis.clean_data.clean import load_csv, clean_data
+from creditcard_analysis.clean_data.parallel import partition_file, load_csv_parallel
+
+HEADER = "年月,地區,信用卡產業別,年齡層,信用卡交易筆數,信用卡交易金額[新臺幣]\n"
+
+
+def write_raw_csv(path, rows = 3000, seed = 7):
+    rng = random.Random(seed)
+    lines = []
+    for i in range(rows):
+        ym = f"{rng.choice([2021, 2022, 2023])}{rng.randint(1, 12):02d}"
+        nation = rng.choice(["臺北市", "新北市", "高雄市", ""])
+        industry = rng.choice(["食", "衣", "住", "行"])
+        age = rng.choice(["20-24", "25-29", "30-34"])
+        count = "" if i % 97 == 0 else str(rng.randint(1, 900))
+        total = "Na" if i % 89 == 0 else f'"{rng.randint(1000, 9_000_000):,}"'   # 千分位
+        lines.append(f"{ym},{nation},{industry},{age},{count},{total}\n")
+        if i % 50 == 0:
+            lines.append(lines[-1])   # 重複列
+    path.write_text(HEADER + "".join(lines), encoding = "utf-8-sig")
+    return path
+
+
+def test_partitions_are_line_aligned_and_cover_file(tmp_path):
+    csv_path = write_raw_csv(tmp_path / "raw.csv")
+    raw = csv_path.read_bytes()
+
+    header, ranges = partition_file(csv_path, 4, min_bytes = 1)
+
+    assert len(ranges) == 4
+    assert ranges[0][0] == len(header)
+    assert ranges[-1][1] == len(raw)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+        assert raw[start - 1: start] == b"\n"
+
+
+def test_parallel_clean_matches_serial(tmp_path):
+    csv_path = write_raw_csv(tmp_path / "raw.csv")
+
+    serial   = clean_data(load_csv(csv_path))
+    parallel = clean_data(load_csv_parallel(csv_path, workers = 3, min_bytes = 1))
+
+    pdt.assert_frame_equal(parallel, serial)
+
+
+def test_clean_parses_thousands_and_uses_category(tmp_path):
+    csv_path = tmp_path / "raw.csv"
+    csv_path.write_text(HEADER + '202301,臺灣,食,20-24,"1,234","12,345,678"\n', encoding = "utf-8-sig")
+
+    df = clean_data(load_csv(csv_path))
+
+    assert df.loc[0, "trans_count"] == 1234
+    assert df.loc[0, "trans_total"] == 12345678
+    assert df.loc[0, "ym"] == "202301"
+    assert all(df[c].dtype == "category" for c in ["nation", "industry", "age_level"])
+
+
+def test_partitions_skip_newlines_inside_quotes(tmp_path):
+    # 地區欄位含換行 (引號內)：切點不能落在 record 中間
+    csv_path = write_raw_csv(tmp_path / "raw.csv")
+    raw = csv_path.read_bytes().decode("utf-8-sig")
+    raw = raw.replace(",臺北市,", ',"臺北\n""市""\n",')
+    csv_path.write_text(raw, encoding = "utf-8-sig")
+    data = csv_path.read_bytes()
+
+    header, ranges = partition_file(csv_path, 8, min_bytes = 1)
+
+    assert len(ranges) > 1
+    for start, _ in ranges[1:]:
+        assert data[len(header): start].count(b'"') % 2 == 0
+    serial   = clean_data(load_csv(csv_path))
+    parallel = clean_data(load_csv_parallel(csv_path, workers = 3, min_bytes = 1))
+    assert serial["nation"].astype(str).str.contains("\n").any()
+    pdt.assert_frame_equal(parallel, serial)
@@ -0,0 +1,89 @@
+import json
+import time
+import random
+import threading
+import pandas as pd
+
+from creditcard_analysis.clean_data import pipeline
+from creditcard_analysis.clean_data.clean import ETLOptions
+from creditcard_analysis.clean_data.downloader import DownloadResult
+from creditcard_analysis.clean_data.pipeline import Pipeline, run_pipeline
+
+KEY = ["ym", "nation", "industry", "age_level"]
+
+
+def write_jsonl(path, rows = 600, seed = 3):
+    # 同一個自然鍵在多個批次出現，值不同：最後一筆才是正確結果
+    rng = random.Random(seed)
+    lines = []
+    for i in range(rows):
+        lines.append({
+            "年月"          : f"2023{rng.randint(1, 12):02d}",
+            "地區"          : "臺灣",
+            "信用卡產業別"   : rng.choice(["食", "衣", "住"]),
+            "年齡層"         : rng.choice(["未滿20歲", "20(含)-25歲"]),
+            "信用卡交易筆數"  : str(i + 1),
+            "信用卡交易金額[新臺幣]": str((i + 1) * 10),
+        })
+    path.write_text("\n".join(json.dumps(r, ensure_ascii = False) for r in lines), encoding = "utf-8")
+    return path, lines
+
+
+def test_route_keeps_each_month_on_one_writer(tmp_path):
+    opts = ETLOptions(source = "json_path", path = tmp_path / "x.jsonl", out_dir = tmp_path, row_index = False)
+    p = Pipeline(opts, writers = 3, queue_size = 100)
+    frames = [pd.DataFrame({"ym": ["202301", "202302", "202303", "202301"], "n": [i * 4 + j for j in range(4)]}) for i in range(3)]
+    for df in frames:
+        assert p._route(df)
+
+    seen = {}
+    for i, q in enumerate(p.write_qs):
+        rows = pd.concat([q.get_nowait() for _ in range(q.qsize())]) if q.qsize() else pd.DataFrame(columns = ["ym", "n"])
+        for ym in rows["ym"]:
+            assert seen.setdefault(ym, i) == i
+        # 同一個 writer 收到的列維持原本的順序
+        assert rows["n"].tolist() == sorted(rows["n"])
+    assert set(seen) == {"202301", "202302", "202303"}
+
+
+def test_concurrent_writers_keep_last_row(tmp_path, monkeypatch):
+    # writer 寫入速度不一：同一個鍵仍是最後一筆生效，與單執行緒相同
+    path, lines = write_jsonl(tmp_path / "raw.jsonl")
+    table, lock = {}, threading.Lock()
+    def fake_write(df, table_name, loader):
+        time.sleep(random.random() / 20)
+        with lock:
+            for row in df.to_dict("records"):
+                table[tuple(str(row[c]) for c in KEY)] = row["trans_count"]
+    monkeypatch.setattr(pipeline, "write_to_mysql", fake_write)
+    monkeypatch.setattr(pipeline, "set_watermark", lambda *args: None)
+    opts = ETLOptions(source = "json_path", path = path, out_dir = tmp_path, strategy = "full",
+                      chunk_rows = 25, loader = "executemany", row_index = False)
+
+    months, digest = run_pipeline(opts, writers = 4)
+
+    expected = {}
+    for r in lines:
+        expected[(r["年月"], r["地區"], r["信用卡產業別"], r["年齡層"])] = int(r["信用卡交易筆數"])
+    assert table == expected
+    assert months == {r["年月"] for r in lines} and digest is None
+
+
+def test_unchanged_source_is_skipped(tmp_path, monkeypatch):
+    dest = tmp_path / "BANK_TWN_ALL_AG.CSV"
+    class FakeDownloader:
+        def __init__(self, *args, **kwargs):
+            self.session = type("S", (), {"mount": lambda *a: None})()
+        def download(self, url, expected_sha256 = None):
+            dest.write_text("年月,地區,信用卡產業別,年齡層,信用卡交易筆數,信用卡交易金額[新臺幣]\n", encoding = "utf-8-sig")
+            return DownloadResult(dest, False, 0, "abc")
+    writes = []
+    monkeypatch.setattr(pipeline, "Downloader", FakeDownloader)
+    monkeypatch.setattr(pipeline, "get_watermark", lambda key: None)
+    monkeypatch.setattr(pipeline, "get_ingested", lambda key: "abc")
+    monkeypatch.setattr(pipeline, "write_to_mysql", lambda *args: writes.append(args))
+    opts = ETLOptions(source = "csv_url", url = "http://example/BANK_TWN_ALL_AG.CSV", out_dir = tmp_path,
+                      loader = "executemany", row_index = False)
+
+    assert run_pipeline(opts) == (None, "abc")
+    assert writes == []
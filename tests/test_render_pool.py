@@ -0,0 +1,74 @@
+import os
+import sys
+import subprocess
+import pytest
+from pathlib import Path
+from concurrent.futures.process import BrokenProcessPool
+
+from creditcard_analysis.chart_service import render_pool, to_sql
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setenv("CHART_RENDER_PROCESSES", "1")
+    monkeypatch.setenv("CHART_RENDER_MAX_TASKS", "1")
+    render_pool.shutdown()
+    yield render_pool.get_pool()
+    render_pool.shutdown()
+
+
+def test_settings_from_env(monkeypatch):
+    monkeypatch.setenv("CHART_RENDER_PROCESSES", "3")
+    monkeypatch.setenv("CHART_RENDER_MAX_TASKS", "0")
+    assert render_pool.render_processes() == 3
+    assert render_pool.max_tasks_per_child() == 1
+    monkeypatch.delenv("CHART_RENDER_MAX_TASKS")
+    assert render_pool.max_tasks_per_child() == 50
+
+def test_pool_defaults_to_cores_and_zero_opts_out(monkeypatch):
+    monkeypatch.delenv("CHART_RENDER_PROCESSES", raising = False)
+    monkeypatch.setattr(render_pool.os, "cpu_count", lambda: 8)
+    assert render_pool.render_processes() == 7
+    monkeypatch.setattr(render_pool.os, "cpu_count", lambda: None)
+    assert render_pool.render_processes() == 0
+    monkeypatch.setenv("CHART_RENDER_PROCESSES", "0")
+    render_pool.warm_up()
+    assert render_pool._pool is None
+
+def test_import_does_not_connect_to_db():
+    # 子行程 import 套件 (含 database.py) 不應連 MySQL
+    code = ("import pymysql\n"
+            "def boom(*a, **k): raise SystemExit('connected')\n"
+            "pymysql.connect = boom\n"
+            "import creditcard_analysis.chart_service.render_pool\n"
+            "import creditcard_analysis.chart_gener\n")
+    env = dict(os.environ, PYTHONPATH = str(Path(__file__).resolve().parents[1]))
+    res = subprocess.run([sys.executable, "-c", code], env = env, capture_output = True, text = True)
+    assert res.returncode == 0, res.stderr
+
+def test_workers_are_warm_and_recycled(pool):
+    first  = pool.submit(render_pool.worker_info).result(timeout = 120)
+    second = pool.submit(render_pool.worker_info).result(timeout = 120)
+    # initializer 已跑過：Agg backend、中文字型設定好
+    assert first["warm"] and second["warm"]
+    assert first["backend"].lower() == "agg"
+    assert "PingFang TC" in first["fonts"]
+    # 每個 worker 只做 1 件就換新行程
+    assert first["pid"] != second["pid"]
+
+def test_in_process_fallback(monkeypatch):
+    monkeypatch.setenv("CHART_RENDER_PROCESSES", "0")
+    monkeypatch.setattr(to_sql, "draw_chart", lambda payload: ("chart_storage/local.png", None))
+    assert to_sql.render_chart("payload") == ("chart_storage/local.png", None)
+    assert render_pool._pool is None
+
+def test_broken_pool_is_replaced(pool, monkeypatch):
+    class Broken:
+        def submit(self, *args):
+            raise BrokenProcessPool("worker 結束")
+        def shutdown(self, wait, cancel_futures):
+            pass
+    monkeypatch.setattr(render_pool, "_pool", Broken())
+    with pytest.raises(BrokenProcessPool):
+        render_pool.render("payload")
+    assert render_pool._pool is None
@@ -0,0 +1,142 @@
+import json
+import threading
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from creditcard_analysis.database import Base
+from creditcard_analysis.models import ChartRequest, ChartResult
+from creditcard_analysis.utils import get_db
+from creditcard_analysis.api.routers import request as request_router
+from creditcard_analysis.chart_service import jobs, to_sql
+
+PAYLOAD = {
+    "chart_type"   : "bar",
+    "params_json"  : {"x_axis": "industry", "value": "trans_total"},
+    "params_figure": {"set_title": "測試"},
+    "create_by"    : 1,
+    "filters"      : {"topn": 5},
+}
+POINTS = [{"x": "食", "amount": 1.0}]
+
+
+@pytest.fixture
+def session_factory(monkeypatch):
+    engine = create_engine("sqlite://", poolclass = StaticPool, connect_args = {"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind = engine, autoflush = False, expire_on_commit = False)
+    monkeypatch.setattr(jobs, "SessionLocal", factory)
+    monkeypatch.setattr(request_router, "SessionLocal", factory)
+    monkeypatch.setattr(request_router, "SSE_POLL_SECONDS", 0.01)
+    yield factory
+    jobs.shutdown()
+
+@pytest.fixture
+def client(session_factory):
+    app = FastAPI()
+    app.include_router(request_router.router)
+
+    def override_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+    app.dependency_overrides[get_db] = override_db
+    return TestClient(app)
+
+@pytest.fixture
+def gate(monkeypatch):
+    # 背景產圖卡在 gate，直到測試放行
+    gate = threading.Event()
+    calls: list = []
+    def fake_render(payload):
+        calls.append(payload)
+        assert gate.wait(5)
+        return "chart_storage/bar.png", POINTS
+    monkeypatch.setattr(jobs, "render_chart", fake_render)
+    gate.calls = calls
+    return gate
+
+def count(factory, model) -> int:
+    with factory() as db:
+        return db.execute(select(func.count()).select_from(model)).scalar_one()
+
+
+def test_async_post_returns_pending_then_ready(client, session_factory, gate):
+    res = client.post("/api/request/?mode=async", json = PAYLOAD)
+    assert res.status_code == 202
+    body = res.json()
+    assert body["status"] == "PENDING" and body["url"] is None
+    key = body["key"]
+
+    assert client.get(f"/api/request/{key}").json()["status"] == "PENDING"
+    # 產圖中再送同一個請求：同一個 key、不重複產圖
+    again = client.post("/api/request/?mode=async", json = PAYLOAD)
+    assert again.status_code == 202 and again.json()["key"] == key
+
+    gate.set()
+    jobs.shutdown()
+    done = client.get(f"/api/request/{key}").json()
+    assert done == {"key": key, "url": "chart_storage/bar.png", "points": [{"x": "食", "y": None, "amount": 1.0, "share": None, "growth": None}], "status": "READY",
+                    "error": None, "retry_after": None}
+    assert len(gate.calls) == 1
+    assert count(session_factory, ChartResult) == 1 and count(session_factory, ChartRequest) == 2
+
+    # 已完成的請求直接回結果
+    hit = client.post("/api/request/?mode=async", json = PAYLOAD)
+    assert hit.status_code == 201 and hit.json()["url"] == "chart_storage/bar.png"
+
+def test_sse_reports_ready(client, gate, monkeypatch):
+    key = client.post("/api/request/?mode=async", json = PAYLOAD).json()["key"]
+    # SSE 讀到第一次狀態後才放行背景產圖
+    lookup = request_router._lookup
+    def lookup_then_release(k):
+        out = lookup(k)
+        gate.set()
+        return out
+    monkeypatch.setattr(request_router, "_lookup", lookup_then_release)
+    with client.stream("GET", f"/api/request/{key}/events") as res:
+        assert res.headers["content-type"].startswith("text/event-stream")
+        events = [json.loads(line[len("data: "):])["status"] for line in res.iter_lines() if line.startswith("data: ")]
+    assert events == ["PENDING", "READY"]
+
+def test_failed_render_is_reported(client, monkeypatch):
+    def broken(payload):
+        raise RuntimeError("savefig 失敗")
+    monkeypatch.setattr(jobs, "render_chart", broken)
+    key = client.post("/api/request/?mode=async", json = PAYLOAD).json()["key"]
+    jobs.shutdown()
+    failed = client.get(f"/api/request/{key}").json()
+    assert failed["status"] == "FAILED" and failed["retry_after"] is not None
+    assert failed["error"] == {"type": "RuntimeError", "msg": "savefig 失敗"}
+    with client.stream("GET", f"/api/request/{key}/events") as res:
+        lines = [l for l in res.iter_lines() if l]
+    assert lines[0] == "event: status"
+    event = json.loads(lines[1][len("data: "):])
+    assert event["status"] == "FAILED" and event["error"]["type"] == "RuntimeError"
+
+def test_sync_mode_unchanged(client, session_factory, monkeypatch):
+    monkeypatch.setattr(to_sql, "render_chart", lambda payload: ("chart_storage/sync.png", POINTS))
+    res = client.post("/api/request/", json = PAYLOAD)
+    assert res.status_code == 201
+    assert res.json()["status"] == "READY" and res.json()["url"] == "chart_storage/sync.png"
+
+    # 同步產圖失敗：不留下 PENDING，回 FAILED + 錯誤原因 + Retry-After
+    def broken(payload):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(to_sql, "render_chart", broken)
+    other = dict(PAYLOAD, filters = {"topn": 3})
+    res = client.post("/api/request/", json = other)
+    assert res.status_code == 200 and int(res.headers["Retry-After"]) > 0
+    assert res.json()["status"] == "FAILED" and res.json()["error"] == {"type": "RuntimeError", "msg": "boom"}
+    assert count(session_factory, ChartResult) == 2
+
+def test_unknown_key_is_404(client):
+    assert client.get("/api/request/nope").status_code == 404
+    assert client.get("/api/request/nope/events").status_code == 404
+    res = client.post("/api/request/?mode=async", json = dict(PAYLOAD, chart_type = "pie", params_json = {"x_axis": "industry", "y_axis": "age_level", "value": "trans_total"}))
+    assert res.status_code == 422 and res.json()["detail"]["field"] == "y_axis"
@@ -0,0 +1,74 @@
+import re
+import itertools
+import pytest
+from sqlalchemy import create_engine, insert, text
+
+from creditcard_analysis.database import Base
+from creditcard_analysis.models import CleanedData, DIMENSIONS, ROLLUPS
+from creditcard_analysis.chart_gener.utils import pick_table
+from creditcard_analysis.chart_gener.bar.raw_sql import build_sql_raw
+from creditcard_analysis.chart_gener.heatmap.raw_sql import build_sql_for_heatmap
+from creditcard_analysis.clean_data.rollup import refresh_rollups
+
+
+@pytest.mark.parametrize("cols, filters, expected", [
+    (["ym"], {}, "rollup_ym"),
+    (["ym"], {"start_month": "202301"}, "rollup_ym"),
+    (["ym"], {"industry": "食"}, "rollup_ym_industry"),
+    (["industry"], {"start_month": "202301", "end_month": "202312"}, "rollup_ym_industry"),
+    (["age_level"], {}, "rollup_industry_age"),
+    (["age_level"], {"end_month": "202312"}, "rollup_ym_age"),
+    (["industry", "age_level"], {}, "rollup_industry_age"),
+    (["industry", "age_level"], {"start_month": "202301"}, "clean_data"),
+    (["ym"], {"industry": "食", "age_level": "未滿20歲"}, "clean_data"),
+])
+def test_pick_table_uses_smallest_covering_rollup(cols, filters, expected):
+    assert pick_table(cols, **filters) == expected
+
+
+@pytest.fixture
+def conn():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for _, model in DIMENSIONS.values():
+            conn.execute(insert(model.__table__), [{"id": 1, "label": "A", "sort_order": 0}, {"id": 2, "label": "B", "sort_order": 1}])
+        conn.execute(insert(DIMENSIONS["industry"][1].__table__), [{"id": 3, "label": "食", "sort_order": 2}])
+        rows = [
+            {"ym": f"2023{m:02d}", "ym_key": 2023 * 12 + m - 1, "nation_id": n, "industry_id": i, "age_level_id": a,
+             "trans_count": m * 10 + i + a, "trans_total": m * 1000 + i * 100 + a * 10 + n}
+            for m, n, i, a in itertools.product(range(1, 7), (1, 2), (1, 2, 3), (1, 2))
+        ]
+        conn.execute(insert(CleanedData.__table__), rows)
+        yield conn
+
+
+def test_refresh_rebuilds_every_rollup(conn):
+    counts = refresh_rollups(conn)
+    assert counts == {"rollup_ym": 6, "rollup_industry_age": 6, "rollup_ym_industry": 18, "rollup_ym_age": 12}
+
+    # 重跑不會重複累加
+    refresh_rollups(conn)
+    total = conn.execute(text("SELECT SUM(trans_total) FROM clean_data")).scalar_one()
+    for table in ROLLUPS:
+        assert conn.execute(text(f"SELECT SUM(trans_total) FROM {table}")).scalar_one() == total
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"start_month": "202302", "end_month": "202305"},
+    {"industry": "食"},
+    {"age_level": "B"},
+])
+def test_rollup_results_match_clean_data(conn, filters):
+    refresh_rollups(conn)
+    queries = [build_sql_raw(x, "trans_total", **filters) for x in ("industry", "age_level")]
+    queries.append(build_sql_for_heatmap("industry", "age_level", "trans_total", "trans_count", **filters))
+
+    for sql, _, params in queries:
+        table = next((t for t in ROLLUPS if re.search(rf"FROM {t}\b", sql.text)), None)
+        if table is None:
+            continue
+        from_rollup = conn.execute(sql, params).all()
+        from_fact   = conn.execute(text(re.sub(rf"FROM {table}\b", "FROM clean_data", sql.text)), params).all()
+        assert from_rollup == from_fact
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+from creditcard_analysis.clean_data.row_index import RowHashIndex, row_index_path, row_hashes
+
+
+def frame(rows):
+    df = pd.DataFrame(rows, columns = ["ym", "nation", "industry", "age_level", "trans_count", "trans_total"])
+    for col in ["nation", "industry", "age_level"]:
+        df[col] = df[col].astype("category")
+    return df
+
+
+A = ("202301", "臺灣", "食", "20-24", 10, 100)
+B = ("202301", "臺灣", "衣", "20-24", 20, 200)
+C = ("202302", "臺灣", "食", "20-24", 30, 300)
+
+
+def test_filter_new_dedupes_within_and_across_chunks(tmp_path):
+    index = RowHashIndex(row_index_path(tmp_path, "clean_data"))
+
+    first  = index.filter_new(frame([A, B, A]))
+    second = index.filter_new(frame([B, C]))
+
+    assert first.index.tolist() == [0, 1]
+    assert second.index.tolist() == [1]
+    assert index.skipped == 2
+    assert len(index) == 3
+
+
+def test_saved_index_skips_rows_from_earlier_runs(tmp_path):
+    path = row_index_path(tmp_path, "clean_data")
+    index = RowHashIndex(path)
+    index.filter_new(frame([A, B]))
+    index.save()
+
+    saved = np.load(path)
+    assert saved.dtype == np.uint64
+    assert np.all(saved[:-1] < saved[1:])
+
+    rerun = RowHashIndex(path)
+    out = rerun.filter_new(frame([A, B, C]))
+    assert out.values.tolist() == [list(C)]
+
+    # 沒有成功 save 的雜湊不會留在檔案裡
+    assert len(RowHashIndex(path)) == 2
+
+
+def test_hash_ignores_category_set_differences():
+    # 不同批次的 category 集合不同，雜湊仍只看值
+    one = frame([A])
+    two = frame([A, C]).iloc[:1]
+    assert row_hashes(one)[0] == row_hashes(two)[0]
+
+
+def test_invalidate_and_fresh_rebuild(tmp_path):
+    path = row_index_path(tmp_path, "clean_data")
+    index = RowHashIndex(path)
+    index.filter_new(frame([A, B]))
+    index.save()
+
+    RowHashIndex.invalidate(path)
+    assert not path.exists()
+
+    rebuilt = RowHashIndex(path, fresh = True)
+    rebuilt.add(row_hashes(frame([C])))
+    rebuilt.save()
+    assert len(RowHashIndex(path)) == 1
@@ -119,6 +119,33 @@ def test_filter_allows_none():
 
     assert obj.industry is None 
 
+@pytest.mark.parametrize("ym", ["2024", "202413", "202400", "2024-01", "abcdef", " 202401"])
+def test_filter_rejects_bad_year_month(ym):
+    with pytest.raises(ValidationError):
+        Filter(start_month = ym)
+    with pytest.raises(ValidationError):
+        Filter(end_month = ym)
+
+def test_filter_allows_year_month():
+    obj = Filter(start_month = "202401", end_month = "202412")
+
+    assert (obj.start_month, obj.end_month) == ("202401", "202412")
+
+def test_dashboard_rejects_bad_year_month():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from creditcard_analysis.utils import get_db
+    from creditcard_analysis.api.routers import dashboard
+
+    app = FastAPI()
+    app.include_router(dashboard.router)
+    app.dependency_overrides[get_db] = lambda: None
+    client = TestClient(app)
+
+    res = client.get("/api/dashboard/overview", params = {"start_month": "202413"})
+    assert res.status_code == 422
+    assert client.get("/api/dashboard/overview", params = {"end_month": "2024/1"}).status_code == 422
+
 def test_chartpoint_reject_without_x():
     with pytest.raises(ValidationError):
         ChartPoint()
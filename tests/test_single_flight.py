@@ -0,0 +1,276 @@
+import threading
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.orm import sessionmaker
+
+from creditcard_analysis.database import Base
+from creditcard_analysis.models import ChartRequest, ChartResult, ResultStatus
+from creditcard_analysis.utils import ChartIn
+from creditcard_analysis.chart_service import to_sql, single_flight, jobs
+from creditcard_analysis.chart_service.single_flight import coalesce, claim, renew_lease
+
+PAYLOAD = {
+    "chart_type"   : "bar",
+    "params_json"  : {"x_axis": "industry", "value": "trans_total"},
+    "params_figure": {"set_title": "測試"},
+    "create_by"    : 1,
+    "filters"      : {"topn": 5},
+}
+POINTS = [{"x": "食", "amount": 1.0}]
+
+
+@pytest.fixture
+def factory(tmp_path, monkeypatch):
+    # 檔案型 SQLite：每個執行緒自己的連線，模擬多個請求同時進來
+    engine = create_engine(f"sqlite:///{tmp_path / 'chart.db'}", connect_args = {"timeout": 10, "check_same_thread": False})
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(single_flight, "WAIT_POLL_SECONDS", 0.01)
+    yield sessionmaker(bind = engine, autoflush = False, expire_on_commit = False)
+    engine.dispose()
+
+@pytest.fixture
+def renders(monkeypatch):
+    gate  = threading.Event()
+    calls = []
+    def fake_render(payload):
+        calls.append(payload)
+        assert gate.wait(5)
+        return "chart_storage/bar.png", POINTS
+    monkeypatch.setattr(to_sql, "render_chart", fake_render)
+    gate.calls = calls
+    return gate
+
+def request(factory) -> dict:
+    with factory() as db:
+        return to_sql.record_to_sql(db, ChartIn(**PAYLOAD))
+
+def count(factory, model) -> int:
+    with factory() as db:
+        return db.execute(select(func.count()).select_from(model)).scalar_one()
+
+def run_threads(n, target) -> list:
+    out = [None] * n
+    def run(i):
+        out[i] = target()
+    threads = [threading.Thread(target = run, args = (i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    return threads, out
+
+def add_pending(factory, owner, expires_at) -> str:
+    key = to_sql._make_cache_key(ChartIn(**PAYLOAD))
+    with factory() as db:
+        fields = to_sql.to_db_fields(ChartIn(**PAYLOAD), key)
+        fields.update(lease_owner = owner, lease_expires_at = expires_at)
+        db.add(ChartResult(**fields))
+        db.commit()
+    return key
+
+
+def test_coalesce_runs_once_and_shares_result():
+    gate = threading.Event()
+    calls = []
+    def work():
+        calls.append(1)
+        assert gate.wait(5)
+        return "done"
+    threads, out = run_threads(4, lambda: coalesce("k", work, timeout = 5))
+    while not calls:
+        pass
+    gate.set()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert sorted(leader for _, leader in out) == [False, False, False, True]
+    assert {res for res, _ in out} == {"done"}
+    assert single_flight._inflight == {}
+
+def test_coalesce_shares_failure_and_wait_timeout():
+    started = threading.Event()
+    def boom():
+        started.set()
+        assert release.wait(5)
+        raise ValueError("查無資料")
+    release = threading.Event()
+    errors = []
+    def call():
+        try:
+            coalesce("k", boom, timeout = 5)
+        except ValueError as e:
+            errors.append(str(e))
+    leader = threading.Thread(target = call)
+    leader.start()
+    assert started.wait(5)
+    assert coalesce("k", lambda: "x", timeout = 0.01) == (None, False)      # 逾時不等
+    waiter = threading.Thread(target = call)
+    waiter.start()
+    release.set()
+    leader.join()
+    waiter.join()
+    assert errors == ["查無資料", "查無資料"]
+
+def test_concurrent_sync_requests_render_once(factory, renders):
+    threads, out = run_threads(4, lambda: request(factory))
+    while not renders.calls:
+        pass
+    renders.set()
+    for t in threads:
+        t.join()
+    assert len(renders.calls) == 1
+    assert all(r["status"] == "READY" and r["url"] == "chart_storage/bar.png" and r["points"] == POINTS for r in out)
+    assert count(factory, ChartResult) == 1 and count(factory, ChartRequest) == 4
+    with factory() as db:
+        row = db.execute(select(ChartResult)).scalar_one()
+        assert row.lease_owner is None and row.lease_expires_at is None
+
+def test_waits_for_other_worker_lease(factory, renders):
+    # 別的 worker 持有未過期的租約：不重產，等它寫回 READY
+    key = add_pending(factory, "other-host:1", datetime.now() + timedelta(minutes = 5))
+    threads, out = run_threads(1, lambda: request(factory))
+    with factory() as db:
+        row = db.execute(select(ChartResult)).scalar_one()
+        to_sql.complete_chart(db, row, "chart_storage/other.png", None)
+    threads[0].join()
+    assert out[0]["key"] == key and out[0]["url"] == "chart_storage/other.png"
+    assert renders.calls == []
+
+def test_expired_lease_is_taken_over(factory, renders):
+    add_pending(factory, "dead-host:1", datetime.now() - timedelta(seconds = 1))
+    renders.set()
+    res = request(factory)
+    assert res["status"] == "READY" and len(renders.calls) == 1
+
+def test_claim_is_exclusive(factory):
+    add_pending(factory, "dead-host:1", datetime.now() - timedelta(seconds = 1))
+    with factory() as a, factory() as b:
+        row_a = a.execute(select(ChartResult)).scalar_one()
+        row_b = b.execute(select(ChartResult)).scalar_one()
+        assert claim(a, row_a) is True
+        assert claim(b, row_b) is False
+        assert row_a.lease_owner.rsplit(":", 1)[0] == single_flight.lease_owner().rsplit(":", 1)[0]
+        row_a.status = ResultStatus.READY
+        a.commit()
+        assert claim(a, row_a) is False
+
+def test_queued_job_skips_when_lease_taken_over(factory, renders, monkeypatch):
+    # 排隊太久租約過期、已被別人接手：舊工作不再產圖
+    monkeypatch.setattr(jobs, "SessionLocal", factory)
+    monkeypatch.setattr(jobs, "render_chart", to_sql.render_chart)
+    add_pending(factory, "old-owner", datetime.now() - timedelta(seconds = 1))
+    with factory() as db:
+        row = db.execute(select(ChartResult)).scalar_one()
+        assert claim(db, row) and renew_lease(db, row.id, "old-owner") is False
+        assert jobs.run_render(row.id, ChartIn(**PAYLOAD), "old-owner") == "LOST"
+    assert renders.calls == []
+
+def test_heartbeat_extends_lease_while_rendering(factory, monkeypatch):
+    monkeypatch.setenv("CHART_LEASE_SECONDS", "0.3")
+    monkeypatch.setattr(jobs, "SessionLocal", factory)
+    seen = []
+    def slow_render(payload):
+        # 超過租約時間：heartbeat 持續延長，別人搶不到
+        deadline = datetime.now() + timedelta(seconds = 0.8)
+        while datetime.now() < deadline:
+            with factory() as db:
+                row = db.execute(select(ChartResult)).scalar_one()
+                seen.append(claim(db, row))
+        return "chart_storage/slow.png", POINTS
+    monkeypatch.setattr(jobs, "render_chart", slow_render)
+    add_pending(factory, "me", datetime.now() + timedelta(seconds = 0.3))
+    with factory() as db:
+        row_id = db.execute(select(ChartResult.id)).scalar_one()
+    assert jobs.run_render(row_id, ChartIn(**PAYLOAD), "me") == "READY"
+    assert seen and not any(seen)
+
+
+def test_stale_owner_cannot_overwrite_newer_state(factory, monkeypatch):
+    # 產圖太久被 reaper 標 FAILED、又被別人接手：舊 worker 寫回 READY / FAILED 都不生效
+    monkeypatch.setattr(jobs, "SessionLocal", factory)
+    def reaped_then_claimed(payload):
+        with factory() as db:
+            row = db.execute(select(ChartResult)).scalar_one()
+            row.lease_expires_at = datetime.now() - timedelta(seconds = 1)
+            db.commit()
+            assert single_flight.reap_expired(db) == 1
+            db.refresh(row)
+            row.retry_after = datetime.now() - timedelta(seconds = 1)
+            db.commit()
+            assert claim(db, row)
+        return "chart_storage/stale.png", POINTS
+    monkeypatch.setattr(jobs, "render_chart", reaped_then_claimed)
+    add_pending(factory, "slow", datetime.now() + timedelta(minutes = 1))
+    with factory() as db:
+        row = db.execute(select(ChartResult)).scalar_one()
+        assert jobs.run_render(row.id, ChartIn(**PAYLOAD), "slow") == "LOST"
+        db.refresh(row)
+        assert row.status == ResultStatus.PENDING and row.attempts == 2 and row.file_path is None
+        assert to_sql.fail_chart(db, row, ValueError("x"), "slow") is False
+        assert to_sql.complete_chart(db, row, "chart_storage/new.png", None) is True
+        assert row.status == ResultStatus.READY and row.lease_owner is None
+
+
+def test_failed_render_retries_after_backoff(factory, monkeypatch):
+    monkeypatch.setenv("CHART_RETRY_SECONDS", "60")
+    calls = []
+    def flaky(payload):
+        calls.append(payload)
+        if len(calls) == 1:
+            raise ValueError("查無資料")
+        return "chart_storage/bar.png", POINTS
+    monkeypatch.setattr(to_sql, "render_chart", flaky)
+
+    first = request(factory)
+    assert first["status"] == "FAILED" and first["error"] == {"type": "ValueError", "msg": "查無資料"}
+    assert first["retry_after"] > datetime.now() + timedelta(seconds = 50)
+    # retry_after 之前：直接回 FAILED，不重產
+    assert request(factory)["status"] == "FAILED" and len(calls) == 1
+
+    with factory() as db:
+        row = db.execute(select(ChartResult)).scalar_one()
+        row.retry_after = datetime.now() - timedelta(seconds = 1)
+        db.commit()
+    again = request(factory)
+    assert again["status"] == "READY" and again["error"] is None and len(calls) == 2
+    with factory() as db:
+        row = db.execute(select(ChartResult)).scalar_one()
+        assert row.attempts == 2 and row.retry_after is None and row.error_json is None
+
+def test_max_attempts_waits_for_backoff_cap_then_resets(factory, monkeypatch):
+    # 次數用完不會永遠卡在 FAILED：等退避上限後重新從第 1 次算起
+    monkeypatch.setenv("CHART_MAX_ATTEMPTS", "1")
+    monkeypatch.setenv("CHART_RETRY_SECONDS", "1")
+    monkeypatch.setenv("CHART_RETRY_MAX_SECONDS", "600")
+    monkeypatch.setattr(to_sql, "render_chart", lambda payload: (_ for _ in ()).throw(ValueError("查無資料")))
+    res = request(factory)
+    assert res["status"] == "FAILED" and res["retry_after"] > datetime.now() + timedelta(seconds = 590)
+    with factory() as db:
+        row = db.execute(select(ChartResult)).scalar_one()
+        assert claim(db, row) is False
+        row.retry_after = datetime.now() - timedelta(seconds = 1)
+        db.commit()
+        assert claim(db, row) is True
+        assert row.attempts == 1 and row.status == ResultStatus.PENDING
+
+def test_reaper_fails_expired_leases(factory):
+    add_pending(factory, "dead-host:1", datetime.now() - timedelta(seconds = 1))
+    with factory() as db:
+        live = ChartResult(**to_sql.to_db_fields(ChartIn(**PAYLOAD), "live-key"))
+        db.add(live)
+        db.commit()
+        assert single_flight.reap_expired(db) == 1
+        assert single_flight.reap_expired(db) == 0
+        db.expire_all()
+        rows = {r.cache_key: r for r in db.execute(select(ChartResult)).scalars()}
+    dead = rows.pop(next(k for k in rows if k != "live-key"))
+    assert dead.status == ResultStatus.FAILED and dead.lease_owner is None
+    assert dead.error_json["type"] == "LeaseExpired" and dead.retry_after is not None
+    assert rows["live-key"].status == ResultStatus.PENDING
+
+def test_expired_lease_without_attempts_left_fails_fast(factory, renders, monkeypatch):
+    # 次數用完的過期租約：不接手也不等到逾時，直接標 FAILED
+    monkeypatch.setenv("CHART_MAX_ATTEMPTS", "1")
+    add_pending(factory, "dead-host:1", datetime.now() - timedelta(seconds = 1))
+    res = request(factory)
+    assert res["status"] == "FAILED" and res["error"]["type"] == "LeaseExpired" and res["retry_after"] is not None
+    assert renders.calls == []
@@ -0,0 +1,135 @@
+import itertools
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, insert
+
+from creditcard_analysis import olap
+from creditcard_analysis.database import Base
+from creditcard_analysis.models import CleanedData, DIMENSIONS
+from creditcard_analysis.olap import snapshot
+from creditcard_analysis.olap.cube import Cube, MEASURES
+from creditcard_analysis.olap.snapshot import publish, attach, current_name, publisher_lock
+from creditcard_analysis.clean_data.dataset_version import bump_version
+
+
+def make_cube(version: int, scale: int = 1) -> Cube:
+    facts = pd.DataFrame([
+        {"ym_key": 2023 * 12 + m, "industry_id": i, "age_level_id": a,
+         "trans_count": scale * (m + i + a), "trans_total": scale * (m * 100 + i * 10 + a)}
+        for m, i, a in itertools.product(range(4), (1, 2, 3), (1, 2))
+    ])
+    dims = {
+        "industry" : pd.DataFrame({"id": [1, 2, 3], "label": ["食", "衣", "其他"], "sort_order": [0, 1, 6]}),
+        "age_level": pd.DataFrame({"id": [1, 2], "label": ["未滿20歲", "20(含)-25歲"], "sort_order": [0, 20]}),
+    }
+    return Cube.from_frames(facts, dims, version)
+
+
+def test_publish_and_attach_round_trip(tmp_path):
+    cube = make_cube(version = 5)
+    publish(cube, tmp_path)
+    assert current_name(tmp_path) == "v00000005"
+
+    shared = attach(tmp_path)
+    assert shared.version == 5 and shared.ym0 == cube.ym0 and shared.shape == cube.shape
+    # 陣列直接對應到檔案 (唯讀 mmap)，沒有複製
+    for arr in [shared.rows, *shared.sums.values()]:
+        assert isinstance(arr.base, np.memmap)
+        assert not arr.flags.writeable
+    for m in MEASURES:
+        np.testing.assert_array_equal(shared.sums[m], cube.sums[m])
+
+    pd.testing.assert_frame_equal(shared.bar("industry", "trans_total"), cube.bar("industry", "trans_total"))
+    pd.testing.assert_frame_equal(shared.heatmap("industry", "age_level", "trans_total", "trans_count"),
+                                  cube.heatmap("industry", "age_level", "trans_total", "trans_count"))
+    assert shared.overview().keys() == cube.overview().keys()
+
+
+def test_new_version_swaps_current_and_keeps_old_attached(tmp_path):
+    publish(make_cube(version = 1), tmp_path)
+    old = attach(tmp_path)
+    publish(make_cube(version = 2, scale = 3), tmp_path)
+
+    assert current_name(tmp_path) == "v00000002"
+    new = attach(tmp_path)
+    assert new.sums["trans_total"].sum() == 3 * old.sums["trans_total"].sum()
+    # 舊版本仍可查詢
+    assert old.bar("ym", "trans_count")["raw_amount"].sum() > 0
+
+    for v in range(3, 7):
+        publish(make_cube(version = v), tmp_path)
+    kept = sorted(p.name for p in tmp_path.glob("v*"))
+    assert kept == ["v00000004", "v00000005", "v00000006"]
+    assert not list(tmp_path.glob(".tmp-*"))
+
+def test_publish_same_version_twice_is_noop(tmp_path):
+    publish(make_cube(version = 1), tmp_path)
+    publish(make_cube(version = 1, scale = 9), tmp_path)           # 另一個 worker 同時發布同一版
+    assert attach(tmp_path).sums["trans_total"].sum() == make_cube(version = 1).sums["trans_total"].sum()
+
+@pytest.mark.skipif(snapshot.fcntl is None, reason = "需要 fcntl.flock")
+def test_publisher_lock_is_exclusive(tmp_path):
+    with publisher_lock(tmp_path) as first:
+        with publisher_lock(tmp_path) as second:
+            assert first is True and second is False
+    with publisher_lock(tmp_path) as again:
+        assert again is True
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for name in ("industry", "age_level"):
+            conn.execute(insert(DIMENSIONS[name][1].__table__), [{"id": 1, "label": "A", "sort_order": 0}])
+        conn.execute(insert(CleanedData.__table__), [
+            {"ym": f"2023{m:02d}", "ym_key": 2023 * 12 + m - 1, "nation_id": 1, "industry_id": 1, "age_level_id": 1,
+             "trans_count": m, "trans_total": m * 100}
+            for m in range(1, 4)
+        ])
+        bump_version(["202301", "202302", "202303"], conn)
+    monkeypatch.setenv("OLAP_SNAPSHOT_DIR", str(tmp_path / "snap"))
+    monkeypatch.setattr(olap, "_cube", None)
+    return engine
+
+def test_workers_share_snapshot_and_only_leader_reads_db(engine, tmp_path, monkeypatch):
+    # 第一個 worker 拿到鎖：從 DB 載入並發布
+    assert olap.refresh_cube(engine) is True
+    leader = olap._cube
+    assert leader.version == 1 and isinstance(leader.rows.base, np.memmap)
+
+    # 其他 worker 拿不到鎖，也不碰 DB
+    @contextmanager
+    def busy(root):
+        yield False
+    def no_db(*args, **kwargs):
+        raise AssertionError("follower 不應讀 DB")
+    monkeypatch.setattr(olap, "publisher_lock", busy)
+    monkeypatch.setattr(olap, "_updated", no_db)
+    monkeypatch.setattr(olap, "_cube", None)
+    assert olap.refresh_cube(engine) is True
+    follower = olap._cube
+    assert follower is not leader and follower.version == 1
+    assert olap.refresh_cube(engine) is False                     # 快照沒變
+
+    # ETL 新增月份後 leader 增量更新並發布，follower 下一輪掛上新版本
+    monkeypatch.undo()
+    monkeypatch.setenv("OLAP_SNAPSHOT_DIR", str(tmp_path / "snap"))
+    with engine.begin() as conn:
+        conn.execute(insert(CleanedData.__table__), [{"ym": "202304", "ym_key": 2023 * 12 + 3, "nation_id": 1,
+                                                      "industry_id": 1, "age_level_id": 1, "trans_count": 4, "trans_total": 400}])
+        bump_version(["202304"], conn)
+    monkeypatch.setattr(olap, "_cube", leader)
+    assert olap.refresh_cube(engine) is True
+    assert olap._cube.version == 2
+    assert olap._cube.ym_range().iloc[0].tolist() == ["202301", "202304"]
+
+    monkeypatch.setattr(olap, "_cube", follower)
+    monkeypatch.setattr(olap, "publisher_lock", busy)
+    assert olap.refresh_cube(engine) is True
+    assert olap._cube.version == 2
+    # 舊的 cube 還在用的請求不受影響
+    assert follower.ym_range().iloc[0].tolist() == ["202301", "202303"]
@@ -4,7 +4,7 @@ import pandas as pd
 import pandas.testing as pdt 
 from pathlib import Path 
 
-from creditcard_analysis.utils.utils import get_path, handling_missing_value, handling_duplicate_value 
+from creditcard_analysis.utils.utils import get_path, handling_missing_value, handling_duplicate_value, ym_to_key, key_to_ym, ym_keys, year_start_key
 
 # @pytest.fixture
 # def caplog_info_utils(caplog):
@@ -81,4 +81,22 @@ from creditcard_analysis.utils.utils import get_path, handling_missing_value, ha
 #     pdt.assert_frame_equal(out2, expected2)
 
 #     for s in ['刪除後筆數', '重複值處理完成']:
-#         assert s in caplog_info_utils.text
\ No newline at end of file
+#         assert s in caplog_info_utils.text
+
+
+def test_ym_key_round_trip_and_arithmetic():
+    assert ym_to_key("202301") == 2023 * 12
+    assert ym_to_key(202312) + 1 == ym_to_key("202401")
+    assert key_to_ym(ym_to_key("199912")) == "199912"
+    assert key_to_ym(year_start_key(ym_to_key("202407"))) == "202401"
+    # 季 = ym_key % 12 // 3
+    assert [ym_to_key(f"2024{m:02d}") % 12 // 3 + 1 for m in (1, 4, 9, 12)] == [1, 2, 3, 4]
+
+    with pytest.raises(ValueError):
+        ym_to_key("202313")
+
+
+def test_ym_keys_vectorized_matches_scalar():
+    yms = pd.Series(["202301", "202312", "199001"])
+    assert ym_keys(yms).tolist() == [ym_to_key(v) for v in yms]
+    assert ym_keys(pd.Series([202301, 202302])).tolist() == [24276, 24277]